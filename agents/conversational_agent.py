@@ -1,9 +1,22 @@
 from core.base_agent import BaseAgent
-from typing import Dict, Any
+from core.conversation_memory import get_memory
+from typing import Dict, Any, AsyncIterator
 
 class ConversationalAgent(BaseAgent):
     """Main conversational agent"""
     
+    # Plain conversation; semantic routing drops specialists scoring below these
+    routing_exemplars = {
+        "chat": [
+            "Hello, how are you?",
+            "Thanks, that was helpful",
+            "Can you explain how this works?",
+            "Write a short essay about friendship",
+            "What do you think about my plan?",
+            "Help me rewrite this paragraph",
+        ]
+    }
+    
     def __init__(self):
         super().__init__(name="conversational_agent", model="gemini-2.5-flash")
         
@@ -16,21 +29,30 @@ class ConversationalAgent(BaseAgent):
         prompt = self._build_prompt(message, context)
         
         # Generate response
-        response = await self.think(prompt)
+        response = await self.think(prompt, use_cache=self.use_cache(input_data))
         
         return {
             "text": response,
             "metadata": {"agent": self.name}
         }
     
-    def _build_prompt(self, message: str, context: Dict[str, Any]) -> str:
-        """Build prompt with context"""
-        prompt = f"User: {message}\n"
+    async def process_stream(self, input_data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Process conversation, streaming the reply token by token"""
+        message = input_data.get("message", "")
+        context = input_data.get("context", {})
         
-        if context.get("history"):
-            prompt = "Previous conversation:\n"
-            for entry in context["history"][-5:]:  # Last 5 messages
-                prompt += f"{entry}\n"
-            prompt += f"\nUser: {message}\n"
+        prompt = self._build_prompt(message, context)
+        
+        parts = []
+        async for chunk in self.think_stream(prompt, use_cache=self.use_cache(input_data)):
+            parts.append(chunk)
+            yield {"type": "chunk", "text": chunk}
             
-        return prompt
\ No newline at end of file
+        yield {
+            "type": "response",
+            "response": {"text": "".join(parts), "metadata": {"agent": self.name}}
+        }
+    
+    def _build_prompt(self, message: str, context: Dict[str, Any]) -> str:
+        """Build prompt with as much recent conversation as the memory budget allows"""
+        return get_memory(context).build_prompt(message)
\ No newline at end of file
@@ -1,16 +1,20 @@
 from core.base_agent import BaseAgent
-from typing import Dict, Any, List
-import PyPDF2
-import docx
-import pandas as pd
-import json
-from pathlib import Path
+from core.document_index import document_index, content_to_text
+from core.ingestion import ingestion_pipeline
+from typing import Dict, Any, List, Optional
+from config.settings import config
+from tools.file_processor import file_processor
+import asyncio
+import hashlib
 
 class FileAgent(BaseAgent):
     """Agent for file processing and analysis"""
     
     def __init__(self):
         super().__init__(name="file_agent")
+        self.processor = file_processor
+        self.index = document_index
+        self.ingestion = ingestion_pipeline
         self.supported_formats = {
             'pdf': self.process_pdf,
             'docx': self.process_docx,
@@ -29,13 +33,17 @@ class FileAgent(BaseAgent):
         if not files:
             return {"text": "No files to process.", "metadata": {"agent": self.name}}
             
-        processed_files = []
-        for file_info in files:
-            file_content = await self.process_file(file_info)
-            processed_files.append(file_content)
+        # Uploads prepared by the ingestion pipeline are usually ready by now;
+        # waiting for in-flight ones turns this turn's parse into cache hits
+        await self.ingestion.wait([file_info.get("hash") for file_info in files if file_info.get("hash")],
+                                  timeout=config.FILE_PARSE_TIMEOUT)
+            
+        # Files are parsed concurrently, off the event loop
+        processed_files = await self.processor.process_files(files, use_cache=self.use_cache(input_data))
             
         # Analyze files based on user query
-        analysis = await self.analyze_files(processed_files, message)
+        analysis = await self.analyze_files(processed_files, message, use_cache=self.use_cache(input_data),
+                                            session_id=context.get("session_id"))
         
         return {
             "text": analysis,
@@ -45,83 +53,48 @@ class FileAgent(BaseAgent):
     
     async def process_file(self, file_info: Dict[str, Any]) -> Dict[str, Any]:
         """Process individual file"""
-        file_path = file_info.get("path")
-        file_ext = Path(file_path).suffix[1:].lower()
-        
-        if file_ext in self.supported_formats:
-            content = await self.supported_formats[file_ext](file_path)
-            return {
-                "name": Path(file_path).name,
-                "type": file_ext,
-                "content": content,
-                "size": Path(file_path).stat().st_size
-            }
-        else:
-            return {
-                "name": Path(file_path).name,
-                "type": file_ext,
-                "error": f"Unsupported file format: {file_ext}"
-            }
+        return await self.processor.process_file(file_info)
     
-    async def process_pdf(self, file_path: str) -> str:
+    async def process_pdf(self, file_path: str) -> Dict[str, Any]:
         """Extract text from PDF"""
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-        return text
+        return await self.processor.parse(file_path, 'pdf')
     
-    async def process_docx(self, file_path: str) -> str:
+    async def process_docx(self, file_path: str) -> Dict[str, Any]:
         """Extract text from Word document"""
-        doc = docx.Document(file_path)
-        return '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+        return await self.processor.parse(file_path, 'docx')
     
     async def process_txt(self, file_path: str) -> str:
         """Read text file"""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+        return await self.processor.parse(file_path, 'txt')
     
     async def process_csv(self, file_path: str) -> Dict[str, Any]:
         """Process CSV file"""
-        df = pd.read_csv(file_path)
-        return {
-            "preview": df.head(10).to_dict(),
-            "shape": df.shape,
-            "columns": list(df.columns),
-            "summary": df.describe().to_dict()
-        }
+        return await self.processor.parse(file_path, 'csv')
     
     async def process_excel(self, file_path: str) -> Dict[str, Any]:
         """Process Excel file"""
-        excel_data = {}
-        xls = pd.ExcelFile(file_path)
-        
-        for sheet_name in xls.sheet_names:
-            df = pd.read_excel(xls, sheet_name)
-            excel_data[sheet_name] = {
-                "preview": df.head(10).to_dict(),
-                "shape": df.shape,
-                "columns": list(df.columns)
-            }
-            
-        return excel_data
+        return await self.processor.parse(file_path, 'xlsx')
     
     async def process_json(self, file_path: str) -> Dict[str, Any]:
         """Process JSON file"""
-        with open(file_path, 'r') as file:
-            return json.load(file)
+        return await self.processor.parse(file_path, 'json')
     
-    async def analyze_files(self, files: List[Dict], query: str) -> str:
+    async def analyze_files(self, files: List[Dict], query: str, use_cache: bool = True,
+                            session_id: Optional[str] = None) -> str:
         """Analyze processed files based on user query"""
-        # Prepare file contents for analysis
-        file_summaries = []
-        for file in files:
-            if file.get("error"):
-                file_summaries.append(f"File: {file['name']} - Error: {file['error']}")
-            else:
-                content_preview = str(file.get("content", ""))[:1000]
-                file_summaries.append(f"File: {file['name']} ({file['type']})\nContent: {content_preview}")
+        # Large documents are registered once as a cached context and each
+        # turn only sends the question
+        analysis = await self._analyze_with_context(files, query, use_cache, session_id)
+        if analysis is not None:
+            return analysis
+            
+        # Prefer the excerpts most relevant to the query; fall back to the
+        # start of each file when retrieval is off or embedding fails
+        file_summaries = None
+        if config.DOCUMENT_RETRIEVAL:
+            file_summaries = await self._retrieve_excerpts(files, query)
+        if file_summaries is None:
+            file_summaries = [self._preview(file) for file in files]
                 
         combined_content = "\n\n".join(file_summaries)
         
@@ -132,4 +105,86 @@ class FileAgent(BaseAgent):
         
         Analysis:"""
         
-        return await self.think(prompt)
\ No newline at end of file
+        return await self.think(prompt, use_cache=use_cache)
+    
+    async def _analyze_with_context(self, files: List[Dict], query: str, use_cache: bool = True,
+                                    session_id: Optional[str] = None) -> Optional[str]:
+        """Answer from the full documents held in a backend context cache"""
+        documents = [file for file in files if not file.get("error") and file.get("hash")]
+        if not documents:
+            return None
+        hashes = [file["hash"] for file in documents]
+        key = "files:" + hashlib.sha256("\n".join(sorted(hashes)).encode()).hexdigest()
+        # Re-uploads of the same file names replace the session's previous
+        # context; other sessions' files of the same name are left alone
+        scope = "\n".join([session_id or ""] + sorted(file["name"] for file in documents))
+        parts = [self._document_text(file) for file in documents]
+        
+        errors = [self._preview(file) for file in files if file.get("error") or not file.get("hash")]
+        prompt = f'Analyze the files above based on the user query: "{query}"'
+        if errors:
+            prompt += "\n\nThese files could not be read:\n" + "\n".join(errors)
+        
+        return await self.think_with_context(
+            key, parts, prompt + "\n\nAnalysis:",
+            system_instruction="You answer questions about the user's uploaded files. Cite the page or section you rely on.",
+            tags=hashes, scope=scope, use_cache=use_cache
+        )
+    
+    @staticmethod
+    def _document_text(file: Dict[str, Any]) -> str:
+        content = content_to_text(file.get("content", ""))
+        if not isinstance(content, str):
+            content = "\n".join(
+                f"[{FileAgent._location(chunk)}] {chunk['text']}" for chunk in content
+            )
+        return f"File: {file['name']} ({file['type']})\nContent:\n{content}"
+    
+    def _preview(self, file: Dict[str, Any]) -> str:
+        """First 1000 characters of a file's content"""
+        if file.get("error"):
+            return f"File: {file['name']} - Error: {file['error']}"
+        content = file.get("content", "")
+        # PDF and Word content is structured; only its text goes into the prompt
+        if isinstance(content, dict) and "chunks" in content:
+            content = content["text"]
+        content_preview = str(content)[:1000]
+        return f"File: {file['name']} ({file['type']})\nContent: {content_preview}"
+    
+    async def _retrieve_excerpts(self, files: List[Dict], query: str) -> Optional[List[str]]:
+        """Top-k chunks across all files for the query, grouped per file"""
+        indexed = [file for file in files if not file.get("error") and file.get("hash")]
+        try:
+            await asyncio.gather(*(
+                self.index.add(file["hash"], file["name"], file.get("content", "")) for file in indexed
+            ))
+            excerpts = await self.index.search(query, [file["hash"] for file in indexed])
+        except Exception as e:
+            print(f"Document retrieval failed, using file previews: {e}")
+            return None
+            
+        by_file: Dict[str, List[str]] = {}
+        for chunk in excerpts:
+            by_file.setdefault(chunk["doc_id"], []).append(f"[{self._location(chunk)}] {chunk['text']}")
+            
+        summaries = []
+        for file in files:
+            if file.get("error") or not file.get("hash"):
+                summaries.append(self._preview(file))
+                continue
+            sections = by_file.get(file["hash"])
+            if sections:
+                summaries.append(f"File: {file['name']} ({file['type']})\nRelevant excerpts:\n" + "\n".join(sections))
+            else:
+                summaries.append(f"File: {file['name']} ({file['type']})\nNo excerpts relevant to the query.")
+        return summaries
+    
+    @staticmethod
+    def _location(chunk: Dict[str, Any]) -> str:
+        if "page" in chunk:
+            return f"page {chunk['page']}"
+        if "table" in chunk:
+            return f"table {chunk['table']}"
+        if "paragraph" in chunk:
+            return f"paragraph {chunk['paragraph']}"
+        return "excerpt"
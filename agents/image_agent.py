@@ -1,17 +1,61 @@
 # agents/image_agent.py
 from core.base_agent import BaseAgent
+from core.intent_router import IntentRouter, RoutingRule
+from config.settings import config
+from core.scheduler import user_message
+from tools.image_processor import image_preprocessor
 from typing import Dict, Any, List
 from PIL import Image
-import google.generativeai as genai
+import asyncio
 import base64
 from io import BytesIO
 
+# Prompts that need every image in one request rather than one request each
+_multi_image_router = IntentRouter([
+    RoutingRule(
+        agent="multi_image",
+        phrases=['compare', 'comparison', 'difference*', 'differ*', 'similar*', 'versus', 'vs',
+                 'both', 'each other', 'all of them', 'all the images', 'all these', 'between',
+                 'same', 'which one', 'which image', 'which photo', 'which picture', 'together']
+    ),
+])
+
 class ImageAgent(BaseAgent):
     """Agent for image generation and processing"""
     
+    routing_rules = [
+        RoutingRule(
+            agent="image_agent",
+            intent="generate",
+            phrases=['image*', 'picture*', 'photo*', 'illustration*', 'graphic*', 'drawing*', 'logo*', 'artwork'],
+            requires=[['generate', 'create', 'draw', 'make', 'design', 'paint', 'render', 'sketch']],
+            weight=2.0
+        ),
+        RoutingRule(
+            agent="image_agent",
+            intent="mention",
+            phrases=['image*', 'picture*', 'photo*', 'screenshot*']
+        ),
+    ]
+    
+    routing_exemplars = {
+        "generate": [
+            "Generate an image of a sunset over the mountains",
+            "Create a picture of a cat wearing a hat",
+            "Draw an illustration of a futuristic city",
+            "Design a logo for my coffee shop",
+        ],
+        "mention": [
+            "What is in this picture?",
+            "Describe the uploaded image",
+            "What does this photo show?",
+        ],
+    }
+    
     def __init__(self):
         super().__init__(name="image_agent")
-        self.vision_model = genai.GenerativeModel('gemini-2.5-flash')
+        self.vision_model_name = config.VISION_MODEL
+        self.preprocessor = image_preprocessor
         
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process image-related tasks"""
@@ -22,61 +66,95 @@ class ImageAgent(BaseAgent):
         
         # Check if there's an image to analyze
         if context.get("images"):
-            analysis = await self.analyze_images(context["images"], message)
+            analysis = await self.analyze_images(
+                context["images"], message, use_cache=self.use_cache(input_data)
+            )
             response_data["text"] = analysis
             
         # Check if we need to generate an image
-        if self._should_generate_image(message):
+        if self._should_generate_image(message, input_data):
             # For now, just return a placeholder since Imagen requires additional setup
             response_data["text"] = "Image generation feature is being set up. This requires Imagen API configuration."
             response_data["images"] = []
             
         return response_data
     
-    async def analyze_images(self, images: List, prompt: str) -> str:
-        """Analyze uploaded images"""
-        responses = []
+    async def analyze_images(self, images: List, prompt: str, use_cache: bool = True) -> str:
+        """Analyze uploaded images.
         
-        for image_data in images:
+        Images are downsized and re-encoded first (cached by content hash).
+        Prompts that relate the images to each other get one multi-image
+        request; otherwise each image is analyzed concurrently.
+        """
+        sources = [self._image_source(image_data) for image_data in images]
+        sources = [source for source in sources if source is not None]
+        if not sources:
+            return "No images to analyze."
+            
+        prepared = await asyncio.gather(*(self._prepare(source) for source in sources), return_exceptions=True)
+        parts = [part for part in prepared if not isinstance(part, Exception)]
+        
+        if len(parts) > 1 and _multi_image_router.route(prompt):
             try:
-                # Handle different image formats
-                if isinstance(image_data, dict):
-                    if 'bytes' in image_data:
-                        # Image from Streamlit upload
-                        image = Image.open(BytesIO(image_data['bytes']))
-                    elif 'data' in image_data:
-                        # Base64 encoded image
-                        image = Image.open(BytesIO(base64.b64decode(image_data['data'])))
-                    else:
-                        continue
-                elif isinstance(image_data, str):
-                    # Base64 string
-                    image = Image.open(BytesIO(base64.b64decode(image_data)))
-                elif isinstance(image_data, bytes):
-                    # Raw bytes
-                    image = Image.open(BytesIO(image_data))
-                else:
-                    # Assume it's already a PIL Image
-                    image = image_data
-                    
-                # Analyze with vision model
-                response = await self.vision_model.generate_content_async([prompt, image])
-                responses.append(response.text)
-                
+                responses = [await self._analyze(prompt, parts, use_cache)]
             except Exception as e:
-                responses.append(f"Error analyzing image: {str(e)}")
-                
-        return "\n".join(responses) if responses else "No images to analyze."
+                responses = [user_message(e, "Error analyzing images")]
+        else:
+            results = await asyncio.gather(
+                *(self._analyze(prompt, [part], use_cache) for part in parts), return_exceptions=True
+            )
+            responses = [
+                user_message(result, "Error analyzing image") if isinstance(result, Exception) else result
+                for result in results
+            ]
+            
+        errors = [f"Error analyzing image: {str(part)}" for part in prepared if isinstance(part, Exception)]
+        return "\n".join(responses + errors)
+    
+    async def _prepare(self, source: Any) -> Any:
+        """Model-ready part for encoded bytes; PIL images are sent as they are"""
+        if isinstance(source, (bytes, bytearray)):
+            return await self.preprocessor.prepare(bytes(source))
+        return source
+    
+    async def _analyze(self, prompt: str, parts: List[Any], use_cache: bool) -> str:
+        """One vision request over the given image parts"""
+        async def generate() -> str:
+            return await self.backend.vision(self.vision_model_name, prompt, parts)
+            
+        return await self.cached_generate(self.vision_model_name, None, [prompt, *parts], generate, use_cache)
+    
+    def _image_source(self, image_data: Any) -> Any:
+        """Return encoded image bytes (or a PIL Image) for any supported input"""
+        # Handle different image formats
+        if isinstance(image_data, dict):
+            if 'bytes' in image_data:
+                # Image from Streamlit upload
+                return image_data['bytes']
+            elif 'data' in image_data:
+                # Base64 encoded image
+                return base64.b64decode(image_data['data'])
+            return None
+        elif isinstance(image_data, str):
+            # Base64 string
+            return base64.b64decode(image_data)
+        # Raw bytes, or assume it's already a PIL Image
+        return image_data
+    
+    def _load_image(self, source: Any) -> Image.Image:
+        """Decode image bytes into a PIL Image"""
+        if isinstance(source, (bytes, bytearray)):
+            return Image.open(BytesIO(source))
+        return source
     
     async def generate_image(self, prompt: str) -> List[Dict[str, Any]]:
         """Generate images using Imagen"""
-        # Placeholder for now - actual Imagen implementation requires additional setup
+        # Placeholder for now - actual Imagen implementation requires additional setup.
+        # Generated bytes belong in blob_store.put(data, "image/png"), with the
+        # returned reference (not base64) placed in the response's "images".
         return []
     
-    def _should_generate_image(self, message: str) -> bool:
+    def _should_generate_image(self, message: str, input_data: Dict[str, Any] = None) -> bool:
         """Determine if image generation is needed"""
-        keywords = ['generate', 'create', 'draw', 'make', 'design']
-        image_keywords = ['image', 'picture', 'illustration', 'graphic']
-        
-        message_lower = message.lower()
-        return any(k in message_lower for k in keywords) and any(k in message_lower for k in image_keywords)
\ No newline at end of file
+        match = self.route(input_data or {"message": message})
+        return match is not None and "generate" in match.intents
\ No newline at end of file
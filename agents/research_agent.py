@@ -1,17 +1,54 @@
 from core.base_agent import BaseAgent
-from typing import Dict, Any, List
+from core.intent_router import RoutingRule
+from core.response_cache import search_cache
+from core.scheduler import scheduler, key_id, OverloadedError
+from core.single_flight import research_flight
+from core import deadline
+from typing import Dict, Any, List, AsyncIterator
 from tavily import TavilyClient
 from config.settings import config
+from tools.web_scraper import web_scraper
+from tools.html_extractor import extract_text
 import asyncio
-from bs4 import BeautifulSoup
-import requests
+import re
+
+# Politeness and request phrasing that do not change what a search returns.
+# Everything else, including prepositions and word order, carries meaning
+_QUERY_FILLER = re.compile(
+    r"\b(?:please|(?:can|could|would) you|(?:tell|show|give) me(?: about)?|"
+    r"i (?:want|need|would like) to know(?: about)?)\b"
+)
 
 class ResearchAgent(BaseAgent):
     """Agent for web research and information gathering"""
     
+    # Bare "find" is left out on purpose: it appears in most questions and
+    # would trigger a paid web search for them
+    routing_rules = [
+        RoutingRule(
+            agent="research_agent",
+            intent="search",
+            phrases=['search*', 'research', 'look up', 'look it up', 'find out', 'find information',
+                     'find sources', 'google', 'on the web', 'the internet', 'browse',
+                     'latest news', 'news about', 'current events']
+        ),
+    ]
+    
+    routing_exemplars = {
+        "search": [
+            "Search the web for the latest AI news",
+            "What are the current developments in battery technology?",
+            "Look up today's weather in London",
+            "Find recent articles about climate policy",
+            "Research the best laptops released this year",
+        ]
+    }
+    
     def __init__(self):
         super().__init__(name="research_agent")
         self.tavily_client = TavilyClient(api_key=config.TAVILY_API_KEY)
+        self.scraper = web_scraper
+        self.search_cache = search_cache
         
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process research requests"""
@@ -21,10 +58,12 @@ class ResearchAgent(BaseAgent):
         search_query = self._extract_search_query(message)
         
         # Perform research
-        research_results = await self.research(search_query)
+        research_results = await self.research(search_query, use_cache=self.use_cache(input_data))
         
         # Summarize results
-        summary = await self.summarize_research(research_results, message)
+        summary = await self.summarize_research(
+            research_results, message, use_cache=self.use_cache(input_data)
+        )
         
         return {
             "text": summary,
@@ -34,86 +73,145 @@ class ResearchAgent(BaseAgent):
             }
         }
     
-    async def research(self, query: str) -> List[Dict[str, Any]]:
-        """Perform web research using Tavily"""
-        try:
-            # Search with Tavily
-            search_results = await asyncio.to_thread(
-                self.tavily_client.search,
-                query,
-                search_depth="advanced",
-                max_results=5
-            )
+    async def process_stream(self, input_data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Process research requests, streaming the summary as it is written"""
+        message = input_data.get("message", "")
+        
+        search_query = self._extract_search_query(message)
+        research_results = await self.research(search_query, use_cache=self.use_cache(input_data))
+        
+        parts = []
+        if not research_results:
+            parts.append("I couldn't find any relevant information for your query.")
+            yield {"type": "chunk", "text": parts[0]}
+        else:
+            prompt = self._build_summary_prompt(research_results, message)
+            async for chunk in self.think_stream(prompt, use_cache=self.use_cache(input_data)):
+                parts.append(chunk)
+                yield {"type": "chunk", "text": chunk}
+            sources = self._format_sources(research_results)
+            parts.append(sources)
+            yield {"type": "chunk", "text": sources}
             
-            results = []
-            for result in search_results.get("results", []):
-                results.append({
-                    "title": result.get("title"),
-                    "url": result.get("url"),
-                    "content": result.get("content"),
-                    "score": result.get("score")
-                })
+        yield {
+            "type": "response",
+            "response": {
+                "text": "".join(parts),
+                "metadata": {
+                    "agent": self.name,
+                    "sources": [r["url"] for r in research_results[:5]]
+                }
+            }
+        }
+    
+    async def research(self, query: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Perform web research using Tavily.
+        
+        Concurrent research for the same normalized query shares one search
+        and one round of scraping; each caller gets its own copy of the results.
+        """
+        key = f"{self._normalize_query(query)}:{use_cache}"
+        results = await research_flight.do(key, lambda: self._research(query, use_cache))
+        return [dict(result) for result in results]
+    
+    async def _research(self, query: str, use_cache: bool) -> List[Dict[str, Any]]:
+        try:
+            results = await self.search(query, use_cache)
                 
-            # Additional scraping if needed
-            for result in results[:2]:  # Scrape top 2 results
-                scraped_content = await self.scrape_url(result["url"])
+            # Scrape every candidate concurrently over the shared connection pool
+            scraped = await asyncio.gather(*(self.scrape_url(result["url"], use_cache) for result in results))
+            for result, scraped_content in zip(results, scraped):
                 if scraped_content:
                     result["full_content"] = scraped_content
                     
             return results
             
+        except OverloadedError:
+            # Let the user know to retry rather than claiming nothing was found
+            raise
         except Exception as e:
             print(f"Research error: {e}")
             return []
     
-    async def scrape_url(self, url: str) -> str:
-        """Scrape content from URL"""
-        try:
-            response = await asyncio.to_thread(requests.get, url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
+    async def search(self, query: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Search with Tavily, reusing results for equivalent queries"""
+        cache_key = self._normalize_query(query)
+        if use_cache and config.CACHE_ENABLED:
+            cached = await self.search_cache.aget(cache_key)
+            if cached is not None:
+                # Copies, so scraping results never mutates cached entries
+                return [dict(result) for result in cached]
                 
-            # Get text
-            text = soup.get_text()
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+        # Search with Tavily, within the shared search rate limits. The client
+        # call runs in a thread, so the turn's deadline bounds the wait for it
+        search_results = await scheduler.run("tavily", lambda: asyncio.wait_for(asyncio.to_thread(
+            self.tavily_client.search,
+            query,
+            search_depth="advanced",
+            max_results=5
+        ), deadline.timeout()), key=key_id(config.TAVILY_API_KEY))
+        
+        results = []
+        for result in search_results.get("results", []):
+            results.append({
+                "title": result.get("title"),
+                "url": result.get("url"),
+                "content": result.get("content"),
+                "score": result.get("score")
+            })
             
-            return text[:5000]  # Limit to 5000 chars
+        if results and config.CACHE_ENABLED:
+            self.search_cache.set(cache_key, results)
+        return [dict(result) for result in results]
+    
+    async def scrape_url(self, url: str, use_cache: bool = True) -> str:
+        """Scrape content from URL"""
+        try:
+            # Text is extracted while the page downloads, which stops early
+            # once enough text has been collected
+            page = await self.scraper.fetch_text_cached(url, max_chars=5000, use_cache=use_cache)
+            if not page.ok:
+                raise RuntimeError(page.error or f"HTTP {page.status}")
+            return page.text or ""
             
         except Exception as e:
             print(f"Scraping error for {url}: {e}")
             return ""
     
-    async def summarize_research(self, results: List[Dict], query: str) -> str:
+    def _html_to_text(self, html: bytes) -> str:
+        """Extract readable text from an HTML page"""
+        return extract_text(html, max_chars=5000)  # Limit to 5000 chars
+    
+    async def summarize_research(self, results: List[Dict], query: str, use_cache: bool = True) -> str:
         """Summarize research results"""
         if not results:
             return "I couldn't find any relevant information for your query."
             
+        summary = await self.think(self._build_summary_prompt(results, query), use_cache=use_cache)
+        
+        return summary + self._format_sources(results)
+    
+    def _build_summary_prompt(self, results: List[Dict], query: str) -> str:
+        """Build the summarization prompt from research results"""
         # Prepare content for summarization
         combined_content = "\n\n".join([
             f"Source: {r['title']}\n{r.get('full_content', r['content'])[:1000]}"
             for r in results[:3]
         ])
         
-        prompt = f"""Based on the following research results for the query "{query}", 
+        return f"""Based on the following research results for the query "{query}", 
         provide a comprehensive summary:
         
         {combined_content}
         
         Summary:"""
-        
-        summary = await self.think(prompt)
-        
-        # Add sources
+    
+    def _format_sources(self, results: List[Dict]) -> str:
+        """Format the source list appended to summaries"""
         sources = "\n\nSources:\n"
         for r in results[:3]:
             sources += f"- [{r['title']}]({r['url']})\n"
-            
-        return summary + sources
+        return sources
     
     def _extract_search_query(self, message: str) -> str:
         """Extract search query from message"""
@@ -124,4 +222,16 @@ class ResearchAgent(BaseAgent):
         for phrase in remove_phrases:
             query = query.replace(phrase, '')
             
-        return query.strip()
\ No newline at end of file
+        return query.strip()
+    
+    def _normalize_query(self, query: str) -> str:
+        """Cache key for a query: case, spacing, punctuation and filler phrases are ignored"""
+        words = re.findall(r"[a-z0-9]+(?:[.'][a-z0-9]+)*", _QUERY_FILLER.sub(" ", query.lower()))
+        return " ".join(words)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit rates for the search and page caches"""
+        return {
+            "search": self.search_cache.get_stats(),
+            "pages": self.scraper.get_cache_stats()
+        }
\ No newline at end of file
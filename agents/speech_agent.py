@@ -1,65 +1,89 @@
 from core.base_agent import BaseAgent
-from typing import Dict, Any
-import google.generativeai as genai
-from gtts import gTTS
-import io
-import base64
+from core.intent_router import RoutingRule
+from core.scheduler import user_message
+from tools.speech_generator import speech_generator
+from typing import Dict, Any, List, AsyncIterator
 
 class SpeechAgent(BaseAgent):
     """Agent for speech synthesis and audio processing"""
     
+    depends_on = ["conversational_agent"]
+    
+    routing_rules = [
+        RoutingRule(
+            agent="speech_agent",
+            intent="speak",
+            phrases=['say', 'speak', 'pronounce', 'voice', 'audio', 'aloud', 'out loud',
+                     'read it', 'read this', 'read that', 'read out', 'text to speech', 'tts']
+        ),
+    ]
+    
+    routing_exemplars = {
+        "speak": [
+            "Say this out loud",
+            "Read your answer aloud",
+            "Pronounce this word for me",
+            "Convert this text to speech",
+        ]
+    }
+    
     def __init__(self):
         super().__init__(name="speech_agent")
-        # Note: Google's TTS model integration would need proper API setup
+        self.speech = speech_generator
         
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process speech-related tasks"""
+        response = {"text": "", "metadata": {"agent": self.name}}
+        async for event in self.process_stream(input_data):
+            if event["type"] == "response":
+                response = event["response"]
+        return response
+    
+    async def process_stream(self, input_data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield audio chunks sentence by sentence as they are synthesized"""
         message = input_data.get("message", "")
-        context = input_data.get("context", {})
         
         # Check if we need to generate speech
-        if self._should_generate_speech(message):
-            text_to_speak = self._extract_text_to_speak(message, context)
-            audio_data = await self.generate_speech(text_to_speak)
+        if not self._should_generate_speech(message, input_data):
+            yield {"type": "response", "response": {"text": "", "metadata": {"agent": self.name}}}
+            return
             
-            return {
-                "text": f"Generated audio for: '{text_to_speak[:50]}...'",
-                "audio": [audio_data],
-                "metadata": {"agent": self.name}
-            }
+        text_to_speak = self._extract_text_to_speak(
+            message, input_data.get("state", {}), input_data.get("dependencies", {})
+        )
+        audio = []
+        metadata = {"agent": self.name}
+        try:
+            async for chunk in self.speech.stream(text_to_speak):
+                audio.append(chunk)
+                yield {"type": "audio", "audio": chunk}
+        except Exception as e:
+            print(f"Speech generation error: {e}")
+            metadata["error"] = user_message(e, "Speech generation failed")
             
-        return {"text": "", "metadata": {"agent": self.name}}
+        if "error" in metadata and not audio:
+            text = metadata["error"]
+        else:
+            text = f"Generated audio for: '{text_to_speak[:50]}...'"
+        yield {"type": "chunk", "text": text}
+        yield {
+            "type": "response",
+            "response": {"text": text, "audio": audio, "metadata": metadata}
+        }
     
-    async def generate_speech(self, text: str) -> Dict[str, Any]:
-        """Generate speech from text"""
+    async def generate_speech(self, text: str) -> List[Dict[str, Any]]:
+        """Generate speech from text as ordered audio chunks"""
         try:
-            # Using gTTS as fallback (Google's TTS model would be better)
-            tts = gTTS(text=text, lang='en')
-            
-            # Save to buffer
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            
-            # Convert to base64
-            audio_base64 = base64.b64encode(audio_buffer.read()).decode()
-            
-            return {
-                "data": audio_base64,
-                "format": "mp3",
-                "text": text
-            }
-            
+            return await self.speech.generate(text)
         except Exception as e:
             print(f"Speech generation error: {e}")
-            return {}
+            return []
     
-    def _should_generate_speech(self, message: str) -> bool:
+    def _should_generate_speech(self, message: str, input_data: Dict[str, Any] = None) -> bool:
         """Determine if speech generation is needed"""
-        keywords = ['say', 'speak', 'pronounce', 'read', 'voice', 'audio', 'sound']
-        return any(k in message.lower() for k in keywords)
+        return self.route(input_data or {"message": message}) is not None
     
-    def _extract_text_to_speak(self, message: str, context: Dict) -> str:
+    def _extract_text_to_speak(self, message: str, state: Dict, dependencies: Dict = None) -> str:
         """Extract text that should be converted to speech"""
         # Simple extraction - could be enhanced with NLP
         if '"' in message:
@@ -69,8 +93,14 @@ class SpeechAgent(BaseAgent):
             if quotes:
                 return quotes[0]
                 
-        # Use last response if available
-        if context.get("last_response"):
-            return context["last_response"]
+        # Speak the conversational reply produced this turn
+        reply = (dependencies or {}).get("conversational_agent", {}).get("text")
+        if reply:
+            return reply
+            
+        # Use the session's last response if available
+        last_text = (state.get("last_response") or {}).get("text")
+        if last_text:
+            return last_text
             
         return message
\ No newline at end of file
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Any, Optional
+from aiohttp import web
+
+# Allow running as a script from the repository root or this directory
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.settings import config
+from core.blob_store import blob_store
+from core.ingestion import ingestion_pipeline, IMAGE_TYPES
+from core.scheduler import scheduler
+from core import single_flight
+from core.session import Session, SessionStore, SessionLimitError
+from main import MultiAgentChatbot
+
+PRUNE_INTERVAL = 60  # Seconds between idle-session sweeps
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+def _json(value: Any, status: int = 200) -> web.Response:
+    return web.json_response(value, status=status, dumps=_dumps)
+
+async def _session(request: web.Request) -> Session:
+    session = await request.app["sessions"].get(request.match_info["session_id"])
+    if session is None:
+        raise web.HTTPNotFound(text=_dumps({"error": "Unknown or expired session"}),
+                               content_type="application/json")
+    return session
+
+async def _message(request: web.Request) -> str:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        body = None
+    if not isinstance(body, dict) or not str(body.get("message", "")).strip():
+        raise web.HTTPBadRequest(text=_dumps({"error": 'Body must be JSON with a "message"'}),
+                                 content_type="application/json")
+    return str(body["message"])
+
+async def create_session(request: web.Request) -> web.Response:
+    try:
+        session = await request.app["sessions"].create()
+    except SessionLimitError as e:
+        return _json({"error": str(e)}, status=503)
+    return _json({"session_id": session.session_id}, status=201)
+
+async def delete_session(request: web.Request) -> web.Response:
+    session = await request.app["sessions"].get(request.match_info["session_id"])
+    if session is None or not await request.app["sessions"].delete(session.session_id):
+        return _json({"error": "Unknown or expired session"}, status=404)
+    # Stop any turn still running; its request gets the partial response
+    request.app["chatbot"].cancel(session.state)
+    return web.Response(status=204)
+
+async def cancel_turn(request: web.Request) -> web.Response:
+    """Stop the session's turn in flight; that request returns what was produced so far"""
+    session = await _session(request)
+    return _json({"cancelled": request.app["chatbot"].cancel(session.state)})
+
+async def post_message(request: web.Request) -> web.Response:
+    """Run one turn and return the combined response"""
+    session = await _session(request)
+    message = await _message(request)
+    chatbot: MultiAgentChatbot = request.app["chatbot"]
+    # A new message supersedes the turn in flight instead of queueing behind it
+    chatbot.cancel(session.state, "superseded")
+    async with session.lock:
+        response = await chatbot.chat(message, session.context, session.state)
+        session.context["memory"].add_exchange(message, response.get("text", ""))
+        session.touch()
+    return _json(response)
+
+async def stream_message(request: web.Request) -> web.StreamResponse:
+    """Run one turn, streaming chunk, audio and response events.
+
+    Events are newline-delimited JSON, or server-sent events when the client
+    accepts text/event-stream.
+    """
+    session = await _session(request)
+    message = await _message(request)
+    chatbot: MultiAgentChatbot = request.app["chatbot"]
+    sse = "text/event-stream" in request.headers.get("Accept", "")
+    chatbot.cancel(session.state, "superseded")
+
+    stream = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream" if sse else "application/x-ndjson",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Keep reverse proxies from buffering the stream
+    })
+    async with session.lock:
+        await stream.prepare(request)
+        events = chatbot.chat_stream(message, session.context, session.state)
+        try:
+            async for event in events:
+                data = _dumps(event)
+                payload = f"event: {event['type']}\ndata: {data}\n\n" if sse else data + "\n"
+                await stream.write(payload.encode("utf-8"))
+                if event["type"] == "response":
+                    session.context["memory"].add_exchange(message, event["response"].get("text", ""))
+        except ConnectionResetError:
+            # Client went away; closing the generator cancels the agents' work
+            return stream
+        finally:
+            await events.aclose()
+            session.touch()
+    await stream.write_eof()
+    return stream
+
+async def upload_files(request: web.Request) -> web.Response:
+    """Accept multipart uploads and start preparing them in the background"""
+    session = await _session(request)
+    allowed = set(config.ALLOWED_FILE_TYPES) | IMAGE_TYPES
+    reader = await request.multipart()
+    uploaded = []
+    async for part in reader:
+        if not part.filename:
+            continue
+        ext = Path(part.filename).suffix.lower().lstrip(".")
+        if ext not in allowed:
+            return _json({"error": f"Unsupported file type: {ext or part.filename}"}, status=415)
+        data = bytearray()
+        while chunk := await part.read_chunk():
+            data.extend(chunk)
+            if len(data) > config.MAX_FILE_SIZE:
+                return _json({"error": f"{part.filename} exceeds {config.MAX_FILE_SIZE} bytes"}, status=413)
+
+        # Hashing and spooling touch the disk; keep them off the event loop
+        record = await asyncio.to_thread(ingestion_pipeline.submit, session.session_id, part.filename, bytes(data))
+        key = "images" if record["kind"] == "image" else "files"
+        if all(existing["hash"] != record["hash"] for existing in session.context[key]):
+            session.context[key].append(record)
+        uploaded.append({"name": record["name"], "hash": record["hash"], "kind": record["kind"]})
+    session.touch()
+    return _json({"files": uploaded}, status=201)
+
+async def list_files(request: web.Request) -> web.Response:
+    """Uploaded files with their background preparation status"""
+    session = await _session(request)
+    files = []
+    for record in session.context["files"] + session.context["images"]:
+        status = ingestion_pipeline.status(record["hash"]) or {"state": "ready"}
+        files.append({"name": record["name"], "hash": record["hash"], "kind": record["kind"], **status})
+    return _json({"files": files})
+
+async def get_blob(request: web.Request) -> web.Response:
+    """Generated media by content hash; ?type= sets the content type"""
+    data = await asyncio.to_thread(blob_store.get, request.match_info["blob_hash"])
+    if data is None:
+        return _json({"error": "Unknown blob"}, status=404)
+    return web.Response(
+        body=data,
+        content_type=request.query.get("type", "application/octet-stream"),
+        # Content-addressed, so the bytes behind a URL never change
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+async def health(request: web.Request) -> web.Response:
+    return _json({
+        "status": "ok",
+        "sessions": request.app["sessions"].get_stats(),
+        "scheduler": scheduler.get_stats(),
+        "single_flight": single_flight.get_stats()
+    })
+
+async def _prune_sessions(app: web.Application):
+    while True:
+        await asyncio.sleep(PRUNE_INTERVAL)
+        await app["sessions"].prune()
+
+async def _start_background(app: web.Application):
+    app["pruner"] = asyncio.create_task(_prune_sessions(app))
+
+async def _stop_background(app: web.Application):
+    app["pruner"].cancel()
+    await asyncio.gather(app["pruner"], return_exceptions=True)
+
+def create_app(chatbot: Optional[MultiAgentChatbot] = None,
+               sessions: Optional[SessionStore] = None) -> web.Application:
+    """Build the API application.
+
+    One set of agents serves every session from a single event loop; each
+    session carries its own context and conversation state.
+    """
+    app = web.Application(client_max_size=config.MAX_FILE_SIZE + 1024 * 1024)
+    app["chatbot"] = chatbot or MultiAgentChatbot()
+    app["sessions"] = sessions or SessionStore()
+    app.add_routes([
+        web.post("/sessions", create_session),
+        web.delete("/sessions/{session_id}", delete_session),
+        web.post("/sessions/{session_id}/cancel", cancel_turn),
+        web.post("/sessions/{session_id}/messages", post_message),
+        web.post("/sessions/{session_id}/messages/stream", stream_message),
+        web.post("/sessions/{session_id}/files", upload_files),
+        web.get("/sessions/{session_id}/files", list_files),
+        web.get("/blobs/{blob_hash}", get_blob),
+        web.get("/health", health),
+    ])
+    app.on_startup.append(_start_background)
+    app.on_cleanup.append(_stop_background)
+    return app
+
+def main():
+    web.run_app(create_app(), host=config.API_HOST, port=config.API_PORT)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Synthetic inputs for the benchmark suite"""
+from typing import Dict, Any, List
+from io import BytesIO
+from pathlib import Path
+import json
+import random
+import tempfile
+
+_WORDS = (
+    "market growth revenue quarter analysis customer product strategy report "
+    "forecast region team margin cost sales data model result summary risk"
+).split()
+
+_workdir = tempfile.TemporaryDirectory(prefix="bench-")
+
+def workdir() -> Path:
+    return Path(_workdir.name)
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+def make_html(paragraphs: int, seed: int = 0) -> bytes:
+    """A page with head, scripts, styles, navigation and body paragraphs"""
+    rng = random.Random(seed)
+    parts = [
+        "<html><head><title>Benchmark page</title>",
+        "<style>body { font-family: sans-serif; } .x { color: red; }</style>",
+        "<script>var tracking = {" + ",".join(f"k{i}: {i}" for i in range(200)) + "};</script>",
+        "</head><body>",
+        "<nav><ul>" + "".join(f"<li><a href='/p{i}'>Link {i}</a></li>" for i in range(50)) + "</ul></nav>",
+        "<main>",
+    ]
+    for i in range(paragraphs):
+        parts.append(f"<h2>Section {i}</h2>")
+        parts.append("<p>" + " ".join(sentence(rng) for _ in range(4)) + "</p>")
+        if i % 10 == 0:
+            parts.append("<script>console.log('inline " + str(i) + "');</script>")
+    parts.append("</main><footer>Copyright</footer></body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+def make_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> str:
+    """Write a text PDF with the given number of pages and return its path"""
+    rng = random.Random(seed)
+    path = workdir() / f"doc_{pages}.pdf"
+    if path.exists():
+        return str(path)
+
+    objects: List[bytes] = []
+    page_ids = []
+    # Object 1 is the catalog, 2 the page tree, 3 the font
+    next_id = 4
+    page_objects = []
+    for _ in range(pages):
+        lines = [sentence(rng, 10) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 50 780 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        page_objects.append((content_id, f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"))
+        page_objects.append((page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )))
+
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    entries = [
+        (1, "<< /Type /Catalog /Pages 2 0 R >>"),
+        (2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>"),
+        (3, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+    ] + page_objects
+
+    output = BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in sorted(entries):
+        offsets[obj_id] = output.tell()
+        output.write(f"{obj_id} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = output.tell()
+    output.write(f"xref\n0 {len(entries) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for obj_id in range(1, len(entries) + 1):
+        output.write(f"{offsets[obj_id]:010d} 00000 n \n".encode("latin-1"))
+    output.write(f"trailer\n<< /Size {len(entries) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    path.write_bytes(output.getvalue())
+    return str(path)
+
+def make_docx(paragraphs: int, seed: int = 0) -> str:
+    import docx
+    rng = random.Random(seed)
+    path = workdir() / f"doc_{paragraphs}.docx"
+    if not path.exists():
+        document = docx.Document()
+        for i in range(paragraphs):
+            if i % 50 == 0:
+                document.add_heading(f"Section {i // 50}", level=1)
+            document.add_paragraph(" ".join(sentence(rng) for _ in range(3)))
+        document.save(str(path))
+    return str(path)
+
+def _rows(rows: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(rows):
+        yield [i, rng.choice(_WORDS), round(rng.uniform(0, 1000), 2), rng.randint(0, 100), rng.choice(["north", "south", "east", "west"])]
+
+_COLUMNS = ["id", "product", "revenue", "units", "region"]
+
+def make_csv(rows: int, seed: int = 0) -> str:
+    import csv
+    path = workdir() / f"table_{rows}.csv"
+    if not path.exists():
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(_COLUMNS)
+            writer.writerows(_rows(rows, seed))
+    return str(path)
+
+def make_xlsx(rows: int, sheets: int = 2, seed: int = 0) -> str:
+    import openpyxl
+    path = workdir() / f"table_{rows}.xlsx"
+    if not path.exists():
+        workbook = openpyxl.Workbook(write_only=True)
+        for sheet in range(sheets):
+            worksheet = workbook.create_sheet(f"Sheet{sheet + 1}")
+            worksheet.append(_COLUMNS)
+            for row in _rows(rows, seed + sheet):
+                worksheet.append(row)
+        workbook.save(str(path))
+    return str(path)
+
+def make_json(records: int, seed: int = 0) -> str:
+    path = workdir() / f"data_{records}.json"
+    if not path.exists():
+        data = [dict(zip(_COLUMNS, row)) for row in _rows(records, seed)]
+        path.write_text(json.dumps({"records": data}), encoding="utf-8")
+    return str(path)
+
+def make_image(width: int, height: int, fmt: str = "JPEG", seed: int = 0) -> bytes:
+    """Encoded photo-like image bytes (noise over a gradient)"""
+    from PIL import Image
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), 40 + rng.randint(0, 20)).convert("RGB")
+    image = Image.blend(image, noise, 0.5)
+    buffer = BytesIO()
+    image.save(buffer, format=fmt, quality=90)
+    return buffer.getvalue()
+
+def make_history(turns: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    history = []
+    for _ in range(turns):
+        history.append(f"User: {sentence(rng)}")
+        history.append(f"Assistant: {' '.join(sentence(rng) for _ in range(5))}")
+    return history
+
+def make_responses(agents: int, chars: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    responses = []
+    for i in range(agents):
+        text = ""
+        while len(text) < chars:
+            text += sentence(rng) + " "
+        responses.append({
+            "text": text[:chars],
+            "images": [{"info": "placeholder"}] if i % 2 else [],
+            "audio": [],
+            "files": [],
+            "metadata": {"agent": f"agent_{i}", "sources": [f"https://example.com/{i}"]},
+        })
+    return responses
+
+ROUTING_MESSAGES = [
+    "Hello, how are you today?",
+    "Search the web for the latest news about quantum computing",
+    "Can you create an image of a sunset over the mountains?",
+    "Please say this out loud: good morning everyone",
+    "Write an essay about the history of the printing press",
+    "Find the bug in my reasoning about this proof",
+    "Research recent developments in battery chemistry and generate a picture of a cell",
+    "What does the uploaded report say about revenue in the third quarter? " * 5,
+]
@@ -0,0 +1,148 @@
+from typing import Dict, Any, List, Optional, Callable
+from dataclasses import dataclass, field
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+@dataclass
+class Benchmark:
+    """A named benchmark; factory(size) does setup and returns the timed callable"""
+    name: str
+    factory: Callable[..., Callable]
+    sizes: List[Any] = field(default_factory=lambda: [None])
+    group: str = "default"
+
+_registry: List[Benchmark] = []
+
+def benchmark(name: str, sizes: Optional[List[Any]] = None, group: str = "default"):
+    """Register a benchmark factory"""
+    def decorator(factory: Callable) -> Callable:
+        _registry.append(Benchmark(name=name, factory=factory, sizes=sizes or [None], group=group))
+        return factory
+    return decorator
+
+def registered_benchmarks() -> List[Benchmark]:
+    return list(_registry)
+
+def case_name(bench: Benchmark, size: Any) -> str:
+    return bench.name if size is None else f"{bench.name}[{size}]"
+
+def _timer(fn: Callable) -> Callable[[int], float]:
+    """Return timer(number) -> seconds for running fn number times"""
+    if inspect.iscoroutinefunction(fn):
+        loop = asyncio.new_event_loop()
+
+        async def run(number: int) -> float:
+            start = time.perf_counter()
+            for _ in range(number):
+                await fn()
+            return time.perf_counter() - start
+
+        def timer(number: int) -> float:
+            return loop.run_until_complete(run(number))
+        timer.loop = loop
+        return timer
+
+    def timer(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+    return timer
+
+def measure(fn: Callable, repeat: int = 5, min_time: float = 0.05) -> Dict[str, Any]:
+    """Time fn, picking a loop count so each round takes at least min_time"""
+    timer = _timer(fn)
+    try:
+        # Warm up and calibrate like timeit.autorange
+        number = 1
+        while True:
+            elapsed = timer(number)
+            if elapsed >= min_time or number >= 1_000_000:
+                break
+            number *= 10 if elapsed < min_time / 10 else 2
+
+        per_call = [timer(number) / number for _ in range(repeat)]
+    finally:
+        loop = getattr(timer, "loop", None)
+        if loop is not None:
+            loop.close()
+
+    return {
+        "number": number,
+        "rounds": repeat,
+        "min": min(per_call),
+        "median": statistics.median(per_call),
+        "mean": statistics.mean(per_call),
+        "stdev": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+    }
+
+def run_benchmarks(benchmarks: List[Benchmark], repeat: int = 5, min_time: float = 0.05,
+                   name_filter: Optional[str] = None, max_sizes: Optional[int] = None,
+                   log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Run every selected benchmark case and return a JSON-serializable report"""
+    results = {}
+    for bench in benchmarks:
+        sizes = bench.sizes[:max_sizes] if max_sizes else bench.sizes
+        for size in sizes:
+            name = case_name(bench, size)
+            if name_filter and name_filter not in name:
+                continue
+            fn = bench.factory() if size is None else bench.factory(size)
+            stats = measure(fn, repeat=repeat, min_time=min_time)
+            stats["group"] = bench.group
+            results[name] = stats
+            log(f"{name:<50} {format_seconds(stats['median']):>12}  (±{format_seconds(stats['stdev'])})")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.10) -> Dict[str, Any]:
+    """Compare medians against a baseline report.
+
+    A case regresses when its median is more than threshold slower than the
+    baseline, and improves when it is more than threshold faster.
+    """
+    comparison = {"regressions": [], "improvements": [], "unchanged": [], "new": [], "missing": []}
+    base_results = baseline.get("results", {})
+    for name, stats in current.get("results", {}).items():
+        if name not in base_results:
+            comparison["new"].append(name)
+            continue
+        base = base_results[name]["median"]
+        ratio = stats["median"] / base if base else float("inf")
+        entry = {"name": name, "baseline": base, "current": stats["median"], "ratio": ratio}
+        if ratio > 1 + threshold:
+            comparison["regressions"].append(entry)
+        elif ratio < 1 - threshold:
+            comparison["improvements"].append(entry)
+        else:
+            comparison["unchanged"].append(entry)
+    comparison["missing"] = [name for name in base_results if name not in current.get("results", {})]
+    return comparison
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def save_report(report: Dict[str, Any], path: str):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
@@ -0,0 +1,258 @@
+"""Component micro-benchmarks for the chatbot hot paths.
+
+Runs offline against the fake LLM backend. Examples:
+
+    python benchmarks/run_benchmarks.py --output baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --threshold 0.1
+    python benchmarks/run_benchmarks.py --filter file_agent --quick
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Benchmarks never touch the network or the response cache
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ["CACHE_ENABLED"] = "false"
+os.environ["CACHE_DIR"] = ""
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks import fixtures
+from benchmarks.harness import (
+    benchmark, registered_benchmarks, run_benchmarks, compare,
+    format_seconds, load_report, save_report
+)
+
+_agents = {}
+
+def get_agent(name: str):
+    """Construct agents once, the way MultiAgentChatbot does"""
+    if name not in _agents:
+        from agents.conversational_agent import ConversationalAgent
+        from agents.image_agent import ImageAgent
+        from agents.research_agent import ResearchAgent
+        from agents.file_agent import FileAgent
+        from agents.speech_agent import SpeechAgent
+        classes = {
+            "conversational_agent": ConversationalAgent,
+            "image_agent": ImageAgent,
+            "research_agent": ResearchAgent,
+            "file_agent": FileAgent,
+            "speech_agent": SpeechAgent,
+        }
+        _agents[name] = classes[name]()
+    return _agents[name]
+
+def get_chat_manager():
+    from core.chat_manager import ChatManager
+    manager = ChatManager()
+    for name in ("conversational_agent", "image_agent", "research_agent", "file_agent", "speech_agent"):
+        manager.register_agent(get_agent(name))
+    return manager
+
+# Routing and prompt assembly
+
+@benchmark("chat_manager.select_agents", group="routing")
+def bench_select_agents():
+    manager = get_chat_manager()
+    messages = fixtures.ROUTING_MESSAGES
+
+    async def run():
+        for message in messages:
+            await manager._select_agents(message, {})
+    return run
+
+@benchmark("intent_router.route", group="routing")
+def bench_intent_router():
+    router = get_chat_manager().router
+    messages = fixtures.ROUTING_MESSAGES
+
+    def run():
+        for message in messages:
+            router.route(message)
+    return run
+
+@benchmark("semantic_router.route", group="routing")
+def bench_semantic_router():
+    from core.semantic_router import SemanticRouter
+    router = SemanticRouter()
+    for name in ("conversational_agent", "image_agent", "research_agent", "speech_agent"):
+        agent = get_agent(name)
+        router.add_exemplars(agent.name, agent.routing_exemplars, agent.routing_threshold)
+    messages = fixtures.ROUTING_MESSAGES
+
+    # Message embeddings are cached after the first round, so this times the
+    # similarity search rather than the (fake) embedding call
+    async def run():
+        for message in messages:
+            await router.route(message)
+    return run
+
+@benchmark("conversational_agent.build_prompt", sizes=[0, 10, 1000], group="prompt")
+def bench_build_prompt(turns):
+    from core.conversation_memory import ConversationMemory
+    agent = get_agent("conversational_agent")
+    # Summarization off so the timing is the budgeted walk, not background calls
+    context = {"memory": ConversationMemory.from_history(fixtures.make_history(turns), summarize=False)}
+    return lambda: agent._build_prompt("What did we decide about the budget?", context)
+
+@benchmark("chat_manager.combine_responses", sizes=[1_000, 10_000, 100_000], group="prompt")
+def bench_combine_responses(chars):
+    manager = get_chat_manager()
+    responses = fixtures.make_responses(5, chars)
+
+    async def run():
+        await manager._combine_responses(responses)
+    return run
+
+# Research
+
+_HTML_SIZES = [10, 100, 1000, 10000]
+
+@benchmark("research_agent.html_to_text", sizes=_HTML_SIZES, group="research")
+def bench_html_to_text(paragraphs):
+    agent = get_agent("research_agent")
+    html = fixtures.make_html(paragraphs)
+    return lambda: agent._html_to_text(html)
+
+def _beautifulsoup_html_to_text(html: bytes) -> str:
+    """The original scrape_url pipeline: full parse, then truncate"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = ' '.join(chunk for chunk in chunks if chunk)
+    return text[:5000]
+
+@benchmark("html_to_text.beautifulsoup_baseline", sizes=_HTML_SIZES, group="research")
+def bench_html_to_text_baseline(paragraphs):
+    html = fixtures.make_html(paragraphs)
+    return lambda: _beautifulsoup_html_to_text(html)
+
+# File parsing
+
+@benchmark("file_agent.process_pdf", sizes=[1, 10, 100], group="files")
+def bench_process_pdf(pages):
+    agent = get_agent("file_agent")
+    path = fixtures.make_pdf(pages)
+
+    async def run():
+        await agent.process_pdf(path)
+    return run
+
+@benchmark("file_agent.process_docx", sizes=[100, 1_000, 10_000], group="files")
+def bench_process_docx(paragraphs):
+    agent = get_agent("file_agent")
+    path = fixtures.make_docx(paragraphs)
+
+    async def run():
+        await agent.process_docx(path)
+    return run
+
+@benchmark("file_agent.process_csv", sizes=[1_000, 10_000, 100_000], group="files")
+def bench_process_csv(rows):
+    agent = get_agent("file_agent")
+    path = fixtures.make_csv(rows)
+
+    async def run():
+        await agent.process_csv(path)
+    return run
+
+@benchmark("file_agent.process_excel", sizes=[100, 1_000, 10_000], group="files")
+def bench_process_excel(rows):
+    agent = get_agent("file_agent")
+    path = fixtures.make_xlsx(rows)
+
+    async def run():
+        await agent.process_excel(path)
+    return run
+
+@benchmark("file_agent.process_json", sizes=[100, 1_000, 10_000], group="files")
+def bench_process_json(records):
+    agent = get_agent("file_agent")
+    path = fixtures.make_json(records)
+
+    async def run():
+        await agent.process_json(path)
+    return run
+
+# Images
+
+_IMAGE_SIZES = {"640x480": (640, 480), "1920x1080": (1920, 1080), "4032x3024": (4032, 3024)}
+
+@benchmark("image_agent.decode", sizes=list(_IMAGE_SIZES), group="images")
+def bench_image_decode(size):
+    agent = get_agent("image_agent")
+    data = fixtures.make_image(*_IMAGE_SIZES[size])
+    return lambda: agent._load_image(agent._image_source({"bytes": data})).load()
+
+@benchmark("image_agent.analyze_images", sizes=list(_IMAGE_SIZES), group="images")
+def bench_analyze_images(size):
+    agent = get_agent("image_agent")
+    images = [{"name": "photo.jpg", "bytes": fixtures.make_image(*_IMAGE_SIZES[size])}]
+
+    async def run():
+        await agent.analyze_images(images, "Describe this photo", use_cache=False)
+    return run
+
+@benchmark("image_processor.prepare", sizes=list(_IMAGE_SIZES), group="images")
+def bench_prepare_image(size):
+    from tools.image_processor import ImagePreprocessor
+    # No cache, so every round downsizes and re-encodes
+    preprocessor = ImagePreprocessor(max_cache_bytes=0)
+    data = fixtures.make_image(*_IMAGE_SIZES[size])
+
+    async def run():
+        await preprocessor.prepare(data)
+    return run
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run component micro-benchmarks")
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a stored JSON report")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default: 0.10)")
+    parser.add_argument("--filter", help="Only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per round")
+    parser.add_argument("--quick", action="store_true", help="Only run the two smallest sizes")
+    args = parser.parse_args(argv)
+
+    def log(line: str):
+        print(line, file=sys.stderr)
+
+    report = run_benchmarks(
+        registered_benchmarks(),
+        repeat=args.repeat,
+        min_time=args.min_time,
+        name_filter=args.filter,
+        max_sizes=2 if args.quick else None,
+        log=log
+    )
+
+    exit_code = 0
+    if args.compare:
+        comparison = compare(report, load_report(args.compare), args.threshold)
+        report["comparison"] = comparison
+        for entry in comparison["regressions"]:
+            log(f"REGRESSION  {entry['name']}: {format_seconds(entry['baseline'])} -> "
+                f"{format_seconds(entry['current'])} ({entry['ratio']:.2f}x)")
+        for entry in comparison["improvements"]:
+            log(f"improvement {entry['name']}: {format_seconds(entry['baseline'])} -> "
+                f"{format_seconds(entry['current'])} ({entry['ratio']:.2f}x)")
+        if comparison["regressions"]:
+            exit_code = 1
+
+    if args.output:
+        save_report(report, args.output)
+    else:
+        import json
+        print(json.dumps(report, indent=2))
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
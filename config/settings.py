@@ -1,7 +1,6 @@
 import os
 from dotenv import load_dotenv
 from typing import Dict, Any
-import google.generativeai as genai
 
 load_dotenv()
 
@@ -17,25 +16,112 @@ class Config:
     TTS_MODEL = 'gemini-2.5-flash-preview-tts'
     EMBEDDING_MODEL = 'text-embedding-004'
     
+    # LLM Backend Settings
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')  # gemini, fake or replay
+    LLM_RECORDING_PATH = os.getenv('LLM_RECORDING_PATH')  # Record to (or replay from) this JSONL file
+    FAKE_LLM_LATENCY = float(os.getenv('FAKE_LLM_LATENCY', '0.0'))
+    FAKE_LLM_LATENCY_DISTRIBUTION = os.getenv('FAKE_LLM_LATENCY_DISTRIBUTION', 'constant')
+    FAKE_LLM_TOKEN_RATE = float(os.getenv('FAKE_LLM_TOKEN_RATE', '0.0'))  # Tokens per second, 0 = instant
+    FAKE_LLM_FAILURE_RATE = float(os.getenv('FAKE_LLM_FAILURE_RATE', '0.0'))
+    FAKE_LLM_SEED = int(os.getenv('FAKE_LLM_SEED', '0'))
+    
     # Agent Settings
     MAX_AGENTS = 5
+    ROUTING_MODE = os.getenv('ROUTING_MODE', 'keyword')  # keyword or semantic
+    SEMANTIC_ROUTING_THRESHOLD = 0.6  # Minimum cosine similarity to an agent exemplar
     DEFAULT_TEMPERATURE = 0.7
     MAX_TOKENS = 8192
     
+    # Scheduler Settings (admission control for model and search calls)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    MODEL_REQUESTS_PER_MINUTE = int(os.getenv('MODEL_REQUESTS_PER_MINUTE', '1000'))  # Per model
+    API_KEY_REQUESTS_PER_MINUTE = int(os.getenv('API_KEY_REQUESTS_PER_MINUTE', '2000'))  # Across models
+    MODEL_INITIAL_CONCURRENCY = 8  # Adaptive limit starts here...
+    MODEL_MIN_CONCURRENCY = 2  # ...never drops below this...
+    MODEL_MAX_CONCURRENCY = int(os.getenv('MODEL_MAX_CONCURRENCY', '64'))  # ...nor grows above this
+    MODEL_TARGET_LATENCY = 30.0  # Seconds; slower calls shrink the limit
+    SEARCH_REQUESTS_PER_MINUTE = int(os.getenv('SEARCH_REQUESTS_PER_MINUTE', '100'))
+    SEARCH_MAX_CONCURRENCY = 8
+    SCHEDULER_QUEUE_SIZE = 256  # Waiting calls per lane before new ones are rejected
+    SCHEDULER_QUEUE_TIMEOUT = 30.0  # Seconds a call may wait for a slot
+    MODEL_HEDGING = os.getenv('MODEL_HEDGING', 'false').lower() == 'true'  # Duplicate slow non-streaming calls
+    HEDGE_MIN_DELAY = 2.0  # Seconds; a call is hedged after max(this, the lane's p95 latency)
+    
     # File Settings
     ALLOWED_FILE_TYPES = ['pdf', 'docx', 'txt', 'csv', 'xlsx', 'json', 'md']
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    FILE_PARSE_WORKERS = int(os.getenv('FILE_PARSE_WORKERS', '2'))  # Processes for PDF/Word/CSV/Excel parsing
+    FILE_PARSE_TIMEOUT = 60  # Seconds per file
+    FILE_MAX_CHARS = 100_000  # Stop extracting PDF/Word text after this many characters
+    UPLOAD_DIR = os.getenv('UPLOAD_DIR', '')  # Spool directory for uploads; empty uses the system temp dir
+    UPLOAD_RETENTION = 24 * 60 * 60  # Delete session upload directories idle for 1 day
+    MAX_TABLE_FILE_SIZE = 1024 * 1024 * 1024  # 1GB; CSV/Excel are summarized in chunks
+    TABLE_CHUNK_ROWS = 50_000  # Rows per chunk when summarizing CSV/Excel
+    
+    # Document Retrieval Settings
+    DOCUMENT_RETRIEVAL = os.getenv('DOCUMENT_RETRIEVAL', 'true').lower() == 'true'
+    DOCUMENT_CHUNK_CHARS = 1500
+    DOCUMENT_CHUNK_OVERLAP = 200
+    RETRIEVAL_TOP_K = 8
+    RETRIEVAL_MAX_TOKENS = 3000  # File excerpts per prompt
+    
+    # Conversation Memory Settings
+    MEMORY_MAX_TOKENS = 2000  # Conversation history per prompt
+    MEMORY_SUMMARY_TOKENS = 300  # Length of the rolling summary of older turns
+    MEMORY_SUMMARIZE = os.getenv('MEMORY_SUMMARIZE', 'true').lower() == 'true'
+    
+    # Context Cache Settings
+    CONTEXT_CACHE_ENABLED = os.getenv('CONTEXT_CACHE_ENABLED', 'true').lower() == 'true'
+    CONTEXT_CACHE_TTL = 60 * 60  # Seconds a registered prefix lives without use
+    CONTEXT_CACHE_MIN_TOKENS = 4096  # Smaller prefixes are sent inline (and below Gemini's minimum)
+    CONTEXT_CACHE_MAX_ENTRIES = 16
+    
+    # API Server Settings
+    API_HOST = os.getenv('API_HOST', '0.0.0.0')
+    API_PORT = int(os.getenv('API_PORT', '8080'))
+    SESSION_TTL = int(os.getenv('SESSION_TTL', str(30 * 60)))  # Idle seconds before a session is dropped
+    MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', '1000'))
+    
+    # Image Settings
+    IMAGE_MAX_SIDE = 1536  # Longest side sent to the vision model
+    IMAGE_JPEG_QUALITY = 85
+    IMAGE_CACHE_BYTES = 64 * 1024 * 1024  # Prepared images kept in memory
+    
+    # Speech Settings
+    SPEECH_LANG = 'en'
+    SPEECH_VOICE = 'com'  # gTTS accent, chosen by Google Translate domain (com, co.uk, com.au, ...)
+    SPEECH_SEGMENT_CHARS = 300  # Sentences are grouped into segments up to this length
+    SPEECH_CONCURRENCY = 4  # Segments synthesized at once
+    
+    # Web Settings
+    HTTP_TIMEOUT = 10  # Seconds per request
+    HTTP_MAX_CONNECTIONS = 20
+    HTTP_MAX_CONNECTIONS_PER_HOST = 4
+    SCRAPE_MAX_BYTES = 512 * 1024  # Stop downloading a page after 512KB
     
     # MCP Protocol Settings
     MCP_VERSION = "1.0"
-    MCP_TIMEOUT = 30
+    MCP_TIMEOUT = 30  # Per-agent timeout in seconds
+    TURN_DEADLINE = float(os.getenv('TURN_DEADLINE', '60'))  # Seconds for a whole turn, 0 = none
+    
+    # Cache Settings
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_DIR = os.getenv('CACHE_DIR', '.cache')  # Empty string disables the disk tier
+    CACHE_MAX_ENTRIES = 512
+    CACHE_TTL = 24 * 60 * 60  # 1 day
+    SEARCH_CACHE_TTL = 6 * 60 * 60  # Tavily results for a normalized query
+    PAGE_CACHE_TTL = 60 * 60  # Scraped pages are served without revalidation for 1 hour
+    PAGE_CACHE_RETENTION = 7 * 24 * 60 * 60  # ...and kept for revalidation for 7 days
+    PARSE_CACHE_MAX_ENTRIES = 64  # Parsed documents can be large, so keep fewer in memory
+    PARSE_CACHE_TTL = 7 * 24 * 60 * 60
+    SPEECH_CACHE_TTL = 30 * 24 * 60 * 60
+    BLOB_MEMORY_BYTES = 64 * 1024 * 1024  # Generated media kept in memory before spilling to disk
     
     @classmethod
     def initialize(cls):
-        """Initialize Google AI with API key"""
-        if not cls.GOOGLE_API_KEY:
+        """Validate settings; the Gemini backend configures itself on first use"""
+        if cls.LLM_BACKEND == 'gemini' and not cls.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY not found in environment")
-        genai.configure(api_key=cls.GOOGLE_API_KEY)
         return cls
 
 # Initialize configuration
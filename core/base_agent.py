@@ -1,11 +1,27 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
-import google.generativeai as genai
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable, Awaitable
 from config.settings import config
+from core.llm_backend import get_backend
+from core.context_cache import context_cache
+from core.intent_router import IntentRouter, RoutingRule, RouteMatch
+from core.response_cache import response_cache, make_cache_key
+from core.single_flight import llm_flight
 
 class BaseAgent(ABC):
     """Base class for all agents"""
     
+    # Names of agents whose responses this agent needs; ChatManager runs
+    # those first and passes their output in input_data["dependencies"]
+    depends_on: List[str] = []
+    
+    # Trigger rules ChatManager compiles into its intent router
+    routing_rules: List[RoutingRule] = []
+    
+    # Example messages per intent for semantic routing, and an optional
+    # per-agent similarity threshold overriding SEMANTIC_ROUTING_THRESHOLD
+    routing_exemplars: Dict[str, List[str]] = {}
+    routing_threshold: Optional[float] = None
+    
     def __init__(self, name: str, model: str = None, temperature: float = 0.7):
         self.name = name
         self.model = model or config.DEFAULT_MODEL
@@ -15,25 +31,138 @@ class BaseAgent(ABC):
         self._initialize_model()
         
     def _initialize_model(self):
-        """Initialize the Gemini model"""
-        self.llm = genai.GenerativeModel(
-            model_name=self.model,
-            generation_config={
-                "temperature": self.temperature,
-                "max_output_tokens": config.MAX_TOKENS,
-            }
-        )
+        """Attach the configured LLM backend"""
+        self.generation_config = {
+            "temperature": self.temperature,
+            "max_output_tokens": config.MAX_TOKENS,
+        }
+        self.backend = get_backend()
         
     @abstractmethod
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process input and return response"""
         pass
     
+    async def process_stream(self, input_data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Process input as a stream of events.
+        
+        Yields {"type": "chunk", "text": ...} events while text is produced and
+        finishes with a single {"type": "response", "response": ...} event that
+        carries the full response. Agents that call the LLM override this to
+        stream tokens; the default emits the whole text once. Agents that
+        produce speech may also yield {"type": "audio", "audio": ...} chunks.
+        """
+        response = await self.process(input_data)
+        if response.get("text"):
+            yield {"type": "chunk", "text": response["text"]}
+        yield {"type": "response", "response": response}
+    
+    def route(self, input_data: Dict[str, Any]) -> Optional[RouteMatch]:
+        """Return this agent's routing match for the message.
+        
+        Uses the match ChatManager computed for the turn when present, and
+        otherwise evaluates the agent's own rules.
+        """
+        routing = input_data.get("routing")
+        if routing is None:
+            if not hasattr(self, "_router"):
+                self._router = IntentRouter(self.routing_rules)
+            routing = self._router.route(input_data.get("message", ""))
+        return routing.get(self.name)
+    
     def add_tool(self, tool):
         """Add a tool to the agent"""
         self.tools.append(tool)
         
-    async def think(self, prompt: str) -> str:
+    def use_cache(self, input_data: Dict[str, Any]) -> bool:
+        """Whether this request may be served from the response cache.
+        
+        Callers opt out per request by setting context["bypass_cache"].
+        """
+        return not input_data.get("context", {}).get("bypass_cache", False)
+        
+    async def think(self, prompt: str, use_cache: bool = True) -> str:
         """Generate response using LLM"""
-        response = await self.llm.generate_content_async(prompt)
-        return response.text
\ No newline at end of file
+        async def generate() -> str:
+            return await self.backend.generate(self.model, [prompt], self.generation_config)
+            
+        return await self.cached_generate(self.model, self.generation_config, [prompt], generate, use_cache)
+        
+    async def think_stream(self, prompt: str, use_cache: bool = True) -> AsyncIterator[str]:
+        """Generate response using LLM, yielding text chunks as they arrive"""
+        key = make_cache_key(self.model, self.generation_config, [prompt])
+        if use_cache and config.CACHE_ENABLED:
+            cached = await response_cache.aget(key)
+            if cached is not None:
+                yield cached
+                return
+        elif config.CACHE_ENABLED:
+            response_cache.record_bypass()
+            
+        # Concurrent identical requests share one stream, each replaying it from the start
+        parts = []
+        async for chunk in llm_flight.stream(
+            key, lambda: self.backend.stream(self.model, [prompt], self.generation_config)
+        ):
+            parts.append(chunk)
+            yield chunk
+                
+        if config.CACHE_ENABLED:
+            response_cache.set(key, "".join(parts))
+        
+    async def think_with_context(self, key: str, context_parts: List[Any], prompt: str,
+                                 system_instruction: Optional[str] = None, tags: Optional[List[str]] = None,
+                                 scope: Optional[str] = None, use_cache: bool = True) -> Optional[str]:
+        """Answer prompt after a large, stable prefix registered once with the backend.
+        
+        key must change whenever the prefix content does (e.g. built from file
+        content hashes). Returns None when the prefix is not cached (disabled,
+        too small or a backend error) so the caller can build its own prompt.
+        """
+        if not config.CONTEXT_CACHE_ENABLED:
+            return None
+        try:
+            handle = await context_cache.get(self.model, key, context_parts, system_instruction, tags or (), scope)
+        except Exception as e:
+            print(f"Context cache error, sending prompt inline: {e}")
+            return None
+        if handle is None:
+            return None
+            
+        async def generate() -> str:
+            return await self.backend.generate_with_context(self.model, handle, [prompt], self.generation_config)
+            
+        try:
+            # The key names the prefix content, so it stands in for it in the response cache
+            return await self.cached_generate(self.model, self.generation_config,
+                                              [f"context:{key}", prompt], generate, use_cache)
+        except Exception as e:
+            # Typically the backend expired the context early; register it again next turn
+            print(f"Cached context request failed, sending prompt inline: {e}")
+            context_cache.discard(self.model, key)
+            return None
+        
+    async def cached_generate(self, model: str, generation_config: Optional[Dict[str, Any]],
+                              parts: List[Any], generate: Callable[[], Awaitable[str]],
+                              use_cache: bool = True) -> str:
+        """Return a cached response for these prompt parts, or call generate and cache it.
+        
+        Concurrent identical requests share one generate() call.
+        """
+        key = make_cache_key(model, generation_config, parts)
+        if config.CACHE_ENABLED:
+            if use_cache:
+                cached = await response_cache.aget(key)
+                if cached is not None:
+                    return cached
+            else:
+                response_cache.record_bypass()
+                
+        async def generate_and_store() -> str:
+            text = await generate()
+            # Bypassed requests still refresh the cache with the new answer
+            if config.CACHE_ENABLED:
+                response_cache.set(key, text)
+            return text
+            
+        return await llm_flight.do(key, generate_and_store)
@@ -0,0 +1,89 @@
+from typing import Dict, Any, Optional, Union
+from collections import OrderedDict
+from pathlib import Path
+import asyncio
+import hashlib
+import tempfile
+import threading
+from config.settings import config
+
+class BlobStore:
+    """Content-addressed store for generated media.
+
+    Agents put raw bytes and get back a small reference,
+    {"blob": <sha256>, "mime_type", "size"}, which is what responses and
+    chat history carry instead of base64 strings. Recent blobs stay in a
+    memory LRU bounded by total bytes; evicted ones spill to disk and are
+    read back on demand. Identical content is stored once.
+    """
+
+    def __init__(self, max_memory_bytes: Optional[int] = None, directory: Optional[str] = None):
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else config.BLOB_MEMORY_BYTES
+        self.directory = Path(directory or _blob_dir())
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "deduped": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "spilled": 0}
+
+    def put(self, data: bytes, mime_type: str = "application/octet-stream") -> Dict[str, Any]:
+        """Store bytes and return a reference to them"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self.stats["puts"] += 1
+            if digest in self._memory or self._path(digest).exists():
+                self.stats["deduped"] += 1
+            else:
+                self._memory[digest] = bytes(data)
+                self._memory_bytes += len(data)
+                self._evict()
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+        return {"blob": digest, "mime_type": mime_type, "size": len(data)}
+
+    async def aput(self, data: bytes, mime_type: str = "application/octet-stream") -> Dict[str, Any]:
+        """put() for async code: the dedupe check and any spill to disk run off the event loop"""
+        return await asyncio.to_thread(self.put, data, mime_type)
+
+    def get(self, ref: Union[str, Dict[str, Any]]) -> Optional[bytes]:
+        """Bytes for a reference (or bare hash), or None when unknown"""
+        digest = ref["blob"] if isinstance(ref, dict) else ref
+        with self._lock:
+            data = self._memory.get(digest)
+            if data is not None:
+                self._memory.move_to_end(digest)
+                self.stats["memory_hits"] += 1
+                return data
+        try:
+            data = self._path(digest).read_bytes()
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        return data
+
+    def _evict(self):
+        """Spill least recently used blobs to disk until memory fits the budget"""
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            digest, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            path = self._path(digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                partial = path.with_suffix(".part")
+                partial.write_bytes(data)
+                partial.replace(path)
+            self.stats["spilled"] += 1
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get("blob"), str)
+
+def _blob_dir() -> str:
+    if config.CACHE_DIR:
+        return str(Path(config.CACHE_DIR) / "blobs")
+    return str(Path(tempfile.gettempdir()) / "multi_agent_chatbot_blobs")
+
+# Shared store so every agent and the UI resolve the same references
+blob_store = BlobStore()
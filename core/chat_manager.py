@@ -1,66 +1,392 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, TypeVar
 import asyncio
+import time
 from core.base_agent import BaseAgent
+from core.intent_router import IntentRouter, RouteMatch
+from core.semantic_router import SemanticRouter
 from core.mcp_protocol import MCPProtocol
+from core.scheduler import OverloadedError, OVERLOADED_MESSAGE
+from core import deadline
+from config.settings import config
+
+T = TypeVar("T")
+
+# Why a turn stopped early, as reported in agent errors
+INTERRUPTIONS = {
+    "deadline": "Turn deadline exceeded",
+    "superseded": "Superseded by a newer message",
+    "cancelled": "Cancelled",
+}
+DEADLINE_MESSAGE = "I ran out of time on part of this request, so this answer may be incomplete."
 
 class ChatManager:
     """Manages multiple agents and orchestrates conversations"""
     
-    def __init__(self):
+    def __init__(self, concurrent: bool = True, agent_timeout: Optional[float] = None,
+                 routing_mode: Optional[str] = None, turn_deadline: Optional[float] = None):
         self.agents: Dict[str, BaseAgent] = {}
         self.mcp_protocol = MCPProtocol()
         self.conversation_state = {}
         self.active_agents = []
+        self.concurrent = concurrent
+        self.agent_timeout = agent_timeout or config.MCP_TIMEOUT
+        self.turn_deadline = config.TURN_DEADLINE if turn_deadline is None else turn_deadline
+        self.router = IntentRouter()
+        self.routing_mode = routing_mode or config.ROUTING_MODE
+        self.semantic_router = SemanticRouter() if self.routing_mode == 'semantic' else None
         
     def register_agent(self, agent: BaseAgent):
-        """Register an agent"""
+        """Register an agent and compile its routing rules"""
         self.agents[agent.name] = agent
+        self.router.add_rules(agent.routing_rules)
+        if self.semantic_router is not None and agent.routing_exemplars:
+            self.semantic_router.add_exemplars(agent.name, agent.routing_exemplars, agent.routing_threshold)
+        
+    async def process_message(self, message: str, context: Dict[str, Any],
+                              state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Process user message through appropriate agents.
         
-    async def process_message(self, message: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Process user message through appropriate agents"""
-        # Determine which agents to activate
-        activated_agents = await self._select_agents(message, context)
-        
-        # Process through agents
-        responses = []
-        for agent_name in activated_agents:
-            agent = self.agents[agent_name]
-            response = await agent.process({
-                "message": message,
-                "context": context,
-                "state": self.conversation_state
-            })
-            responses.append(response)
+        state holds the caller's conversation state (last message and
+        response); servers pass one per session so the agents, which keep no
+        per-conversation state themselves, can be shared. Defaults to the
+        manager's own conversation_state.
+        
+        The turn has a deadline (turn_deadline seconds, or an earlier one
+        already set by the caller) that every agent, model call and fetch made
+        for it observes. A turn that runs out of time, or is superseded by a
+        newer turn for the same state, returns what its agents produced so far.
+        """
+        with deadline.scope(deadline.after(self.turn_deadline)):
+            # Determine which agents to activate
+            routes = await self._route(message)
+            activated_agents = await self._select_agents(message, context, routes)
+            self.active_agents = activated_agents
+            turn = self._turn(message, context, routes, state)
             
+            try:
+                # Process through agents
+                if self.concurrent:
+                    results = await self._run_concurrent(activated_agents, turn)
+                else:
+                    results = await self._run_sequential(activated_agents, turn)
+                    
+                return await self._finalize(turn, activated_agents, results)
+            finally:
+                self._end_turn(turn)
+    
+    async def process_message_stream(self, message: str, context: Dict[str, Any],
+                                     state: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Process user message, yielding text chunks from agents as they arrive.
+        
+        Yields {"type": "chunk", "agent": ..., "text": ...} events interleaved
+        across the active agents, {"type": "audio", "agent": ..., "audio": ...}
+        events as speech segments are synthesized, then one
+        {"type": "response", "response": ...} event with the same combined
+        response process_message returns.
+        """
+        # The deadline scope must not span a yield, so the agents get their
+        # own scope inside the runner task
+        with deadline.scope(deadline.after(self.turn_deadline)):
+            routes = await self._route(message)
+            activated_agents = await self._select_agents(message, context, routes)
+            self.active_agents = activated_agents
+            turn = self._turn(message, context, routes, state)
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def run_all() -> Dict[str, Dict[str, Any]]:
+            try:
+                with deadline.scope(turn["deadline"]):
+                    if self.concurrent:
+                        return await self._run_concurrent(activated_agents, turn, queue)
+                    return await self._run_sequential(activated_agents, turn, queue)
+            finally:
+                queue.put_nowait(None)
+                
+        runner = asyncio.ensure_future(run_all())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+            results = await runner
+        finally:
+            # Stop agent work if the consumer goes away mid-stream
+            runner.cancel()
+            self._end_turn(turn)
+            
+        yield {"type": "response", "response": await self._finalize(turn, activated_agents, results)}
+    
+    def _turn(self, message: str, context: Dict[str, Any], routes: Dict[str, RouteMatch],
+              state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Start a turn, superseding any turn still running for the same state"""
+        state = self.conversation_state if state is None else state
+        self.cancel_turn(state, "superseded")
+        turn = {
+            "message": message,
+            "context": context,
+            "routing": routes,
+            "state": state,
+            "deadline": deadline.current(),
+            "started": time.perf_counter(),
+            "cancel": asyncio.Event(),
+            "interrupted": None,
+            "partial": {}  # Text each streaming agent has produced so far
+        }
+        state["active_turn"] = turn
+        return turn
+    
+    def cancel_turn(self, state: Optional[Dict[str, Any]] = None, reason: str = "cancelled") -> bool:
+        """Stop the turn running for state; its caller still gets the partial response.
+        
+        Returns False when no turn is running. Call from the event loop the
+        turn runs on.
+        """
+        state = self.conversation_state if state is None else state
+        turn = state.get("active_turn")
+        if turn is None or turn["cancel"].is_set():
+            return False
+        turn["interrupted"] = reason
+        turn["cancel"].set()
+        return True
+    
+    def _end_turn(self, turn: Dict[str, Any]):
+        if turn["state"].get("active_turn") is turn:
+            del turn["state"]["active_turn"]
+    
+    async def _finalize(self, turn: Dict[str, Any], activated_agents: List[str],
+                        results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine agent results and update conversation state"""
+        # Keep activation order so the combined text is deterministic
+        responses = [results[name]["response"] for name in activated_agents]
+        
         # Combine responses
         final_response = await self._combine_responses(responses)
+        final_response["metadata"]["timings"] = {
+            name: results[name]["elapsed"] for name in activated_agents
+        }
+        errors = {name: results[name]["error"] for name in activated_agents if results[name]["error"]}
+        if errors:
+            final_response["metadata"]["errors"] = errors
+        # Agents turned away by admission control get one friendly note instead of silence
+        if any(results[name].get("overloaded") for name in activated_agents):
+            final_response["text"] += OVERLOADED_MESSAGE + "\n"
+        if turn["interrupted"]:
+            final_response["metadata"]["interrupted"] = turn["interrupted"]
+            if turn["interrupted"] == "deadline":
+                final_response["text"] += DEADLINE_MESSAGE + "\n"
         
-        # Update conversation state
-        self.conversation_state["last_message"] = message
-        self.conversation_state["last_response"] = final_response
+        # A superseded turn must not overwrite the state of the turn that replaced it
+        if turn["interrupted"] != "superseded":
+            turn["state"]["last_message"] = turn["message"]
+            turn["state"]["last_response"] = final_response
         
         return final_response
     
-    async def _select_agents(self, message: str, context: Dict[str, Any]) -> List[str]:
-        """Select appropriate agents based on message content"""
-        agents_to_activate = []
+    async def _run_sequential(self, agent_names: List[str], turn: Dict[str, Any],
+                              queue: Optional[asyncio.Queue] = None) -> Dict[str, Dict[str, Any]]:
+        """Run agents one after another, each after its dependencies"""
+        results = {}
+        for agent_name in self._dependency_order(agent_names):
+            result = await self._until_interrupted(turn, self._run_agent(agent_name, turn, results, queue))
+            if result is None:
+                break
+            results[agent_name] = result
+        return self._fill_interrupted(agent_names, turn, results)
+    
+    async def _run_concurrent(self, agent_names: List[str], turn: Dict[str, Any],
+                              queue: Optional[asyncio.Queue] = None) -> Dict[str, Dict[str, Any]]:
+        """Run independent agents together, waiting only on declared dependencies"""
+        results: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
         
-        # Analyze message for agent activation
-        if any(keyword in message.lower() for keyword in ['image', 'picture', 'generate', 'create']):
-            agents_to_activate.append('image_agent')
+        async def run(agent_name: str) -> Dict[str, Any]:
+            # Dependencies that were not activated this turn are ignored
+            dependencies = [
+                tasks[dep] for dep in self.agents[agent_name].depends_on
+                if dep in tasks and dep != agent_name
+            ]
+            if dependencies:
+                await asyncio.gather(*dependencies)
+            result = await self._run_agent(agent_name, turn, results, queue)
+            results[agent_name] = result
+            return result
+        
+        for agent_name in self._dependency_order(agent_names):
+            tasks[agent_name] = asyncio.ensure_future(run(agent_name))
             
-        if any(keyword in message.lower() for keyword in ['search', 'find', 'research', 'web']):
-            agents_to_activate.append('research_agent')
+        try:
+            await self._until_interrupted(turn, asyncio.gather(*tasks.values()))
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return self._fill_interrupted(agent_names, turn, results)
+    
+    async def _until_interrupted(self, turn: Dict[str, Any], work: Awaitable[T]) -> Optional[T]:
+        """Await work until it finishes, the turn is cancelled or its deadline passes.
+        
+        Returns None once interrupted work has been cancelled.
+        """
+        task = asyncio.ensure_future(work)
+        cancelled = asyncio.ensure_future(turn["cancel"].wait())
+        try:
+            await asyncio.wait({task, cancelled}, timeout=deadline.remaining(),
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            cancelled.cancel()
+            if not task.done():
+                task.cancel()
+        if not task.done() or task.cancelled():
+            # Let the agents unwind so their partial output is recorded
+            await asyncio.gather(task, return_exceptions=True)
+            turn["interrupted"] = turn["interrupted"] or "deadline"
+            return None
+        return task.result()
+    
+    def _fill_interrupted(self, agent_names: List[str], turn: Dict[str, Any],
+                          results: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Give agents stopped by an interruption a result holding whatever they produced"""
+        for agent_name in agent_names:
+            if agent_name not in results:
+                results[agent_name] = {
+                    "response": self._partial_response(agent_name, turn),
+                    "elapsed": time.perf_counter() - turn["started"],
+                    "error": INTERRUPTIONS.get(turn["interrupted"], turn["interrupted"]),
+                    "overloaded": False
+                }
+        return results
+    
+    def _partial_response(self, agent_name: str, turn: Dict[str, Any]) -> Dict[str, Any]:
+        """Response for an agent that did not finish: the text it streamed so far, if any"""
+        text = "".join(turn["partial"].get(agent_name, []))
+        if not text:
+            return {"metadata": {"agent": agent_name}}
+        return {"text": text, "metadata": {"agent": agent_name, "partial": True}}
+    
+    async def _run_agent(self, agent_name: str, turn: Dict[str, Any],
+                         results: Dict[str, Dict[str, Any]],
+                         queue: Optional[asyncio.Queue] = None) -> Dict[str, Any]:
+        """Run a single agent within its timeout and the turn deadline, recording its timing.
+        
+        When a queue is given the agent is run through process_stream and its
+        text chunks are forwarded to the queue tagged with the agent name.
+        """
+        agent = self.agents[agent_name]
+        input_data = {
+            **turn,
+            "dependencies": {
+                dep: results[dep]["response"] for dep in agent.depends_on if dep in results
+            }
+        }
+        
+        error = None
+        overloaded = False
+        start = time.perf_counter()
+        try:
+            # Raises at once when the turn has no time left
+            timeout = deadline.timeout(self.agent_timeout)
+            if queue is None:
+                work = agent.process(input_data)
+            else:
+                work = self._drain_stream(agent, input_data, queue, turn)
+            response = await asyncio.wait_for(work, timeout=timeout)
+        except asyncio.TimeoutError:
+            if deadline.expired():
+                turn["interrupted"] = turn["interrupted"] or "deadline"
+                error = INTERRUPTIONS["deadline"]
+            else:
+                error = f"Timed out after {self.agent_timeout}s"
+            response = self._partial_response(agent_name, turn)
+        except OverloadedError as e:
+            error = e.detail or str(e)
+            overloaded = True
+            response = {"metadata": {"agent": agent_name}}
+        except Exception as e:
+            if not self.concurrent:
+                raise
+            error = str(e)
+            response = {"metadata": {"agent": agent_name}}
+        elapsed = time.perf_counter() - start
+        
+        return {"response": response, "elapsed": elapsed, "error": error, "overloaded": overloaded}
+    
+    async def _drain_stream(self, agent: BaseAgent, input_data: Dict[str, Any],
+                            queue: asyncio.Queue, turn: Dict[str, Any]) -> Dict[str, Any]:
+        """Forward an agent's streamed text and audio chunks to the queue and return its response"""
+        response = {"metadata": {"agent": agent.name}}
+        partial = turn["partial"].setdefault(agent.name, [])
+        async for event in agent.process_stream(input_data):
+            if event["type"] == "chunk":
+                partial.append(event["text"])
+                queue.put_nowait({"type": "chunk", "agent": agent.name, "text": event["text"]})
+            elif event["type"] == "audio":
+                queue.put_nowait({"type": "audio", "agent": agent.name, "audio": event["audio"]})
+            elif event["type"] == "response":
+                response = event["response"]
+        return response
+    
+    def _dependency_order(self, agent_names: List[str]) -> List[str]:
+        """Order agents so that every agent comes after its dependencies"""
+        ordered = []
+        visiting = set()
+        
+        def visit(agent_name: str):
+            if agent_name in ordered:
+                return
+            if agent_name in visiting:
+                raise ValueError(f"Circular agent dependency involving: {agent_name}")
+            visiting.add(agent_name)
+            for dep in self.agents[agent_name].depends_on:
+                if dep in agent_names:
+                    visit(dep)
+            visiting.discard(agent_name)
+            ordered.append(agent_name)
             
-        if context.get('files'):
-            agents_to_activate.append('file_agent')
+        for agent_name in agent_names:
+            visit(agent_name)
+        return ordered
+    
+    async def _route(self, message: str) -> Dict[str, RouteMatch]:
+        """Match the message to agents.
+        
+        Keyword mode evaluates every agent's trigger rules in one pass. Semantic
+        mode compares the message embedding with agent exemplars and falls back
+        to the keyword rules when no agent clears its threshold.
+        """
+        if self.semantic_router is not None:
+            try:
+                routes = await self.semantic_router.route(message)
+            except Exception as e:
+                print(f"Semantic routing error: {e}")
+                routes = {}
+                
+            # Specialists that score below plain conversation are not activated
+            baseline = routes.get('conversational_agent')
+            if baseline is not None:
+                routes = {name: match for name, match in routes.items() if match.score >= baseline.score}
+            if routes:
+                return routes
+                
+        return self.router.route(message)
+    
+    async def _select_agents(self, message: str, context: Dict[str, Any],
+                             routes: Optional[Dict[str, RouteMatch]] = None) -> List[str]:
+        """Select appropriate agents based on message content"""
+        if routes is None:
+            routes = await self._route(message)
             
-        if any(keyword in message.lower() for keyword in ['speak', 'say', 'voice', 'audio']):
-            agents_to_activate.append('speech_agent')
+        agents_to_activate = []
+        for agent_name in self.agents:
+            if agent_name in routes:
+                agents_to_activate.append(agent_name)
+            elif agent_name == 'file_agent' and context.get('files'):
+                agents_to_activate.append(agent_name)
             
-        # Always include conversational agent
-        if 'conversational_agent' not in agents_to_activate:
-            agents_to_activate.append('conversational_agent')
+        # Always include conversational agent, last
+        if 'conversational_agent' in agents_to_activate:
+            agents_to_activate.remove('conversational_agent')
+        agents_to_activate.append('conversational_agent')
             
         return agents_to_activate
     
@@ -86,4 +412,4 @@ class ChatManager:
             if response.get("metadata"):
                 combined["metadata"].update(response["metadata"])
                 
-        return combined
\ No newline at end of file
+        return combined
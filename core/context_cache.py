@@ -0,0 +1,149 @@
+from typing import Dict, Any, List, Optional, Iterable
+from collections import OrderedDict
+import asyncio
+import time
+from config.settings import config
+from core.llm_backend import LLMBackend, get_backend
+from core.tokens import estimate_tokens
+
+class ContextCache:
+    """Registers large, stable prompt prefixes with the backend once.
+
+    Agents name a prefix (e.g. by the content hashes of the documents in it)
+    and get back a backend handle that later calls reference instead of
+    re-sending the prefix, so per-turn input no longer grows with document
+    size. Handles are renewed while in use, dropped at their TTL, evicted
+    LRU beyond max_entries, and invalidated by tag when a file changes or
+    goes away. Prefixes below min_tokens are not worth caching and are
+    left for the caller to send inline.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, min_tokens: Optional[int] = None,
+                 max_entries: Optional[int] = None, backend: Optional[LLMBackend] = None):
+        self.ttl = ttl or config.CONTEXT_CACHE_TTL
+        self.min_tokens = min_tokens if min_tokens is not None else config.CONTEXT_CACHE_MIN_TOKENS
+        self.max_entries = max_entries or config.CONTEXT_CACHE_MAX_ENTRIES
+        self._backend = backend
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._creating: Dict[str, asyncio.Future] = {}
+        self.stats = {"created": 0, "hits": 0, "renewed": 0, "too_small": 0,
+                      "expired": 0, "invalidated": 0, "errors": 0}
+
+    @property
+    def backend(self) -> LLMBackend:
+        return self._backend or get_backend()
+
+    async def get(self, model: str, key: str, parts: List[Any], system_instruction: Optional[str] = None,
+                  tags: Iterable[str] = (), scope: Optional[str] = None) -> Optional[str]:
+        """Handle for the prefix named key, registering it on first use.
+
+        Returns None when the prefix is too small to cache. A new key for an
+        existing scope (the same set of files with changed content) replaces
+        the old entry.
+        """
+        cache_key = f"{model}:{key}"
+        entry = self._entries.get(cache_key)
+        now = time.time()
+        if entry is not None and entry["expires"] <= now:
+            self.stats["expired"] += 1
+            self._drop(cache_key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(cache_key)
+            self.stats["hits"] += 1
+            if entry["expires"] - now < self.ttl / 2:
+                # Sliding expiry: renew at most once per half TTL while in use
+                await self.backend.extend_cached_context(entry["handle"], self.ttl)
+                entry["expires"] = now + self.ttl
+                self.stats["renewed"] += 1
+            return entry["handle"]
+
+        size = sum(estimate_tokens(part) for part in parts if isinstance(part, str))
+        if system_instruction:
+            size += estimate_tokens(system_instruction)
+        if size < self.min_tokens:
+            self.stats["too_small"] += 1
+            return None
+
+        # Concurrent turns registering the same prefix share one request
+        # (futures cannot be awaited from another thread's event loop)
+        creating = self._creating.get(cache_key)
+        if creating is not None and creating.get_loop() is asyncio.get_running_loop():
+            return await asyncio.shield(creating)
+
+        future = asyncio.get_running_loop().create_future()
+        self._creating[cache_key] = future
+        try:
+            expires = time.time() + self.ttl
+            handle = await self.backend.create_cached_context(model, parts, self.ttl, system_instruction)
+            self.stats["created"] += 1
+            if scope is not None:
+                for stale in [k for k, e in self._entries.items() if e["scope"] == scope]:
+                    self.stats["invalidated"] += 1
+                    self._drop(stale)
+            self._entries[cache_key] = {
+                "handle": handle, "expires": expires, "tags": set(tags), "scope": scope,
+                "loop": asyncio.get_running_loop()
+            }
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            future.set_result(handle)
+            return handle
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            future.set_exception(e)
+            # Nobody else may be waiting; keep the exception from being logged
+            future.exception()
+            raise
+        finally:
+            if self._creating.get(cache_key) is future:
+                del self._creating[cache_key]
+
+    def discard(self, model: str, key: str):
+        """Forget a prefix whose handle the backend no longer accepts"""
+        self._drop(f"{model}:{key}")
+
+    def invalidate(self, tag: str) -> int:
+        """Drop every prefix tagged with tag (e.g. a file's content hash)"""
+        stale = [key for key, entry in self._entries.items() if tag in entry["tags"]]
+        for key in stale:
+            self._drop(key)
+        self.stats["invalidated"] += len(stale)
+        return len(stale)
+
+    def _drop(self, cache_key: str):
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        # Delete on the loop that created the handle, where the backend's
+        # clients live; from elsewhere (e.g. a UI callback) it runs on that
+        # loop's next iteration
+        loop = entry["loop"]
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(self._delete(entry["handle"]))
+            return
+        delete = self._delete(entry["handle"])
+        try:
+            asyncio.run_coroutine_threadsafe(delete, loop)
+        except RuntimeError:
+            # The loop is closed; the backend drops the handle at its TTL
+            delete.close()
+
+    async def _delete(self, handle: str):
+        try:
+            await self.backend.delete_cached_context(handle)
+        except Exception as e:
+            print(f"Context cache delete error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._entries)}
+
+# Shared cache so every agent reuses the prefixes registered for a session's files
+context_cache = ContextCache()
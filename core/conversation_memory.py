@@ -0,0 +1,199 @@
+from typing import Dict, Any, List, Optional
+from collections import deque
+from dataclasses import dataclass
+import asyncio
+import concurrent.futures
+import threading
+from config.settings import config
+from core.llm_backend import LLMBackend, get_backend
+from core.scheduler import priority, BACKGROUND
+from core.tokens import estimate_tokens
+
+@dataclass
+class Turn:
+    """One history entry with its token count, computed once"""
+    role: str
+    text: str
+    tokens: int
+
+    @property
+    def line(self) -> str:
+        return f"{self.role}: {self.text}"
+
+class ConversationMemory:
+    """Token-budgeted conversation history with a rolling summary.
+
+    Turns are stored with their token counts, so building a prompt walks
+    back from the newest turn only until the budget is spent; its cost does
+    not grow with the length of the conversation. Once the stored turns
+    exceed the budget, the oldest ones are folded into a running summary by
+    a background task and dropped (or simply dropped when summarization is
+    off or fails), so memory stays bounded too.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, summary_tokens: Optional[int] = None,
+                 summarize: Optional[bool] = None, backend: Optional[LLMBackend] = None,
+                 model: Optional[str] = None):
+        self.max_tokens = max_tokens or config.MEMORY_MAX_TOKENS
+        self.summary_tokens = summary_tokens or config.MEMORY_SUMMARY_TOKENS
+        self.summarize = summarize if summarize is not None else config.MEMORY_SUMMARIZE
+        self._backend = backend
+        self.model = model or config.DEFAULT_MODEL
+        self.turns: deque = deque()
+        self.total_tokens = 0
+        self.summary = ""
+        self._summary_task: Optional[asyncio.Future] = None
+        self._lock = threading.Lock()
+        self.stats = {"turns": 0, "summaries": 0, "summary_errors": 0, "turns_folded": 0}
+
+    @property
+    def backend(self) -> LLMBackend:
+        return self._backend or get_backend()
+
+    @classmethod
+    def from_history(cls, history: List[str], **kwargs) -> "ConversationMemory":
+        """Build a memory from "Role: text" history lines"""
+        memory = cls(**kwargs)
+        for line in history:
+            role, _, text = line.partition(": ")
+            memory.add(role, text)
+        return memory
+
+    def add(self, role: str, text: str):
+        """Record one turn"""
+        turn = Turn(role=role, text=text, tokens=estimate_tokens(text) + 2)
+        with self._lock:
+            self.turns.append(turn)
+            self.total_tokens += turn.tokens
+            self.stats["turns"] += 1
+            if not self.summarize:
+                # Without summaries, turns outside the budget can never reach a prompt
+                while self.total_tokens > self.max_tokens and len(self.turns) > 1:
+                    self.total_tokens -= self.turns.popleft().tokens
+        if self.total_tokens > self.max_tokens:
+            self._schedule_summary()
+
+    def add_exchange(self, user_message: str, assistant_message: str):
+        """Record a user message and the assistant's reply"""
+        self.add("User", user_message)
+        self.add("Assistant", assistant_message)
+
+    @property
+    def history(self) -> List[str]:
+        """Stored turns as "Role: text" lines (older turns may be summarized away)"""
+        return [turn.line for turn in self.turns]
+
+    def build_context(self, max_tokens: Optional[int] = None) -> str:
+        """Summary plus the newest turns that fit in max_tokens"""
+        budget = (max_tokens or self.max_tokens) - (estimate_tokens(self.summary) if self.summary else 0)
+        lines = []
+        with self._lock:
+            for turn in reversed(self.turns):
+                if turn.tokens > budget:
+                    break
+                lines.append(turn.line)
+                budget -= turn.tokens
+        lines.reverse()
+
+        sections = []
+        if self.summary:
+            sections.append(f"Summary of earlier conversation:\n{self.summary}")
+        if lines:
+            sections.append("Previous conversation:\n" + "\n".join(lines))
+        return "\n\n".join(sections)
+
+    def build_prompt(self, message: str, max_tokens: Optional[int] = None) -> str:
+        """Prompt with the budgeted history followed by the new message"""
+        history = self.build_context(max_tokens)
+        if not history:
+            return f"User: {message}\n"
+        return f"{history}\n\nUser: {message}\n"
+
+    def clear(self):
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+        with self._lock:
+            self.turns.clear()
+            self.total_tokens = 0
+            self.summary = ""
+
+    def _schedule_summary(self):
+        """Fold the oldest turns into the summary without blocking the caller"""
+        if not self.summarize or (self._summary_task is not None and not self._summary_task.done()):
+            return
+        try:
+            self._summary_task = asyncio.get_running_loop().create_task(self._fold_oldest())
+        except RuntimeError:
+            # Called outside a loop (e.g. Streamlit's script thread); summarize on
+            # the background loop that already serves ingestion's model calls
+            from core.ingestion import ingestion_pipeline
+            self._summary_task = ingestion_pipeline.run_background(self._fold_oldest())
+
+    async def _fold_oldest(self):
+        # Keep about half the budget as verbatim recent turns
+        keep = self.max_tokens // 2
+        folded: List[Turn] = []
+        with self._lock:
+            remaining = self.total_tokens
+            for turn in self.turns:
+                if remaining <= keep:
+                    break
+                folded.append(turn)
+                remaining -= turn.tokens
+        if not folded:
+            return
+
+        transcript = "\n".join(turn.line for turn in folded)
+        prompt = (
+            f"Update the running summary of a conversation with the new lines below. "
+            f"Keep facts, names, decisions and open questions. "
+            f"Reply with the summary only, under {self.summary_tokens * 3 // 4} words.\n\n"
+            f"Current summary:\n{self.summary or '(none)'}\n\nNew lines:\n{transcript}"
+        )
+        try:
+            # Summaries yield to interactive requests under load
+            with priority(BACKGROUND):
+                summary = await self.backend.generate(
+                    self.model, [prompt], {"temperature": 0.2, "max_output_tokens": self.summary_tokens}
+                )
+        except Exception as e:
+            self.stats["summary_errors"] += 1
+            print(f"Conversation summary error, dropping oldest turns: {e}")
+            # Stay within the budget even without a summary
+            with self._lock:
+                self._drop_folded(folded)
+            return
+
+        # Turns added while summarizing are kept; only the folded ones are dropped
+        with self._lock:
+            if self._drop_folded(folded):
+                self.summary = summary.strip()
+                self.stats["summaries"] += 1
+                self.stats["turns_folded"] += len(folded)
+
+    def _drop_folded(self, folded: List[Turn]) -> bool:
+        """Remove the folded turns from the front (called with the lock held); False if cleared meanwhile"""
+        if not self.turns or self.turns[0] is not folded[0]:
+            return False
+        for turn in folded:
+            if self.turns and self.turns[0] is turn:
+                self.turns.popleft()
+                self.total_tokens -= turn.tokens
+        return True
+
+    async def wait_for_summary(self):
+        """Wait for a pending background summary (for tests and shutdown)"""
+        task = self._summary_task
+        if task is None:
+            return
+        if isinstance(task, concurrent.futures.Future):
+            task = asyncio.wrap_future(task)
+        await asyncio.gather(task, return_exceptions=True)
+
+def get_memory(context: Dict[str, Any]) -> ConversationMemory:
+    """The context's memory, created from any legacy "history" list on first use"""
+    memory = context.get("memory")
+    if memory is None:
+        memory = ConversationMemory.from_history(context.get("history", []))
+        context["memory"] = memory
+    return memory
@@ -0,0 +1,63 @@
+from typing import Optional
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import time
+
+# Absolute time.monotonic() by which the current turn must finish
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when work is started after the current turn's deadline has passed"""
+    pass
+
+@contextmanager
+def scope(at: Optional[float]):
+    """Apply the absolute deadline at (time.monotonic()) to calls made inside the block.
+
+    Nested scopes can only tighten the deadline, never extend it. Tasks
+    created inside the block inherit it.
+    """
+    current = _deadline.get()
+    if at is not None and current is not None:
+        at = min(at, current)
+    token = _deadline.set(at if at is not None else current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def after(seconds: Optional[float]) -> Optional[float]:
+    """Absolute deadline seconds from now (None for no deadline)"""
+    return time.monotonic() + seconds if seconds else None
+
+def current() -> Optional[float]:
+    return _deadline.get()
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None when there is none"""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return max(0.0, at - time.monotonic())
+
+def bind(context: contextvars.Context, at: Optional[float]):
+    """Set the deadline seen by work running in context (e.g. a task several turns wait on)"""
+    context.run(_deadline.set, at)
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+def timeout(cap: Optional[float] = None) -> Optional[float]:
+    """Timeout for one call: cap, shortened to the time left in the turn.
+
+    Raises DeadlineExceeded when no time is left, so callers never start
+    work that cannot finish.
+    """
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded("Turn deadline exceeded")
+    return left if cap is None else min(cap, left)
@@ -0,0 +1,234 @@
+from typing import Dict, Any, List, Optional, Union
+from collections import OrderedDict
+from pathlib import Path
+import asyncio
+import json
+import re
+import numpy as np
+from config.settings import config
+from core.llm_backend import LLMBackend, get_backend
+from core.tokens import estimate_tokens
+
+def content_to_text(content: Any) -> Union[str, List[Dict[str, Any]]]:
+    """Structured chunks for PDF/Word content, plain text for everything else"""
+    if isinstance(content, dict) and "chunks" in content:
+        return content["chunks"]
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+def split_chunks(content: Union[str, List[Dict[str, Any]]], max_chars: Optional[int] = None,
+                 overlap: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Split text or parser chunks into retrieval chunks of about max_chars.
+
+    Small parser chunks (paragraphs) are merged and large ones (pages) are
+    split with overlap. Each result keeps the page/paragraph it starts at.
+    """
+    max_chars = max_chars or config.DOCUMENT_CHUNK_CHARS
+    overlap = overlap if overlap is not None else config.DOCUMENT_CHUNK_OVERLAP
+    if isinstance(content, str):
+        content = [{"text": content}]
+
+    chunks: List[Dict[str, Any]] = []
+    buffer: List[str] = []
+    size = 0
+    location: Dict[str, Any] = {}
+
+    def flush():
+        nonlocal buffer, size
+        if buffer:
+            chunks.append({**location, "text": "\n".join(buffer)})
+        buffer, size = [], 0
+
+    for piece in content:
+        text = piece["text"].strip()
+        if not text:
+            continue
+        if size + len(text) > max_chars:
+            flush()
+        if not buffer:
+            location = {key: value for key, value in piece.items() if key != "text"}
+        if len(text) <= max_chars:
+            buffer.append(text)
+            size += len(text) + 1
+            continue
+
+        # Split oversized pieces on whitespace near the chunk boundary
+        start = 0
+        while start < len(text):
+            end = min(start + max_chars, len(text))
+            if end < len(text):
+                space = text.rfind(" ", start + max_chars // 2, end)
+                end = space if space > 0 else end
+            chunks.append({**location, "text": text[start:end].strip()})
+            if end >= len(text):
+                break
+            start = max(end - overlap, start + 1)
+    flush()
+    return chunks
+
+class DocumentIndex:
+    """Embedding index over uploaded documents for top-k chunk retrieval.
+
+    Documents are keyed by content hash, so each one is chunked and embedded
+    (in batches) only once. Each document's normalized embeddings live in a
+    NumPy matrix; with a directory they are also saved to disk and reopened
+    memory-mapped, so they survive restarts without occupying RAM.
+    """
+
+    def __init__(self, backend: Optional[LLMBackend] = None, model: Optional[str] = None,
+                 directory: Optional[str] = None, max_documents: int = 32, batch_size: int = 100):
+        self._backend = backend
+        self.model = model or config.EMBEDDING_MODEL
+        self.directory = Path(directory) if directory else None
+        self.max_documents = max_documents
+        self.batch_size = batch_size
+        self._documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._building: Dict[str, asyncio.Future] = {}
+        self.stats = {"documents_built": 0, "documents_loaded": 0, "chunks_embedded": 0, "searches": 0}
+
+    @property
+    def backend(self) -> LLMBackend:
+        return self._backend or get_backend()
+
+    def _key(self, doc_id: str) -> str:
+        model = re.sub(r"[^\w.-]", "_", self.model)
+        return f"{doc_id}-{model}"
+
+    async def add(self, doc_id: str, name: str, content: Any) -> Dict[str, Any]:
+        """Index a document once; later calls with the same content hash reuse it"""
+        key = self._key(doc_id)
+        document = self._get(key)
+        if document is not None:
+            return document
+        # Concurrent turns asking for the same document share one build
+        # (futures cannot be awaited from another thread's event loop)
+        building = self._building.get(key)
+        if building is not None and building.get_loop() is asyncio.get_running_loop():
+            return await asyncio.shield(building)
+
+        future = asyncio.get_running_loop().create_future()
+        self._building[key] = future
+        try:
+            document = await asyncio.to_thread(self._load, key)
+            if document is None:
+                document = await self._build(key, name, content)
+            self._put(key, document)
+            future.set_result(document)
+            return document
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; keep the exception from being logged
+            future.exception()
+            raise
+        finally:
+            if self._building.get(key) is future:
+                del self._building[key]
+
+    async def _build(self, key: str, name: str, content: Any) -> Dict[str, Any]:
+        chunks = split_chunks(content_to_text(content))
+        for chunk in chunks:
+            chunk["source"] = name
+        texts = [chunk["text"] for chunk in chunks]
+        if not texts:
+            return {"chunks": [], "matrix": np.zeros((0, 0), dtype=np.float32)}
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(await self.backend.embed(self.model, texts[start:start + self.batch_size]))
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        self.stats["documents_built"] += 1
+        self.stats["chunks_embedded"] += len(chunks)
+
+        document = {"chunks": chunks, "matrix": matrix}
+        if self.directory is not None:
+            await asyncio.to_thread(self._save, key, document)
+        return document
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        document = self._documents.get(key)
+        if document is not None:
+            self._documents.move_to_end(key)
+        return document
+
+    def _put(self, key: str, document: Dict[str, Any]):
+        self._documents[key] = document
+        self._documents.move_to_end(key)
+        while len(self._documents) > self.max_documents:
+            self._documents.popitem(last=False)
+
+    def _save(self, key: str, document: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        np.save(self.directory / f"{key}.npy", document["matrix"])
+        (self.directory / f"{key}.json").write_text(json.dumps(document["chunks"]), encoding="utf-8")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Reopen a saved document with its matrix memory-mapped"""
+        if self.directory is None:
+            return None
+        matrix_path, chunks_path = self.directory / f"{key}.npy", self.directory / f"{key}.json"
+        if not matrix_path.exists() or not chunks_path.exists():
+            return None
+        try:
+            document = {
+                "chunks": json.loads(chunks_path.read_text(encoding="utf-8")),
+                "matrix": np.load(matrix_path, mmap_mode="r"),
+            }
+        except (OSError, ValueError):
+            return None
+        self.stats["documents_loaded"] += 1
+        return document
+
+    async def search(self, query: str, doc_ids: List[str], top_k: Optional[int] = None,
+                     max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the chunks most relevant to query that fit in max_tokens.
+
+        When every chunk fits, all of them are returned and no query embedding
+        is needed. Results are ordered by document and position, each with
+        its "doc_id" and similarity "score".
+        """
+        top_k = top_k or config.RETRIEVAL_TOP_K
+        max_tokens = max_tokens or config.RETRIEVAL_MAX_TOKENS
+        self.stats["searches"] += 1
+        found = [(doc_id, self._get(self._key(doc_id))) for doc_id in dict.fromkeys(doc_ids)]
+        found = [(doc_id, document) for doc_id, document in found if document is not None and document["chunks"]]
+        ids = [doc_id for doc_id, _ in found]
+        documents = [document for _, document in found]
+        candidates = [
+            (doc_index, chunk_index)
+            for doc_index, document in enumerate(documents)
+            for chunk_index in range(len(document["chunks"]))
+        ]
+        if sum(estimate_tokens(documents[d]["chunks"][c]["text"]) for d, c in candidates) <= max_tokens:
+            return [{**documents[d]["chunks"][c], "doc_id": ids[d], "score": 1.0} for d, c in candidates]
+
+        vectors = await self.backend.embed(self.model, [query])
+        query_vector = np.asarray(vectors[0], dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        scores = np.concatenate([document["matrix"] @ query_vector for document in documents])
+
+        selected = []
+        budget = max_tokens
+        for index in np.argsort(-scores):
+            doc_index, chunk_index = candidates[index]
+            tokens = estimate_tokens(documents[doc_index]["chunks"][chunk_index]["text"])
+            if tokens > budget:
+                continue
+            selected.append((doc_index, chunk_index, float(scores[index])))
+            budget -= tokens
+            if len(selected) >= top_k or budget <= 0:
+                break
+        return [{**documents[d]["chunks"][c], "doc_id": ids[d], "score": score} for d, c, score in sorted(selected)]
+
+def _index_dir() -> Optional[str]:
+    if not config.CACHE_DIR:
+        return None
+    return str(Path(config.CACHE_DIR) / "index")
+
+# Shared index so documents are embedded once across agents and sessions
+document_index = DocumentIndex(directory=_index_dir())
@@ -0,0 +1,253 @@
+from typing import Dict, Any, Optional, List, AsyncIterator
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from core.llm_backend import LLMBackend, BackendError
+from core.response_cache import make_cache_key
+
+_WORDS = (
+    "the system agent model response data result value process context user "
+    "request analysis summary detail example information source answer query"
+).split()
+
+class FakeBackend(LLMBackend):
+    """Deterministic local stand-in for a model provider.
+
+    Responses are derived from a hash of the prompt, so the same input always
+    gives the same output. Latency, token rate and failures are synthetic and
+    configurable, which makes it usable for offline development and load tests.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, distribution: str = "constant",
+                 jitter: float = 0.0, token_rate: float = 0.0, response_tokens: int = 48,
+                 failure_rate: float = 0.0, embedding_dim: int = 256, seed: int = 0):
+        if distribution not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.latency = latency
+        self.distribution = distribution
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.embedding_dim = embedding_dim
+        self._random = random.Random(seed)
+        self.stats = {"generate": 0, "stream": 0, "embed": 0, "failures": 0}
+
+    def sample_latency(self) -> float:
+        """Draw a time-to-first-token in seconds from the configured distribution"""
+        if self.distribution == "constant" or self.latency <= 0:
+            return max(self.latency, 0.0)
+        if self.distribution == "uniform":
+            spread = self.jitter or self.latency
+            return max(self._random.uniform(self.latency - spread, self.latency + spread), 0.0)
+        if self.distribution == "normal":
+            return max(self._random.gauss(self.latency, self.jitter or self.latency / 4), 0.0)
+        # Lognormal with the configured mean; jitter is sigma of the underlying normal
+        sigma = self.jitter or 0.5
+        return self._random.lognormvariate(math.log(self.latency) - sigma ** 2 / 2, sigma)
+
+    def _maybe_fail(self):
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.stats["failures"] += 1
+            raise BackendError("Injected failure from FakeBackend")
+
+    def _response_text(self, model: str, parts: List[Any], generation_config: Optional[Dict[str, Any]]) -> str:
+        """Build a deterministic response for the prompt"""
+        seed = make_cache_key(model, generation_config, parts)
+        rng = random.Random(seed)
+        prompt = next((p for p in parts if isinstance(p, str)), "")
+        images = sum(1 for p in parts if not isinstance(p, str))
+        head = " ".join(prompt.split()[-12:])
+        words = [rng.choice(_WORDS) for _ in range(self.response_tokens)]
+        suffix = f" ({images} image(s))" if images else ""
+        return f"[{model}] Re: {head}{suffix}. " + " ".join(words) + "."
+
+    def _split_tokens(self, text: str) -> List[str]:
+        return re.findall(r"\S+\s*", text)
+
+    async def generate(self, model: str, parts: List[Any],
+                       generation_config: Optional[Dict[str, Any]] = None) -> str:
+        self.stats["generate"] += 1
+        await asyncio.sleep(self.sample_latency())
+        self._maybe_fail()
+        text = self._response_text(model, parts, generation_config)
+        if self.token_rate:
+            await asyncio.sleep(len(self._split_tokens(text)) / self.token_rate)
+        return text
+
+    async def stream(self, model: str, parts: List[Any],
+                     generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        self.stats["stream"] += 1
+        await asyncio.sleep(self.sample_latency())
+        self._maybe_fail()
+        for token in self._split_tokens(self._response_text(model, parts, generation_config)):
+            if self.token_rate:
+                await asyncio.sleep(1 / self.token_rate)
+            yield token
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        """Hashed bag-of-words vectors, so texts sharing words are similar"""
+        self.stats["embed"] += 1
+        await asyncio.sleep(self.sample_latency())
+        self._maybe_fail()
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.embedding_dim
+            for token in re.findall(r"[a-z0-9]+", text.lower()):
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                index = int.from_bytes(digest[:4], "little") % self.embedding_dim
+                vector[index] += 1.0 if digest[4] & 1 else -1.0
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+class RecordingBackend(LLMBackend):
+    """Wraps a backend and appends every call and its result to a JSONL file"""
+
+    def __init__(self, backend: LLMBackend, path: str):
+        self.backend = backend
+        self.name = f"recording:{backend.name}"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._prefixes: Dict[str, List[Any]] = {}
+
+    def _write(self, record: Dict[str, Any]):
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+    async def generate(self, model: str, parts: List[Any],
+                       generation_config: Optional[Dict[str, Any]] = None) -> str:
+        start = time.perf_counter()
+        text = await self.backend.generate(model, parts, generation_config)
+        self._write({
+            "kind": "generate",
+            "key": make_cache_key(model, generation_config, parts),
+            "model": model,
+            "latency": time.perf_counter() - start,
+            "result": text
+        })
+        return text
+
+    async def stream(self, model: str, parts: List[Any],
+                     generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        chunks, offsets = [], []
+        async for chunk in self.backend.stream(model, parts, generation_config):
+            offsets.append(time.perf_counter() - start)
+            chunks.append(chunk)
+            yield chunk
+        self._write({
+            "kind": "stream",
+            "key": make_cache_key(model, generation_config, parts),
+            "model": model,
+            "latency": time.perf_counter() - start,
+            "chunks": chunks,
+            "offsets": offsets
+        })
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        vectors = await self.backend.embed(model, texts)
+        self._write({
+            "kind": "embed",
+            "key": make_cache_key(model, None, texts),
+            "model": model,
+            "latency": time.perf_counter() - start,
+            "result": vectors
+        })
+        return vectors
+
+    async def create_cached_context(self, model: str, parts: List[Any], ttl: float,
+                                    system_instruction: Optional[str] = None) -> str:
+        handle = await self.backend.create_cached_context(model, parts, ttl, system_instruction)
+        # Calls are recorded under the full prompt, so a replay's local stand-in finds them
+        self._prefixes[handle] = [system_instruction, *parts] if system_instruction else list(parts)
+        return handle
+
+    async def extend_cached_context(self, handle: str, ttl: float):
+        await self.backend.extend_cached_context(handle, ttl)
+
+    async def delete_cached_context(self, handle: str):
+        self._prefixes.pop(handle, None)
+        await self.backend.delete_cached_context(handle)
+
+    async def generate_with_context(self, model: str, handle: str, parts: List[Any],
+                                    generation_config: Optional[Dict[str, Any]] = None) -> str:
+        start = time.perf_counter()
+        text = await self.backend.generate_with_context(model, handle, parts, generation_config)
+        self._write({
+            "kind": "generate",
+            "key": make_cache_key(model, generation_config, [*self._prefixes.get(handle, []), *parts]),
+            "model": model,
+            "latency": time.perf_counter() - start,
+            "result": text
+        })
+        return text
+
+class ReplayBackend(LLMBackend):
+    """Serves responses from a RecordingBackend session file.
+
+    With replay_timing the recorded latencies (and chunk offsets for streams)
+    are reproduced, so a recorded session can be replayed as synthetic load.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str, replay_timing: bool = True):
+        self.path = path
+        self.replay_timing = replay_timing
+        self._records: Dict[tuple, Dict[str, Any]] = {}
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[(record["kind"], record["key"])] = record
+
+    def _lookup(self, kind: str, key: str) -> Dict[str, Any]:
+        record = self._records.get((kind, key))
+        # Streams and full generations are interchangeable on replay
+        if record is None and kind in ("generate", "stream"):
+            record = self._records.get(("stream" if kind == "generate" else "generate", key))
+        if record is None:
+            raise BackendError(f"No recorded {kind} response for key {key[:12]}")
+        return record
+
+    async def generate(self, model: str, parts: List[Any],
+                       generation_config: Optional[Dict[str, Any]] = None) -> str:
+        record = self._lookup("generate", make_cache_key(model, generation_config, parts))
+        if self.replay_timing:
+            await asyncio.sleep(record.get("latency", 0))
+        if "result" in record:
+            return record["result"]
+        return "".join(record["chunks"])
+
+    async def stream(self, model: str, parts: List[Any],
+                     generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        record = self._lookup("stream", make_cache_key(model, generation_config, parts))
+        if "chunks" not in record:
+            if self.replay_timing:
+                await asyncio.sleep(record.get("latency", 0))
+            yield record["result"]
+            return
+        elapsed = 0.0
+        offsets = record.get("offsets") or [0.0] * len(record["chunks"])
+        for chunk, offset in zip(record["chunks"], offsets):
+            if self.replay_timing and offset > elapsed:
+                await asyncio.sleep(offset - elapsed)
+                elapsed = offset
+            yield chunk
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        record = self._lookup("embed", make_cache_key(model, None, texts))
+        if self.replay_timing:
+            await asyncio.sleep(record.get("latency", 0))
+        return record["result"]
@@ -0,0 +1,160 @@
+from typing import Dict, Any, List, Optional
+from concurrent.futures import Future
+from pathlib import Path
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+from config.settings import config
+from core.scheduler import priority, BACKGROUND
+
+IMAGE_TYPES = {'png', 'jpg', 'jpeg'}
+
+class IngestionPipeline:
+    """Prepares uploads in the background as soon as they arrive.
+
+    Each upload is hashed, written once to a per-session spool directory and
+    handed to a background event loop (on its own thread) that parses,
+    chunks and embeds documents and downsizes images. Work is deduplicated by
+    content hash across sessions, so the same file is prepared once; callers
+    poll status() for readiness or await wait() before using a file.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None, retention: Optional[float] = None):
+        self.spool_dir = Path(spool_dir or config.UPLOAD_DIR or Path(tempfile.gettempdir()) / "multi_agent_chatbot")
+        self.retention = retention if retention is not None else config.UPLOAD_RETENTION
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Future] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._pruned = False
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop thread on first use"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="ingestion", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def submit(self, session_id: str, name: str, data: bytes) -> Dict[str, Any]:
+        """Spool an upload and start preparing it; returns the file record.
+
+        Documents come back as {"name", "path", "hash"} for context["files"];
+        images additionally carry their "bytes" for context["images"].
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        suffix = Path(name).suffix.lower()
+        kind = "image" if suffix[1:] in IMAGE_TYPES else "document"
+
+        session_dir = self._session_dir(session_id)
+        # Named by hash so same-named uploads never collide and re-uploads are not rewritten
+        path = session_dir / f"{digest[:32]}{suffix}"
+        if not path.exists():
+            partial = path.with_suffix(path.suffix + ".part")
+            partial.write_bytes(data)
+            partial.replace(path)
+
+        record = {"name": name, "path": str(path), "hash": digest, "kind": kind}
+        if kind == "image":
+            record["bytes"] = data
+
+        with self._lock:
+            # A failed job is retried when the same bytes are uploaded again
+            failed = self._status.get(digest, {}).get("state") == "error"
+            if digest not in self._jobs or failed:
+                self._status[digest] = {"state": "queued", "name": name, "error": None, "elapsed": None}
+                self._jobs[digest] = None  # Reserved before the loop can run the job
+                submit_job = True
+            else:
+                submit_job = False
+        if submit_job:
+            coroutine = self._prepare(digest, dict(record), kind)
+            self._jobs[digest] = asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+        return record
+
+    async def _prepare(self, digest: str, record: Dict[str, Any], kind: str):
+        status = self._status[digest]
+        status["state"] = "processing"
+        started = time.perf_counter()
+        try:
+            # Embedding calls yield to interactive requests under load
+            with priority(BACKGROUND):
+                if kind == "image":
+                    await self._prepare_image(record)
+                else:
+                    await self._prepare_document(record)
+            status["state"] = "ready"
+        except Exception as e:
+            status["state"] = "error"
+            status["error"] = str(e) or type(e).__name__
+        finally:
+            status["elapsed"] = time.perf_counter() - started
+
+    async def _prepare_document(self, record: Dict[str, Any]):
+        """Parse (filling the parse cache) and build the retrieval index"""
+        from tools.file_processor import file_processor
+        from core.document_index import document_index
+        processed = await file_processor.process_file({"path": record["path"]})
+        if processed.get("error"):
+            raise ValueError(processed["error"])
+        if config.DOCUMENT_RETRIEVAL:
+            await document_index.add(processed["hash"], processed["name"], processed["content"])
+
+    async def _prepare_image(self, record: Dict[str, Any]):
+        """Downsize and re-encode the image for the vision model"""
+        from tools.image_processor import image_preprocessor
+        await image_preprocessor.prepare(record["bytes"])
+
+    def run_background(self, coroutine) -> Future:
+        """Run a coroutine on the background loop, for callers with no running loop of their own"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def status(self, digest: str) -> Optional[Dict[str, Any]]:
+        """{"state": queued|processing|ready|error, "name", "error", "elapsed"} for an upload"""
+        status = self._status.get(digest)
+        return dict(status) if status is not None else None
+
+    async def wait(self, digests: List[str], timeout: Optional[float] = None):
+        """Wait, from any event loop, until the given uploads are prepared.
+
+        Uploads the pipeline never saw are ignored; failures are left for
+        the caller's own processing to report.
+        """
+        futures = [self._jobs.get(digest) for digest in digests]
+        futures = [asyncio.wrap_future(future) for future in futures if future is not None]
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+
+    def _session_dir(self, session_id: str) -> Path:
+        if not self._pruned:
+            self._pruned = True
+            self.prune()
+        session_dir = self.spool_dir / session_id
+        session_dir.mkdir(parents=True, exist_ok=True)
+        return session_dir
+
+    def discard_session(self, session_id: str):
+        """Delete a session's spooled files"""
+        shutil.rmtree(self.spool_dir / session_id, ignore_errors=True)
+
+    def prune(self):
+        """Delete session directories untouched for longer than the retention period"""
+        if not self.spool_dir.exists():
+            return
+        cutoff = time.time() - self.retention
+        for session_dir in self.spool_dir.iterdir():
+            try:
+                if session_dir.is_dir() and session_dir.stat().st_mtime < cutoff:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+            except OSError:
+                continue
+
+# Shared pipeline so identical uploads are prepared once across sessions
+ingestion_pipeline = IngestionPipeline()
@@ -0,0 +1,141 @@
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass, field
+import re
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; matching on tokens gives word boundaries for free"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+@dataclass
+class RoutingRule:
+    """Trigger phrases that activate an agent.
+
+    A phrase is one or more words; a word ending in "*" matches any word with
+    that prefix ("image*" matches "images"). The rule fires when any phrase
+    matches and every group in requires has at least one matching phrase too.
+    """
+    agent: str
+    phrases: List[str]
+    intent: str = "default"
+    weight: float = 1.0
+    requires: List[List[str]] = field(default_factory=list)
+
+@dataclass
+class RouteMatch:
+    """An activated agent with its score and the intents and phrases that fired"""
+    agent: str
+    score: float = 0.0
+    intents: List[str] = field(default_factory=list)
+    phrases: List[str] = field(default_factory=list)
+
+class _Node:
+    __slots__ = ("children", "prefixes", "outputs")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.prefixes: List[Tuple[str, "_Node"]] = []
+        self.outputs: List[int] = []
+
+class IntentRouter:
+    """Single-pass multi-phrase matcher over message tokens.
+
+    All phrases from all rules are compiled into one token trie. A message is
+    tokenized once and its tokens are read once, left to right, carrying the
+    set of trie nodes reached by phrases still in progress (a new one may
+    start at every token). Every phrase is found in that one pass regardless
+    of how many rules are registered.
+    """
+
+    def __init__(self, rules: Optional[List[RoutingRule]] = None):
+        self.rules: List[RoutingRule] = []
+        self._root = _Node()
+        self._phrases: List[str] = []
+        self._phrase_ids: Dict[str, int] = {}
+        # phrase id -> [(rule index, group index)], group -1 is the trigger list
+        self._targets: Dict[int, List[Tuple[int, int]]] = {}
+        for rule in rules or []:
+            self.add_rule(rule)
+
+    def add_rule(self, rule: RoutingRule):
+        """Register a rule and compile its phrases into the trie"""
+        index = len(self.rules)
+        self.rules.append(rule)
+        for phrase in rule.phrases:
+            self._targets.setdefault(self._compile(phrase), []).append((index, -1))
+        for group, phrases in enumerate(rule.requires):
+            for phrase in phrases:
+                self._targets.setdefault(self._compile(phrase), []).append((index, group))
+
+    def add_rules(self, rules: List[RoutingRule]):
+        for rule in rules:
+            self.add_rule(rule)
+
+    def _compile(self, phrase: str) -> int:
+        phrase = " ".join(phrase.lower().split())
+        if phrase in self._phrase_ids:
+            return self._phrase_ids[phrase]
+
+        phrase_id = len(self._phrases)
+        self._phrases.append(phrase)
+        self._phrase_ids[phrase] = phrase_id
+
+        node = self._root
+        for word in phrase.split():
+            if word.endswith("*"):
+                stem = word[:-1]
+                child = next((n for s, n in node.prefixes if s == stem), None)
+                if child is None:
+                    child = _Node()
+                    node.prefixes.append((stem, child))
+            else:
+                child = node.children.get(word)
+                if child is None:
+                    child = node.children[word] = _Node()
+            node = child
+        node.outputs.append(phrase_id)
+        return phrase_id
+
+    def match_phrases(self, message: str) -> List[int]:
+        """Return the ids of every phrase that occurs in the message"""
+        found = set()
+        active: List[_Node] = []
+        for token in tokenize(message):
+            # Partial matches are keyed by node, so overlapping starts that reach
+            # the same point are followed once
+            advanced: Dict[int, _Node] = {}
+            for node in active + [self._root]:
+                child = node.children.get(token)
+                if child is not None:
+                    advanced[id(child)] = child
+                for stem, prefixed in node.prefixes:
+                    if token.startswith(stem):
+                        advanced[id(prefixed)] = prefixed
+            active = list(advanced.values())
+            for node in active:
+                found.update(node.outputs)
+        return sorted(found)
+
+    def route(self, message: str) -> Dict[str, RouteMatch]:
+        """Evaluate every rule against the message in one pass"""
+        triggered: Dict[int, List[str]] = {}
+        satisfied: Dict[int, set] = {}
+        for phrase_id in self.match_phrases(message):
+            for rule_index, group in self._targets.get(phrase_id, []):
+                if group < 0:
+                    triggered.setdefault(rule_index, []).append(self._phrases[phrase_id])
+                else:
+                    satisfied.setdefault(rule_index, set()).add(group)
+
+        routes: Dict[str, RouteMatch] = {}
+        for rule_index, phrases in sorted(triggered.items()):
+            rule = self.rules[rule_index]
+            if len(satisfied.get(rule_index, ())) < len(rule.requires):
+                continue
+            match = routes.setdefault(rule.agent, RouteMatch(agent=rule.agent))
+            match.score += rule.weight * len(phrases)
+            if rule.intent not in match.intents:
+                match.intents.append(rule.intent)
+            match.phrases.extend(phrases)
+        return routes
@@ -0,0 +1,225 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List, AsyncIterator
+import asyncio
+import itertools
+import json
+import time
+from config.settings import config
+from core import deadline
+
+class BackendError(Exception):
+    """Raised when a model backend cannot serve a request"""
+    pass
+
+class LLMBackend(ABC):
+    """Interface for the model provider behind the agents.
+
+    Prompt parts are the same values Gemini accepts: strings, PIL images and
+    {"mime_type": ..., "data": ...} blobs.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, model: str, parts: List[Any],
+                       generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """Generate a complete response"""
+        pass
+
+    @abstractmethod
+    def stream(self, model: str, parts: List[Any],
+               generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Generate a response as an async iterator of text chunks"""
+        pass
+
+    async def vision(self, model: str, prompt: str, images: List[Any],
+                     generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """Answer a prompt about one or more images"""
+        return await self.generate(model, [prompt, *images], generation_config)
+
+    @abstractmethod
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts, one vector per text"""
+        pass
+
+    # Cached contexts register a large, stable prompt prefix once and let
+    # later calls reference it by handle. The defaults below are a local
+    # stand-in that keeps the prefix in memory and prepends it to each call,
+    # enforcing the TTL the way a server would; backends with server-side
+    # caching override them.
+
+    async def create_cached_context(self, model: str, parts: List[Any], ttl: float,
+                                    system_instruction: Optional[str] = None) -> str:
+        """Register a prompt prefix for model and return its handle"""
+        contexts = self._local_contexts()
+        handle = f"local/{next(_context_ids)}"
+        prefix = [system_instruction, *parts] if system_instruction else list(parts)
+        contexts[handle] = {"model": model, "parts": prefix, "expires": time.time() + ttl}
+        return handle
+
+    async def extend_cached_context(self, handle: str, ttl: float):
+        """Keep a cached context alive for ttl more seconds"""
+        self._local_context(handle)["expires"] = time.time() + ttl
+
+    async def delete_cached_context(self, handle: str):
+        """Release a cached context (unknown handles are ignored)"""
+        self._local_contexts().pop(handle, None)
+
+    async def generate_with_context(self, model: str, handle: str, parts: List[Any],
+                                    generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """Generate a response to parts following a cached context"""
+        context = self._local_context(handle)
+        if context["model"] != model:
+            raise BackendError(f"Cached context {handle} belongs to {context['model']}")
+        return await self.generate(model, [*context["parts"], *parts], generation_config)
+
+    def _local_contexts(self) -> Dict[str, Dict[str, Any]]:
+        if not hasattr(self, "_contexts"):
+            self._contexts: Dict[str, Dict[str, Any]] = {}
+        return self._contexts
+
+    def _local_context(self, handle: str) -> Dict[str, Any]:
+        context = self._local_contexts().get(handle)
+        if context is None or context["expires"] <= time.time():
+            self._local_contexts().pop(handle, None)
+            raise BackendError(f"Cached context {handle} not found or expired")
+        return context
+
+_context_ids = itertools.count(1)
+
+def _request_options() -> Optional[Dict[str, Any]]:
+    """Per-request options that stop a Gemini call at the current turn's deadline"""
+    left = deadline.timeout()
+    return {"timeout": left} if left is not None else None
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        import google.generativeai as genai
+        self._genai = genai
+        genai.configure(api_key=api_key)
+        self._models: Dict[str, Any] = {}
+        self._cached: Dict[str, Any] = {}
+
+    def _model(self, model: str, generation_config: Optional[Dict[str, Any]]):
+        """Reuse one GenerativeModel per (model, generation config)"""
+        key = f"{model}:{json.dumps(generation_config or {}, sort_keys=True)}"
+        if key not in self._models:
+            self._models[key] = self._genai.GenerativeModel(
+                model_name=model,
+                generation_config=generation_config
+            )
+        return self._models[key]
+
+    async def generate(self, model: str, parts: List[Any],
+                       generation_config: Optional[Dict[str, Any]] = None) -> str:
+        response = await self._model(model, generation_config).generate_content_async(
+            parts, request_options=_request_options()
+        )
+        return response.text
+
+    async def stream(self, model: str, parts: List[Any],
+                     generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        response = await self._model(model, generation_config).generate_content_async(
+            parts, stream=True, request_options=_request_options()
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        model_name = model if model.startswith("models/") else f"models/{model}"
+        result = await self._genai.embed_content_async(
+            model=model_name, content=texts, request_options=_request_options()
+        )
+        return result["embedding"]
+
+    async def create_cached_context(self, model: str, parts: List[Any], ttl: float,
+                                    system_instruction: Optional[str] = None) -> str:
+        from datetime import timedelta
+        model_name = model if model.startswith("models/") else f"models/{model}"
+        cached = await asyncio.to_thread(
+            self._genai.caching.CachedContent.create,
+            model=model_name,
+            contents=parts,
+            system_instruction=system_instruction,
+            ttl=timedelta(seconds=ttl)
+        )
+        self._cached[cached.name] = cached
+        return cached.name
+
+    async def extend_cached_context(self, handle: str, ttl: float):
+        from datetime import timedelta
+        cached = await self._cached_content(handle)
+        await asyncio.to_thread(cached.update, ttl=timedelta(seconds=ttl))
+
+    async def delete_cached_context(self, handle: str):
+        cached = self._cached.pop(handle, None)
+        if cached is None:
+            cached = await self._cached_content(handle)
+            self._cached.pop(handle, None)
+        await asyncio.to_thread(cached.delete)
+
+    async def generate_with_context(self, model: str, handle: str, parts: List[Any],
+                                    generation_config: Optional[Dict[str, Any]] = None) -> str:
+        cached = await self._cached_content(handle)
+        cached_model = self._genai.GenerativeModel.from_cached_content(
+            cached_content=cached,
+            generation_config=generation_config
+        )
+        response = await cached_model.generate_content_async(parts, request_options=_request_options())
+        return response.text
+
+    async def _cached_content(self, handle: str):
+        """The CachedContent for a handle, looked up on the server if not created here"""
+        if handle not in self._cached:
+            self._cached[handle] = await asyncio.to_thread(self._genai.caching.CachedContent.get, handle)
+        return self._cached[handle]
+
+_backend: Optional[LLMBackend] = None
+
+def create_backend(kind: Optional[str] = None) -> LLMBackend:
+    """Build the backend named by kind (defaults to Config.LLM_BACKEND)"""
+    kind = (kind or config.LLM_BACKEND).lower()
+
+    if kind == "gemini":
+        backend = GeminiBackend(api_key=config.GOOGLE_API_KEY)
+    elif kind == "fake":
+        from core.fake_backend import FakeBackend
+        backend = FakeBackend(
+            latency=config.FAKE_LLM_LATENCY,
+            distribution=config.FAKE_LLM_LATENCY_DISTRIBUTION,
+            token_rate=config.FAKE_LLM_TOKEN_RATE,
+            failure_rate=config.FAKE_LLM_FAILURE_RATE,
+            seed=config.FAKE_LLM_SEED
+        )
+    elif kind == "replay":
+        from core.fake_backend import ReplayBackend
+        if not config.LLM_RECORDING_PATH:
+            raise ValueError("LLM_RECORDING_PATH is required for the replay backend")
+        backend = ReplayBackend(config.LLM_RECORDING_PATH)
+    else:
+        raise ValueError(f"Unknown LLM backend: {kind}")
+
+    if config.LLM_RECORDING_PATH and kind != "replay":
+        from core.fake_backend import RecordingBackend
+        backend = RecordingBackend(backend, config.LLM_RECORDING_PATH)
+    if config.SCHEDULER_ENABLED:
+        from core.scheduler import ScheduledBackend, scheduler, key_id
+        backend = ScheduledBackend(backend, scheduler, key_id(config.GOOGLE_API_KEY) if kind == "gemini" else None)
+    return backend
+
+def get_backend() -> LLMBackend:
+    """Return the process-wide backend, creating it on first use"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+def set_backend(backend: LLMBackend):
+    """Replace the process-wide backend (e.g. with a FakeBackend for load tests)"""
+    global _backend
+    _backend = backend
@@ -0,0 +1,304 @@
+from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from pathlib import Path
+import asyncio
+import atexit
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from config.settings import config
+
+def hash_part(part: Any) -> str:
+    """Return a stable digest for one prompt part (text, bytes, image or blob)"""
+    digest = hashlib.sha256()
+    if isinstance(part, str):
+        digest.update(b"str:" + part.encode("utf-8"))
+    elif isinstance(part, (bytes, bytearray)):
+        digest.update(b"bytes:" + bytes(part))
+    elif isinstance(part, dict):
+        for key in sorted(part):
+            digest.update(f"key:{key}:".encode("utf-8"))
+            digest.update(hash_part(part[key]).encode("utf-8"))
+    elif isinstance(part, (list, tuple)):
+        for item in part:
+            digest.update(hash_part(item).encode("utf-8"))
+    elif hasattr(part, "tobytes") and hasattr(part, "mode") and hasattr(part, "size"):
+        # PIL image: hash decoded pixels so re-encodes of the same picture match
+        digest.update(f"image:{part.mode}:{part.size}:".encode("utf-8"))
+        digest.update(part.tobytes())
+    else:
+        digest.update(f"repr:{part!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+def make_cache_key(model: str, generation_config: Optional[Dict[str, Any]], parts: List[Any]) -> str:
+    """Build a content-addressed key from model, generation config and prompt parts"""
+    payload = {
+        "model": model,
+        "generation_config": generation_config or {},
+        "parts": [hash_part(part) for part in parts],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Two-tier cache: a bounded in-memory LRU in front of a persistent SQLite store.
+
+    Values must be JSON-serializable. Entries expire after their TTL in both
+    tiers; disk hits are promoted back into memory. Async code reads with
+    aget(), which only checks memory on the event loop and does the SQLite
+    lookup on a worker thread. Disk writes from set() and delete() go through
+    one writer thread, so callers never wait on a commit.
+    """
+
+    def __init__(self, namespace: str = "llm", max_entries: int = 512, ttl: float = 3600,
+                 path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()  # Memory tier and stats
+        self._db_lock = threading.Lock()  # SQLite connection
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_queue: Optional[queue.Queue] = None
+        self._writes = 0
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "bypassed": 0,
+        }
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss (blocks on a disk lookup)"""
+        found, value = self._memory_get(key)
+        if found:
+            return value
+        return self._disk_lookup(key)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for async code: the disk tier is read off the event loop"""
+        found, value = self._memory_get(key)
+        if found:
+            return value
+        if not self.path:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        return await asyncio.to_thread(self._disk_lookup, key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value in memory now and on disk in the background"""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._memory_set(key, value, expires_at)
+        if self.path:
+            self._write(self._disk_set, key, json.dumps(value), expires_at)
+
+    def delete(self, key: str):
+        """Remove a key from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.path:
+            self._write(self._disk_delete, key)
+
+    def clear(self):
+        """Remove every entry in this namespace"""
+        with self._lock:
+            self._memory.clear()
+        self.flush()
+        with self._db_lock:
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                db.commit()
+
+    def flush(self):
+        """Wait until queued disk writes are committed"""
+        if self._writes_queue is not None:
+            self._writes_queue.join()
+
+    def record_bypass(self):
+        """Count a request that skipped the cache on purpose"""
+        with self._lock:
+            self.stats["bypassed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return counters plus the current memory size and hit rate"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _memory_get(self, key: str) -> tuple:
+        """(True, value) on a fresh memory hit, else (False, None)"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.time():
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return True, value
+                del self._memory[key]
+                self.stats["expirations"] += 1
+        return False, None
+
+    def _disk_lookup(self, key: str) -> Optional[Any]:
+        """Read key from disk, promoting a hit into memory"""
+        with self._db_lock:
+            row = self._disk_get(key)
+            if row is not None and row[0] <= time.time():
+                self._disk_delete(key)
+        with self._lock:
+            if row is not None:
+                expires_at, value = row
+                if expires_at > time.time():
+                    self._memory_set(key, value, expires_at)
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return value
+                self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return None
+
+    def _write(self, operation, *args):
+        """Queue a disk operation for the writer thread, starting it on first use"""
+        with self._lock:
+            if self._writes_queue is None:
+                self._writes_queue = queue.Queue()
+                threading.Thread(target=self._writer, name=f"cache-{self.namespace}", daemon=True).start()
+                atexit.register(self.flush)
+        self._writes_queue.put((operation, args))
+
+    def _writer(self):
+        while True:
+            operation, args = self._writes_queue.get()
+            try:
+                with self._db_lock:
+                    operation(*args)
+            except Exception as e:
+                print(f"Cache write error ({self.namespace}): {e}")
+            finally:
+                self._writes_queue.task_done()
+
+    def _memory_set(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite store on first use"""
+        if self._db is None and self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, value TEXT, expires_at REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        db = self._connect()
+        if db is None:
+            return None
+        row = db.execute(
+            "SELECT expires_at, value FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _disk_set(self, key: str, value: str, expires_at: float):
+        """Write an already JSON-encoded value (called with the db lock held)"""
+        db = self._connect()
+        if db is None:
+            return
+        db.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, value, expires_at)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._disk_prune(db)
+        db.commit()
+
+    def _disk_delete(self, key: str):
+        db = self._connect()
+        if db is None:
+            return
+        db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+        db.commit()
+
+    def _disk_prune(self, db: sqlite3.Connection):
+        """Drop expired rows and the soonest-to-expire rows beyond the disk cap"""
+        db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        cursor = db.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_disk_entries)
+        )
+        with self._lock:
+            self.stats["evictions"] += max(cursor.rowcount, 0)
+
+def _cache_path(filename: str) -> Optional[str]:
+    """Location of a persistent cache file, or None when disk caching is off"""
+    if not config.CACHE_DIR:
+        return None
+    return str(Path(config.CACHE_DIR) / filename)
+
+# Shared cache for LLM responses
+response_cache = ResponseCache(
+    namespace="llm",
+    max_entries=config.CACHE_MAX_ENTRIES,
+    ttl=config.CACHE_TTL,
+    path=_cache_path("responses.sqlite3"),
+)
+
+# Web search results keyed on the normalized query
+search_cache = ResponseCache(
+    namespace="search",
+    max_entries=config.CACHE_MAX_ENTRIES,
+    ttl=config.SEARCH_CACHE_TTL,
+    path=_cache_path("search.sqlite3"),
+)
+
+# Scraped page text keyed on URL, with validators for conditional requests
+page_cache = ResponseCache(
+    namespace="pages",
+    max_entries=config.CACHE_MAX_ENTRIES,
+    ttl=config.PAGE_CACHE_RETENTION,
+    path=_cache_path("pages.sqlite3"),
+)
+
+# Parsed uploads keyed on content hash and parser version
+parse_cache = ResponseCache(
+    namespace="parsed",
+    max_entries=config.PARSE_CACHE_MAX_ENTRIES,
+    ttl=config.PARSE_CACHE_TTL,
+    path=_cache_path("parsed.sqlite3"),
+    max_disk_entries=1000,
+)
+
+# Synthesized speech segments keyed on (text, lang, voice)
+speech_cache = ResponseCache(
+    namespace="speech",
+    max_entries=config.CACHE_MAX_ENTRIES,
+    ttl=config.SPEECH_CACHE_TTL,
+    path=_cache_path("speech.sqlite3"),
+)
@@ -0,0 +1,475 @@
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, Callable, TypeVar
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import hashlib
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from config.settings import config
+from core import deadline
+from core.llm_backend import LLMBackend, BackendError
+
+T = TypeVar("T")
+
+# Priority classes; lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+OVERLOADED_MESSAGE = "I'm handling a lot of requests right now. Please try again in a moment."
+
+_priority = contextvars.ContextVar("scheduler_priority", default=INTERACTIVE)
+
+class OverloadedError(BackendError):
+    """Raised when a request is rejected or times out waiting for capacity"""
+
+    def __init__(self, detail: str = ""):
+        super().__init__(OVERLOADED_MESSAGE)
+        self.detail = detail
+
+@contextmanager
+def priority(level: int):
+    """Run outbound calls made inside the block at the given priority class"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    return _priority.get()
+
+def bind_priority(context: contextvars.Context, level: int):
+    """Set the priority class of calls made by work running in context"""
+    context.run(_priority.set, level)
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether a provider error means "slow down" (HTTP 429 / quota exhausted)"""
+    if isinstance(error, OverloadedError):
+        return True
+    if getattr(error, "code", None) == 429 or getattr(error, "status", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource exhausted",
+                                             "rate limit", "ratelimit", "quota", "usagelimit"))
+
+def user_message(error: BaseException, prefix: str = "Error") -> str:
+    """Text to show a user for an error; overload errors are already phrased for them"""
+    if isinstance(error, OverloadedError):
+        return str(error)
+    return f"{prefix}: {error}"
+
+class TokenBucket:
+    """Request-rate limit shared by callers on any thread or event loop.
+
+    Each request reserves a token and sleeps for however long the bucket is
+    in debt, so waiting callers are released at the configured rate in the
+    order they arrived.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted", "cancelled")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.cancelled = False
+
+class Lane:
+    """Adaptive concurrency limit with a bounded priority queue for one model or service.
+
+    The limit grows by about one per round of successful calls and is halved
+    on a rate-limit response (or cut by a tenth when latency exceeds the
+    target), at most once per typical call latency. Requests beyond the limit wait in a
+    queue ordered by priority class; background work may only fill a quarter
+    of it, and a full queue rejects immediately so callers back off instead
+    of piling up.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, initial: int, minimum: int,
+                 maximum: int, queue_size: int, target_latency: float):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(maximum, 1))
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.queue_size = queue_size
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._heap: List[tuple] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+        self._latency = 1.0  # Moving average of successful call latency
+        self._samples = deque(maxlen=200)  # Recent successful latencies, for the hedge delay
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0,
+                      "rate_limited": 0, "errors": 0, "decreases": 0, "hedged": 0, "hedge_wins": 0}
+
+    async def acquire(self, priority_class: int, timeout: Optional[float]):
+        """Wait for a concurrency slot; raises OverloadedError when the queue is full or too slow"""
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._queued:
+                self.in_flight += 1
+                self.stats["admitted"] += 1
+                return
+            bound = self.queue_size if priority_class <= INTERACTIVE else self.queue_size // 4
+            if self._queued >= bound:
+                self.stats["rejected"] += 1
+                raise OverloadedError(f"{self.name} queue full ({self._queued} waiting)")
+            waiter = _Waiter(asyncio.get_running_loop())
+            heapq.heappush(self._heap, (priority_class, next(self._sequence), waiter))
+            self._queued += 1
+            self.stats["queued"] += 1
+
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except BaseException as e:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    waiter.cancelled = True
+                    self._queued -= 1
+            if granted:
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["timeouts"] += 1
+                raise OverloadedError(f"{self.name} queue wait exceeded {timeout}s") from None
+            raise
+
+    def release(self, latency: Optional[float] = None, rate_limited: bool = False, failed: bool = False):
+        """Free a slot and feed the outcome back into the limit (None latency: no sample)"""
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if latency is not None and not failed:
+                self._latency = 0.8 * self._latency + 0.2 * latency
+                self._samples.append(latency)
+            # Calls started before a decrease still report on the old limit; ignore them
+            cooldown = now - self._last_decrease > self._latency
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+                if cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+                    self.stats["decreases"] += 1
+            elif failed:
+                self.stats["errors"] += 1
+            elif latency is not None:
+                if latency > self.target_latency:
+                    if cooldown:
+                        self.limit = max(self.minimum, self.limit * 0.9)
+                        self._last_decrease = now
+                        self.stats["decreases"] += 1
+                elif self.in_flight + 1 >= int(self.limit):
+                    # Only grow while the limit is actually what holds calls back
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the highest-priority waiters (called with the lock held)"""
+        while self._heap and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self._queued -= 1
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            try:
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            except RuntimeError:
+                # The waiter's event loop is gone; give the slot to the next one
+                self.in_flight -= 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a call is slower than usual (p95), or None until enough calls were seen"""
+        with self._lock:
+            if len(self._samples) < 20:
+                return None
+            samples = sorted(self._samples)
+        return max(config.HEDGE_MIN_DELAY, samples[int(len(samples) * 0.95)])
+
+    def has_capacity(self) -> bool:
+        """Whether a call would be admitted right away"""
+        with self._lock:
+            return self.in_flight < int(self.limit) and not self._queued
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "limit": round(self.limit, 2), "in_flight": self.in_flight,
+                    "waiting": self._queued}
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class Scheduler:
+    """Admission control in front of every outbound model and search call.
+
+    Each lane (a model, or a service such as "tavily") has a request-rate
+    bucket and an adaptive concurrency limit; calls made with the same API
+    key additionally share that key's bucket. A rate-limited call is retried
+    once after a short backoff, then surfaces as OverloadedError, whose text
+    is safe to show users.
+    """
+
+    def __init__(self, lane_settings: Optional[Dict[str, Dict[str, Any]]] = None,
+                 queue_timeout: Optional[float] = None, enabled: Optional[bool] = None):
+        self.enabled = config.SCHEDULER_ENABLED if enabled is None else enabled
+        self.defaults = {
+            "requests_per_minute": config.MODEL_REQUESTS_PER_MINUTE,
+            "initial": config.MODEL_INITIAL_CONCURRENCY,
+            "minimum": config.MODEL_MIN_CONCURRENCY,
+            "maximum": config.MODEL_MAX_CONCURRENCY,
+            "queue_size": config.SCHEDULER_QUEUE_SIZE,
+            "target_latency": config.MODEL_TARGET_LATENCY,
+        }
+        self.lane_settings = lane_settings or {}
+        self.queue_timeout = queue_timeout if queue_timeout is not None else config.SCHEDULER_QUEUE_TIMEOUT
+        self._lanes: Dict[str, Lane] = {}
+        self._keys: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def lane(self, name: str) -> Lane:
+        with self._lock:
+            if name not in self._lanes:
+                settings = {**self.defaults, **self.lane_settings.get(name, {})}
+                self._lanes[name] = Lane(name, **settings)
+            return self._lanes[name]
+
+    def _key_bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            if key not in self._keys:
+                rate = config.API_KEY_REQUESTS_PER_MINUTE / 60.0
+                self._keys[key] = TokenBucket(rate, capacity=max(config.MODEL_MAX_CONCURRENCY, 1))
+            return self._keys[key]
+
+    async def _admit(self, lane: Lane, key: Optional[str], priority_class: Optional[int]):
+        # Never queue past the turn's deadline
+        timeout = deadline.timeout(self.queue_timeout)
+        try:
+            await lane.acquire(_priority.get() if priority_class is None else priority_class, timeout)
+        except OverloadedError:
+            if deadline.expired():
+                raise deadline.DeadlineExceeded(f"Turn deadline passed waiting for {lane.name}") from None
+            raise
+        try:
+            await lane.bucket.acquire()
+            if key:
+                await self._key_bucket(key).acquire()
+        except BaseException:
+            lane.release()
+            raise
+
+    async def run(self, lane_name: str, call: Callable[[], Awaitable[T]], key: Optional[str] = None,
+                  priority_class: Optional[int] = None) -> T:
+        """Run call() once admitted to the lane"""
+        if not self.enabled:
+            return await call()
+        lane = self.lane(lane_name)
+        for attempt in range(2):
+            await self._admit(lane, key, priority_class)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                limited = is_rate_limited(e)
+                lane.release(time.monotonic() - started, rate_limited=limited, failed=True)
+                if not limited:
+                    raise
+                if attempt == 0 and _can_retry():
+                    await asyncio.sleep(_backoff())
+                    continue
+                if isinstance(e, OverloadedError):
+                    raise
+                raise OverloadedError(str(e)) from e
+            except BaseException:
+                lane.release()
+                raise
+            lane.release(time.monotonic() - started)
+            return result
+
+    async def stream(self, lane_name: str, open_stream: Callable[[], AsyncIterator[T]],
+                     key: Optional[str] = None, priority_class: Optional[int] = None) -> AsyncIterator[T]:
+        """Iterate open_stream() once admitted, holding the slot until the stream ends.
+
+        Latency is measured to the first chunk; a rate-limited stream is only
+        retried when it failed before producing anything.
+        """
+        if not self.enabled:
+            async for chunk in open_stream():
+                yield chunk
+            return
+        lane = self.lane(lane_name)
+        for attempt in range(2):
+            await self._admit(lane, key, priority_class)
+            started = time.monotonic()
+            latency = None
+            try:
+                async for chunk in open_stream():
+                    if latency is None:
+                        latency = time.monotonic() - started
+                    yield chunk
+            except Exception as e:
+                limited = is_rate_limited(e)
+                lane.release(latency if latency is not None else time.monotonic() - started,
+                             rate_limited=limited, failed=True)
+                if not limited or latency is not None:
+                    raise
+                if attempt == 0 and _can_retry():
+                    await asyncio.sleep(_backoff())
+                    continue
+                if isinstance(e, OverloadedError):
+                    raise
+                raise OverloadedError(str(e)) from e
+            except BaseException:
+                lane.release()
+                raise
+            lane.release(latency if latency is not None else time.monotonic() - started)
+            return
+
+    async def run_hedged(self, lane_name: str, call: Callable[[], Awaitable[T]], key: Optional[str] = None,
+                         priority_class: Optional[int] = None) -> T:
+        """run(), plus a duplicate call when the first is slower than the lane's p95 latency.
+
+        Whichever call finishes first wins and the other is cancelled. A
+        duplicate is only started while the lane has a free slot, so hedging
+        never adds load to a busy lane.
+        """
+        if not self.enabled:
+            return await call()
+        lane = self.lane(lane_name)
+        delay = lane.hedge_delay()
+        first = asyncio.ensure_future(self.run(lane_name, call, key, priority_class))
+        calls = [first]
+        try:
+            if delay is not None:
+                left = deadline.remaining()
+                done, _ = await asyncio.wait(calls, timeout=delay if left is None else min(delay, left))
+                if not done and lane.has_capacity() and not deadline.expired():
+                    lane.stats["hedged"] += 1
+                    calls.append(asyncio.ensure_future(self.run(lane_name, call, key, priority_class)))
+            pending = set(calls)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    # A failed call only decides the outcome when no other call succeeds
+                    if not finished.cancelled() and finished.exception() is None:
+                        if finished is not first:
+                            lane.stats["hedge_wins"] += 1
+                        return finished.result()
+            return first.result()
+        finally:
+            for pending_call in calls:
+                if not pending_call.done():
+                    pending_call.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {name: lane.get_stats() for name, lane in lanes.items()}
+
+def _backoff() -> float:
+    return random.uniform(0.5, 1.5)
+
+def _can_retry() -> bool:
+    """Whether the turn has time left for a backoff and another attempt"""
+    left = deadline.remaining()
+    return left is None or left > 1.5
+
+def key_id(api_key: Optional[str]) -> Optional[str]:
+    """Stable identifier for an API key that does not reveal it"""
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+class ScheduledBackend(LLMBackend):
+    """Wraps a backend so every model call goes through the scheduler, one lane per model"""
+
+    def __init__(self, backend: LLMBackend, scheduler: "Scheduler", key: Optional[str] = None,
+                 hedge: Optional[bool] = None):
+        self.backend = backend
+        self.name = backend.name
+        self.scheduler = scheduler
+        self.key = key
+        self.hedge = config.MODEL_HEDGING if hedge is None else hedge
+
+    async def _run(self, model: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Schedule a non-streaming generation call, hedged when enabled"""
+        if self.hedge:
+            return await self.scheduler.run_hedged(model, call, self.key)
+        return await self.scheduler.run(model, call, self.key)
+
+    async def generate(self, model: str, parts: List[Any],
+                       generation_config: Optional[Dict[str, Any]] = None) -> str:
+        return await self._run(model, lambda: self.backend.generate(model, parts, generation_config))
+
+    async def stream(self, model: str, parts: List[Any],
+                     generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        async for chunk in self.scheduler.stream(
+            model, lambda: self.backend.stream(model, parts, generation_config), self.key
+        ):
+            yield chunk
+
+    async def vision(self, model: str, prompt: str, images: List[Any],
+                     generation_config: Optional[Dict[str, Any]] = None) -> str:
+        return await self._run(model, lambda: self.backend.vision(model, prompt, images, generation_config))
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        return await self.scheduler.run(model, lambda: self.backend.embed(model, texts), self.key)
+
+    async def create_cached_context(self, model: str, parts: List[Any], ttl: float,
+                                    system_instruction: Optional[str] = None) -> str:
+        return await self.scheduler.run(
+            model, lambda: self.backend.create_cached_context(model, parts, ttl, system_instruction), self.key
+        )
+
+    async def extend_cached_context(self, handle: str, ttl: float):
+        await self.backend.extend_cached_context(handle, ttl)
+
+    async def delete_cached_context(self, handle: str):
+        await self.backend.delete_cached_context(handle)
+
+    async def generate_with_context(self, model: str, handle: str, parts: List[Any],
+                                    generation_config: Optional[Dict[str, Any]] = None) -> str:
+        return await self._run(
+            model, lambda: self.backend.generate_with_context(model, handle, parts, generation_config)
+        )
+
+# Shared scheduler so limits hold across agents, sessions and background work
+scheduler = Scheduler(lane_settings={
+    "tavily": {
+        "requests_per_minute": config.SEARCH_REQUESTS_PER_MINUTE,
+        "initial": min(config.MODEL_INITIAL_CONCURRENCY, config.SEARCH_MAX_CONCURRENCY),
+        "minimum": min(config.MODEL_MIN_CONCURRENCY, config.SEARCH_MAX_CONCURRENCY),
+        "maximum": config.SEARCH_MAX_CONCURRENCY,
+    }
+})
@@ -0,0 +1,94 @@
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+import numpy as np
+from config.settings import config
+from core.intent_router import RouteMatch
+from core.llm_backend import LLMBackend, get_backend
+
+class SemanticRouter:
+    """Routes messages by cosine similarity to each agent's exemplar utterances.
+
+    Exemplars are embedded once into a normalized in-memory matrix, so routing
+    a message costs one (cached) embedding call and a single matrix-vector
+    product.
+    """
+
+    def __init__(self, backend: Optional[LLMBackend] = None, model: Optional[str] = None,
+                 threshold: Optional[float] = None, cache_size: int = 1024):
+        self.backend = backend or get_backend()
+        self.model = model or config.EMBEDDING_MODEL
+        self.threshold = threshold if threshold is not None else config.SEMANTIC_ROUTING_THRESHOLD
+        self.cache_size = cache_size
+        self._exemplars: List[tuple] = []  # (agent, intent, text)
+        self._thresholds: Dict[str, float] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.stats = {"embedding_hits": 0, "embedding_misses": 0}
+
+    def add_exemplars(self, agent: str, exemplars: Dict[str, List[str]], threshold: Optional[float] = None):
+        """Register exemplar utterances for an agent, grouped by intent"""
+        for intent, texts in exemplars.items():
+            for text in texts:
+                self._exemplars.append((agent, intent, text))
+        if threshold is not None:
+            self._thresholds[agent] = threshold
+        # New exemplars invalidate the precomputed matrix
+        self._matrix = None
+
+    @property
+    def ready(self) -> bool:
+        return self._matrix is not None
+
+    async def build(self):
+        """Embed every exemplar in one batch and store the normalized matrix"""
+        if self._matrix is not None or not self._exemplars:
+            return
+        vectors = await self.backend.embed(self.model, [text for _, _, text in self._exemplars])
+        self._matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+
+    async def embed_message(self, message: str) -> np.ndarray:
+        """Embed a message, with an LRU cache for repeated messages"""
+        key = " ".join(message.lower().split())
+        vector = self._cache.get(key)
+        if vector is not None:
+            self._cache.move_to_end(key)
+            self.stats["embedding_hits"] += 1
+            return vector
+
+        self.stats["embedding_misses"] += 1
+        vectors = await self.backend.embed(self.model, [message])
+        vector = self._normalize(np.asarray(vectors, dtype=np.float32))[0]
+        self._cache[key] = vector
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return vector
+
+    async def scores(self, message: str) -> Dict[str, RouteMatch]:
+        """Best exemplar similarity per agent, without applying thresholds"""
+        if self._matrix is None:
+            await self.build()
+        if self._matrix is None:
+            return {}
+
+        similarities = self._matrix @ await self.embed_message(message)
+        best: Dict[str, RouteMatch] = {}
+        for index in np.argsort(-similarities):
+            agent, intent, text = self._exemplars[index]
+            if agent not in best:
+                best[agent] = RouteMatch(
+                    agent=agent, score=float(similarities[index]), intents=[intent], phrases=[text]
+                )
+        return best
+
+    async def route(self, message: str) -> Dict[str, RouteMatch]:
+        """Return agents whose best exemplar clears their threshold"""
+        return {
+            agent: match for agent, match in (await self.scores(message)).items()
+            if match.score >= self._thresholds.get(agent, self.threshold)
+        }
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
@@ -0,0 +1,101 @@
+from typing import Dict, Any, Optional
+import asyncio
+import time
+import uuid
+from config.settings import config
+from core.conversation_memory import ConversationMemory
+from core.ingestion import ingestion_pipeline
+
+class SessionLimitError(Exception):
+    """Raised when a new session would exceed the configured maximum"""
+    pass
+
+class Session:
+    """Everything one conversation owns: its context, conversation state and turn lock.
+
+    Agents and the ChatManager are shared across sessions and keep no
+    per-conversation data, so a session is all a server needs per user.
+    """
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.context: Dict[str, Any] = {
+            "memory": ConversationMemory(), "files": [], "images": [], "session_id": self.session_id
+        }
+        self.state: Dict[str, Any] = {}
+        self.created = time.time()
+        self.last_active = self.created
+        # One turn at a time per session; turns of different sessions run concurrently
+        self.lock = asyncio.Lock()
+
+    def touch(self):
+        self.last_active = time.time()
+
+    @property
+    def busy(self) -> bool:
+        return self.lock.locked()
+
+class SessionStore:
+    """In-memory sessions with idle expiry and a size limit"""
+
+    def __init__(self, ttl: Optional[float] = None, max_sessions: Optional[int] = None):
+        self.ttl = ttl or config.SESSION_TTL
+        self.max_sessions = max_sessions or config.MAX_SESSIONS
+        self._sessions: Dict[str, Session] = {}
+        self.stats = {"created": 0, "expired": 0, "deleted": 0, "rejected": 0}
+
+    async def create(self) -> Session:
+        if len(self._sessions) >= self.max_sessions:
+            await self.prune()
+        if len(self._sessions) >= self.max_sessions:
+            self.stats["rejected"] += 1
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached")
+        session = Session()
+        self._sessions[session.session_id] = session
+        self.stats["created"] += 1
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        """The live session with this id, or None when unknown or expired"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._expired(session):
+            await self._remove(session_id)
+            self.stats["expired"] += 1
+            return None
+        session.touch()
+        return session
+
+    async def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        await self._remove(session_id)
+        self.stats["deleted"] += 1
+        return True
+
+    async def prune(self) -> int:
+        """Drop sessions idle for longer than the TTL"""
+        expired = [session_id for session_id, session in self._sessions.items() if self._expired(session)]
+        for session_id in expired:
+            await self._remove(session_id)
+        self.stats["expired"] += len(expired)
+        return len(expired)
+
+    def _expired(self, session: Session) -> bool:
+        # A session in the middle of a turn is never expired under it
+        return not session.busy and time.time() - session.last_active > self.ttl
+
+    async def _remove(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return  # Already removed while another removal was awaiting
+        session.context["memory"].clear()
+        # Deleting a large spool directory must not stall the loop serving every session
+        await asyncio.to_thread(ingestion_pipeline.discard_session, session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "active": len(self._sessions)}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
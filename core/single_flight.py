@@ -0,0 +1,171 @@
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, Callable, Tuple, TypeVar
+import asyncio
+import contextvars
+from core import deadline, scheduler
+
+T = TypeVar("T")
+
+class _Call:
+    """One shared in-flight call and the callers waiting on it"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        # The task's own context, so its deadline and priority follow its waiters
+        self.context = contextvars.Context()
+        self.waiters: List[Tuple[Optional[float], int]] = []
+        # Streams: chunks so far, and an event replaced on every new chunk
+        self.chunks: List[Any] = []
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def bind(self):
+        """Give the work the latest deadline and most urgent priority among its waiters"""
+        if not self.waiters or self.task is not None and self.task.done():
+            return
+        # Timeouts the work already started under keep their value; later calls see the new one
+        deadlines = [at for at, _ in self.waiters]
+        deadline.bind(self.context, None if None in deadlines else max(deadlines))
+        scheduler.bind_priority(self.context, min(level for _, level in self.waiters))
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one shared call.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs wait on the same task and receive the same result or
+    exception. A caller that is cancelled, or reaches its own turn deadline,
+    only stops waiting; the shared work is cancelled once every caller has
+    gone. The work runs in its own context, bound by the latest deadline and
+    the most urgent priority among the callers still waiting, not just those
+    of whichever caller happened to start it. Plain calls and streams never
+    share work, even under the same key. Unlike a cache this needs no
+    previous result, and nothing is kept once the call completes. Calls are
+    only shared within one event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Tuple[str, str], _Call] = {}
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0, "abandoned": 0, "errors": 0}
+
+    def _join(self, key: Tuple[str, str], start: Callable[[], Awaitable[Any]]) -> Tuple[_Call, Tuple]:
+        """The in-flight call for key on this loop, or a new one running start(), and the caller's waiter"""
+        self.stats["calls"] += 1
+        waiter = (deadline.current(), scheduler.current_priority())
+        call = self._calls.get(key)
+        if call is not None and not call.task.done() and call.task.get_loop() is asyncio.get_running_loop():
+            self.stats["coalesced"] += 1
+            call.waiters.append(waiter)
+            call.bind()
+        else:
+            call = _Call()
+            call.waiters.append(waiter)
+            call.bind()
+            call.task = asyncio.ensure_future(_in_context(call.context, start()))
+            self._calls[key] = call
+            self.stats["executions"] += 1
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+        return call, waiter
+
+    def _finished(self, key: Tuple[str, str], call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.task.cancelled():
+            return
+        if call.task.exception() is not None:
+            # Read here so it is never reported as unretrieved when nobody is left waiting
+            self.stats["errors"] += 1
+
+    def _leave(self, call: _Call, waiter: Tuple):
+        call.waiters.remove(waiter)
+        if call.task.done():
+            return
+        if not call.waiters:
+            self.stats["abandoned"] += 1
+            call.task.cancel()
+        else:
+            call.bind()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() for key, or wait for the identical call already in flight"""
+        call, waiter = self._join(("do", key), fn)
+        try:
+            # Shielded so one caller's cancellation does not cancel the others' call
+            return await asyncio.wait_for(asyncio.shield(call.task), deadline.timeout())
+        except asyncio.TimeoutError:
+            if call.task.done():
+                raise
+            raise deadline.DeadlineExceeded("Turn deadline exceeded") from None
+        finally:
+            self._leave(call, waiter)
+
+    async def stream(self, key: str, open_stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Iterate open_stream() for key, or replay and follow the identical stream already in flight"""
+        call: Optional[_Call] = None
+
+        async def produce():
+            try:
+                async for chunk in open_stream():
+                    call.chunks.append(chunk)
+                    call.notify()
+            finally:
+                call.notify()
+
+        call, waiter = self._join(("stream", key), produce)
+        try:
+            index = 0
+            while True:
+                while index < len(call.chunks):
+                    yield call.chunks[index]
+                    index += 1
+                if call.task.done():
+                    if not call.task.cancelled() and call.task.exception() is not None:
+                        raise call.task.exception()
+                    if call.task.cancelled():
+                        raise asyncio.CancelledError()
+                    return
+                try:
+                    await asyncio.wait_for(call.changed.wait(), deadline.timeout())
+                except asyncio.TimeoutError:
+                    raise deadline.DeadlineExceeded("Turn deadline exceeded") from None
+        finally:
+            self._leave(call, waiter)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self._calls)}
+
+class _Stepper:
+    """Awaitable that runs each step of a coroutine inside a given context"""
+
+    def __init__(self, context: contextvars.Context, coroutine):
+        self.context = context
+        self.coroutine = coroutine
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            try:
+                if error is None:
+                    yielded = self.context.run(self.coroutine.send, value)
+                else:
+                    yielded = self.context.run(self.coroutine.throw, error)
+            except StopIteration as e:
+                return e.value
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+async def _in_context(context: contextvars.Context, coroutine):
+    """Run coroutine in context rather than a copy of it (as a task would), so later
+    changes to the context reach work already running"""
+    return await _Stepper(context, coroutine)
+
+# Shared across agents and sessions so identical concurrent requests meet
+llm_flight = SingleFlight("llm")
+research_flight = SingleFlight("research")
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    return {flight.name: flight.get_stats() for flight in (llm_flight, research_flight)}
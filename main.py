@@ -5,8 +5,9 @@ from agents.image_agent import ImageAgent
 from agents.research_agent import ResearchAgent
 from agents.file_agent import FileAgent
 from agents.speech_agent import SpeechAgent
+from core.conversation_memory import ConversationMemory
 from config.settings import config
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator
 class MultiAgentChatbot:
     """Main chatbot application"""
     
@@ -28,18 +29,28 @@ class MultiAgentChatbot:
             self.chat_manager.register_agent(agent)
             print(f"Registered agent: {agent.name}")
             
-    async def chat(self, message: str, context: Dict = None) -> Dict:
+    async def chat(self, message: str, context: Dict = None, state: Dict = None) -> Dict:
         """Process a chat message"""
         context = context or {}
-        response = await self.chat_manager.process_message(message, context)
+        response = await self.chat_manager.process_message(message, context, state)
         return response
     
+    async def chat_stream(self, message: str, context: Dict = None, state: Dict = None) -> AsyncIterator[Dict]:
+        """Process a chat message, yielding text chunks as agents produce them"""
+        context = context or {}
+        async for event in self.chat_manager.process_message_stream(message, context, state):
+            yield event
+    
+    def cancel(self, state: Dict = None, reason: str = "cancelled") -> bool:
+        """Stop the turn in flight for state (e.g. when the chat is cleared)"""
+        return self.chat_manager.cancel_turn(state, reason)
+    
     async def run_cli(self):
         """Run command-line interface"""
         print("Multi-Agent Chatbot initialized. Type 'exit' to quit.")
         print("-" * 50)
         
-        context = {"history": []}
+        context = {"memory": ConversationMemory()}
         
         while True:
             try:
@@ -49,18 +60,25 @@ class MultiAgentChatbot:
                     print("Goodbye!")
                     break
                     
-                # Process message
-                response = await self.chat(user_input, context)
-                
-                # Display response
-                if response.get("text"):
-                    print(f"\nAssistant: {response['text']}")
+                # Process message, printing text as it streams in
+                response = {}
+                current_agent = None
+                async for event in self.chat_stream(user_input, context):
+                    if event["type"] == "chunk":
+                        if event["agent"] != current_agent:
+                            prefix = "\nAssistant: " if current_agent is None else f"\n[{event['agent']}] "
+                            print(prefix, end="", flush=True)
+                            current_agent = event["agent"]
+                        print(event["text"], end="", flush=True)
+                    elif event["type"] == "response":
+                        response = event["response"]
+                print()
                     
                 if response.get("images"):
                     print(f"\n[Generated {len(response['images'])} image(s)]")
                     
                 if response.get("audio"):
-                    print(f"\n[Generated audio file]")
+                    print(f"\n[Generated audio: {len(response['audio'])} segment(s)]")
                     
                 if response.get("metadata", {}).get("sources"):
                     print("\nSources:")
@@ -68,8 +86,7 @@ class MultiAgentChatbot:
                         print(f"  - {source}")
                         
                 # Update context
-                context["history"].append(f"User: {user_input}")
-                context["history"].append(f"Assistant: {response.get('text', '')}")
+                context["memory"].add_exchange(user_input, response.get('text', ''))
                 
             except KeyboardInterrupt:
                 print("\n\nInterrupted. Type 'exit' to quit.")
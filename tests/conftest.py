@@ -0,0 +1,5 @@
+import os
+
+# Tests run offline against the fake backend and never touch the on-disk caches
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("CACHE_ENABLED", "false")
@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+from config.settings import config
+from core import deadline
+from core.base_agent import BaseAgent
+from core.chat_manager import ChatManager
+from core.scheduler import Scheduler, INTERACTIVE
+
+class SlowAgent(BaseAgent):
+    """Streams one chunk, then stalls"""
+
+    def __init__(self):
+        super().__init__(name="conversational_agent")
+
+    async def process(self, input_data):
+        await asyncio.sleep(10)
+        return {"text": "finished", "metadata": {"agent": self.name}}
+
+    async def process_stream(self, input_data):
+        yield {"type": "chunk", "text": "partial answer"}
+        await asyncio.sleep(10)
+        yield {"type": "response", "response": {"text": "finished", "metadata": {"agent": self.name}}}
+
+def make_manager(turn_deadline: float = 30) -> ChatManager:
+    manager = ChatManager(turn_deadline=turn_deadline)
+    manager.register_agent(SlowAgent())
+    return manager
+
+async def final_response(stream):
+    async for event in stream:
+        if event["type"] == "response":
+            return event["response"]
+
+def test_timeout_is_capped_by_the_time_left():
+    assert deadline.timeout(5) == 5
+    with deadline.scope(deadline.after(1)):
+        assert 0 < deadline.timeout(5) <= 1
+        assert deadline.timeout(0.5) == 0.5
+
+def test_expired_deadline_raises_before_work_starts():
+    with deadline.scope(deadline.after(1) - 2):
+        assert deadline.expired()
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.timeout(5)
+
+def test_nested_scopes_only_tighten():
+    outer = deadline.after(1)
+    with deadline.scope(outer):
+        with deadline.scope(deadline.after(10)):
+            assert deadline.current() == outer
+        with deadline.scope(None):
+            assert deadline.current() == outer
+    assert deadline.current() is None
+
+def test_tasks_inherit_the_deadline():
+    async def main():
+        at = deadline.after(1)
+        with deadline.scope(at):
+            task = asyncio.ensure_future(asyncio.sleep(0, deadline.current()))
+        return at, await task
+
+    at, seen = asyncio.run(main())
+    assert seen == at
+
+def test_queueing_past_the_deadline_raises_deadline_exceeded():
+    scheduler = Scheduler(lane_settings={"test": {"requests_per_minute": 0, "initial": 1, "maximum": 1}},
+                          enabled=True)
+
+    async def main():
+        lane = scheduler.lane("test")
+        await lane.acquire(INTERACTIVE, None)
+        with deadline.scope(deadline.after(0.02)):
+            with pytest.raises(deadline.DeadlineExceeded):
+                await scheduler.run("test", lambda: asyncio.sleep(0))
+        lane.release()
+
+    asyncio.run(main())
+
+def test_hedged_call_wins_and_the_slow_one_is_cancelled(monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_MIN_DELAY", 0.01)
+    scheduler = Scheduler(lane_settings={"test": {"requests_per_minute": 0, "initial": 2}}, enabled=True)
+    lane = scheduler.lane("test")
+    lane._samples.extend([0.01] * 20)
+    calls = []
+
+    async def call():
+        index = len(calls)
+        calls.append("running")
+        try:
+            await asyncio.sleep(10 if index == 0 else 0)
+        except asyncio.CancelledError:
+            calls[index] = "cancelled"
+            raise
+        calls[index] = "finished"
+        return index
+
+    assert asyncio.run(asyncio.wait_for(scheduler.run_hedged("test", call), 1)) == 1
+    assert calls == ["cancelled", "finished"]
+    stats = lane.get_stats()
+    assert (stats["hedged"], stats["hedge_wins"], stats["in_flight"]) == (1, 1, 0)
+
+def test_no_hedge_while_the_lane_is_full(monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_MIN_DELAY", 0.01)
+    scheduler = Scheduler(lane_settings={"test": {"requests_per_minute": 0, "initial": 1}}, enabled=True)
+    lane = scheduler.lane("test")
+    lane._samples.extend([0.01] * 20)
+
+    async def call():
+        await asyncio.sleep(0.03)
+        return "done"
+
+    assert asyncio.run(scheduler.run_hedged("test", call)) == "done"
+    assert lane.stats["hedged"] == 0
+
+def test_turn_past_its_deadline_returns_what_was_streamed():
+    manager = make_manager(turn_deadline=0.05)
+    response = asyncio.run(asyncio.wait_for(
+        final_response(manager.process_message_stream("hello", {})), 1
+    ))
+    assert response["metadata"]["interrupted"] == "deadline"
+    assert "partial answer" in response["text"]
+
+def test_cancelled_turn_stops_and_reports_it():
+    manager = make_manager()
+    state = {}
+
+    async def main():
+        turn = asyncio.ensure_future(manager.process_message("hello", {}, state))
+        await asyncio.sleep(0.02)
+        assert manager.cancel_turn(state)
+        return await asyncio.wait_for(turn, 1)
+
+    response = asyncio.run(main())
+    assert response["metadata"]["interrupted"] == "cancelled"
+    assert "active_turn" not in state
+    assert not manager.cancel_turn(state)
+
+def test_newer_turn_supersedes_the_running_one():
+    manager = make_manager(turn_deadline=0.2)
+    state = {}
+
+    async def main():
+        first = asyncio.ensure_future(manager.process_message("first", {}, state))
+        await asyncio.sleep(0.02)
+        second = asyncio.ensure_future(manager.process_message("second", {}, state))
+        return await asyncio.wait_for(asyncio.gather(first, second), 1)
+
+    first, second = asyncio.run(main())
+    assert first["metadata"]["interrupted"] == "superseded"
+    assert second["metadata"]["interrupted"] == "deadline"
+    assert state["last_message"] == "second"
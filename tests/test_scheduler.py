@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from core import scheduler as scheduler_module
+from core.scheduler import Lane, Scheduler, OverloadedError, INTERACTIVE, BACKGROUND
+
+def make_lane(**settings) -> Lane:
+    defaults = {"requests_per_minute": 0, "initial": 1, "minimum": 1, "maximum": 4,
+                "queue_size": 4, "target_latency": 10.0}
+    return Lane("test", **{**defaults, **settings})
+
+def make_scheduler(**settings) -> Scheduler:
+    defaults = {"requests_per_minute": 0, "initial": 1, "minimum": 1, "maximum": 4,
+                "queue_size": 4, "target_latency": 10.0}
+    return Scheduler(lane_settings={"test": {**defaults, **settings}}, queue_timeout=1.0, enabled=True)
+
+def test_full_queue_rejects_instead_of_waiting():
+    lane = make_lane(queue_size=2)
+
+    async def main():
+        await lane.acquire(INTERACTIVE, None)
+        waiters = [asyncio.ensure_future(lane.acquire(INTERACTIVE, None)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError):
+            await lane.acquire(INTERACTIVE, None)
+        for _ in range(3):
+            lane.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(main())
+    assert lane.stats["rejected"] == 1
+    assert lane.get_stats()["in_flight"] == 0
+
+def test_background_work_only_fills_a_quarter_of_the_queue():
+    lane = make_lane(queue_size=4)
+
+    async def main():
+        await lane.acquire(INTERACTIVE, None)
+        waiter = asyncio.ensure_future(lane.acquire(BACKGROUND, None))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError):
+            await lane.acquire(BACKGROUND, None)
+        interactive = asyncio.ensure_future(lane.acquire(INTERACTIVE, None))
+        await asyncio.sleep(0)
+        assert not interactive.done()
+        waiter.cancel()
+        interactive.cancel()
+        await asyncio.gather(waiter, interactive, return_exceptions=True)
+
+    asyncio.run(main())
+    assert lane.get_stats()["waiting"] == 0
+
+def test_interactive_waiters_are_served_before_earlier_background_ones():
+    lane = make_lane()
+    order = []
+
+    async def wait(level, name):
+        await lane.acquire(level, None)
+        order.append(name)
+
+    async def main():
+        await lane.acquire(INTERACTIVE, None)
+        waiters = [asyncio.ensure_future(wait(BACKGROUND, "background")),
+                   asyncio.ensure_future(wait(INTERACTIVE, "interactive"))]
+        await asyncio.sleep(0)
+        lane.release()
+        await asyncio.sleep(0.01)
+        lane.release()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(main())
+    assert order == ["interactive", "background"]
+
+def test_slow_queue_wait_raises_overloaded_and_frees_its_place():
+    lane = make_lane()
+
+    async def main():
+        await lane.acquire(INTERACTIVE, None)
+        with pytest.raises(OverloadedError):
+            await lane.acquire(INTERACTIVE, 0.01)
+        lane.release()
+
+    asyncio.run(main())
+    assert lane.stats["timeouts"] == 1
+    stats = lane.get_stats()
+    assert (stats["in_flight"], stats["waiting"]) == (0, 0)
+
+def test_limit_halves_on_rate_limit_and_grows_back_while_saturated():
+    lane = make_lane(initial=4, maximum=8)
+    lane.in_flight = 1
+    lane.release(0.1, rate_limited=True, failed=True)
+    assert lane.limit == 2
+    for _ in range(4):
+        lane.in_flight = int(lane.limit)
+        lane.release(0.1)
+    assert 2 < lane.limit <= 4
+
+def test_rate_limited_call_is_retried_once_then_surfaces_as_overloaded(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "_backoff", lambda: 0)
+    scheduler = make_scheduler()
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise RuntimeError("429 Resource exhausted")
+
+    async def main():
+        with pytest.raises(OverloadedError):
+            await scheduler.run("test", call)
+
+    asyncio.run(main())
+    assert len(attempts) == 2
+    assert scheduler.lane("test").get_stats()["in_flight"] == 0
+
+def test_other_errors_pass_through_and_release_the_slot():
+    scheduler = make_scheduler()
+
+    async def call():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.run("test", call))
+    assert scheduler.lane("test").get_stats()["in_flight"] == 0
+
+def test_concurrency_never_exceeds_the_lane_limit():
+    scheduler = make_scheduler(initial=2, maximum=2, queue_size=16)
+    running, peak = [0], [0]
+
+    async def call():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.005)
+        running[0] -= 1
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(*(scheduler.run("test", call) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["ok"] * 10
+    assert peak[0] == 2
@@ -0,0 +1,189 @@
+import asyncio
+import pytest
+from config.settings import config
+from core import deadline, llm_backend
+from core.base_agent import BaseAgent
+from core.fake_backend import FakeBackend
+from core.scheduler import priority, current_priority, BACKGROUND, INTERACTIVE
+from core.single_flight import SingleFlight
+
+class EchoAgent(BaseAgent):
+    async def process(self, input_data):
+        return {"text": await self.think(input_data["message"])}
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(runs) == 1
+    assert flight.stats["coalesced"] == 4
+    assert flight.get_stats()["in_flight"] == 0
+
+def test_late_stream_caller_replays_from_the_start():
+    flight = SingleFlight("test")
+
+    async def chunks():
+        for chunk in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in flight.stream("key", chunks)]
+
+    async def main():
+        return await asyncio.gather(consume(0), consume(0.015))
+
+    assert asyncio.run(main()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert flight.stats["executions"] == 1
+
+def test_failure_reaches_every_waiter():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(2)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats["errors"] == 1
+
+@pytest.mark.parametrize("stream_first", [True, False])
+def test_plain_and_streaming_calls_with_the_same_key_do_not_share_work(stream_first):
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "text"
+
+    async def chunks():
+        await asyncio.sleep(0.02)
+        yield "te"
+        yield "xt"
+
+    async def streamed():
+        return "".join([chunk async for chunk in flight.stream("key", chunks)])
+
+    async def main():
+        calls = [streamed(), flight.do("key", work)]
+        if not stream_first:
+            calls.reverse()
+        return set(await asyncio.wait_for(asyncio.gather(*calls), 1))
+
+    assert asyncio.run(main()) == {"text"}
+    assert flight.stats["executions"] == 2
+
+def test_agent_think_and_think_stream_run_together(monkeypatch):
+    monkeypatch.setattr(config, "CACHE_ENABLED", False)
+    monkeypatch.setattr(llm_backend, "_backend", FakeBackend(latency=0.02))
+    agent = EchoAgent("echo")
+
+    async def streamed():
+        return "".join([chunk async for chunk in agent.think_stream("hello")])
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(agent.think("hello"), streamed()), 1)
+
+    plain, streamed_text = asyncio.run(main())
+    assert plain and plain == streamed_text
+
+def test_cancelled_waiter_leaves_the_others_running():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "result"
+    assert flight.stats["abandoned"] == 0
+
+def test_work_is_cancelled_once_every_waiter_leaves():
+    flight = SingleFlight("test")
+
+    async def main():
+        started, stopped = asyncio.Event(), asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.set()
+
+        waiters = [asyncio.ensure_future(flight.do("key", work)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(stopped.wait(), 1)
+
+    asyncio.run(main())
+    assert flight.stats["abandoned"] == 1
+    assert flight.get_stats()["in_flight"] == 0
+
+def test_waiter_past_its_deadline_stops_waiting_alone():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def hurried():
+        with deadline.scope(deadline.after(0.01)):
+            return await flight.do("key", work)
+
+    async def main():
+        return await asyncio.gather(hurried(), flight.do("key", work), return_exceptions=True)
+
+    hurried_result, patient_result = asyncio.run(main())
+    assert isinstance(hurried_result, deadline.DeadlineExceeded)
+    assert patient_result == "result"
+
+def test_work_follows_the_loosest_deadline_and_most_urgent_priority_of_its_waiters():
+    flight = SingleFlight("test")
+    seen = []
+
+    async def work():
+        for _ in range(3):
+            seen.append((deadline.current(), current_priority()))
+            await asyncio.sleep(0.01)
+        return "result"
+
+    async def background(at):
+        with priority(BACKGROUND), deadline.scope(at):
+            return await flight.do("key", work)
+
+    async def interactive(at):
+        await asyncio.sleep(0.005)
+        with deadline.scope(at):
+            return await flight.do("key", work)
+
+    async def main():
+        soon, later = deadline.after(5), deadline.after(10)
+        await asyncio.gather(background(soon), interactive(later))
+        return soon, later
+
+    soon, later = asyncio.run(main())
+    assert seen[0] == (soon, BACKGROUND)
+    assert seen[-1] == (later, INTERACTIVE)
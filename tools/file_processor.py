@@ -0,0 +1,323 @@
+from typing import Dict, Any, List, Optional, Callable, Iterable, Iterator, Tuple, Union
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from xml.etree import ElementTree
+import asyncio
+import hashlib
+import json
+import threading
+import zipfile
+import aiofiles
+from config.settings import config
+from core.response_cache import ResponseCache, parse_cache
+
+# Bump when a parser's output changes so cached results are not reused
+PARSER_VERSION = 1
+
+# Parsers below run in worker processes, so they must stay module-level
+# functions that take a path and return picklable data
+
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def parse_page_ranges(pages: Union[str, Iterable[int], None], page_count: int) -> List[int]:
+    """Turn "1-3,7" (1-based, inclusive) or a list of page numbers into 0-based indexes"""
+    if pages is None:
+        return list(range(page_count))
+    if isinstance(pages, str):
+        numbers = []
+        for part in pages.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                first, _, last = part.partition("-")
+                start = int(first) if first.strip() else 1
+                stop = int(last) if last.strip() else page_count
+                numbers.extend(range(start, stop + 1))
+            else:
+                numbers.append(int(part))
+        pages = numbers
+    return [number - 1 for number in dict.fromkeys(pages) if 1 <= number <= page_count]
+
+def iter_pdf_chunks(file_path: str, pages: Union[str, Iterable[int], None] = None) -> Iterator[Dict[str, Any]]:
+    """Yield {"page", "text"} per page; pages are only parsed when reached"""
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for index in parse_page_ranges(pages, len(pdf_reader.pages)):
+            text = pdf_reader.pages[index].extract_text() or ""
+            if text.strip():
+                yield {"page": index + 1, "text": text}
+
+def iter_docx_chunks(file_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield paragraphs and tables in document order.
+
+    word/document.xml is streamed with iterparse instead of loading the
+    python-docx object model, so reading can stop after the first chunks.
+    Tables come out as one chunk with cells separated by " | ".
+    """
+    paragraph_tag, table_tag = _DOCX_NS + "p", _DOCX_NS + "tbl"
+    row_tag, cell_tag, text_tag = _DOCX_NS + "tr", _DOCX_NS + "tc", _DOCX_NS + "t"
+    with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+        table_depth = 0
+        paragraph = 0
+        table = 0
+        for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                if element.tag == table_tag:
+                    table_depth += 1
+                continue
+            if element.tag == paragraph_tag and not table_depth:
+                paragraph += 1
+                text = "".join(node.text or "" for node in element.iter(text_tag))
+                element.clear()
+                if text.strip():
+                    yield {"paragraph": paragraph, "text": text}
+            elif element.tag == table_tag:
+                table_depth -= 1
+                if table_depth:
+                    continue
+                table += 1
+                rows = []
+                for row in element.iter(row_tag):
+                    cells = ["".join(node.text or "" for node in cell.iter(text_tag)).strip()
+                             for cell in row.iter(cell_tag)]
+                    rows.append(" | ".join(cells))
+                element.clear()
+                if any(rows):
+                    yield {"table": table, "text": "\n".join(rows)}
+
+def collect_chunks(chunks: Iterator[Dict[str, Any]], max_chars: Optional[int] = None,
+                   separator: str = "\n") -> Dict[str, Any]:
+    """Gather chunks until max_chars of text, closing the source early.
+
+    Returns {"text", "chunks", "truncated"}; the last chunk is cut to fit.
+    """
+    collected = []
+    length = 0
+    truncated = False
+    try:
+        for chunk in chunks:
+            if max_chars is not None and length + len(chunk["text"]) >= max_chars:
+                truncated = True
+                if max_chars <= length:
+                    break
+                chunk = {**chunk, "text": chunk["text"][:max_chars - length]}
+            collected.append(chunk)
+            length += len(chunk["text"]) + len(separator)
+            if truncated:
+                break
+    finally:
+        # Stops the underlying parser and closes the file
+        chunks.close()
+    return {
+        "text": separator.join(chunk["text"] for chunk in collected),
+        "chunks": collected,
+        "truncated": truncated
+    }
+
+def parse_pdf(file_path: str, pages: Union[str, Iterable[int], None] = None,
+              max_chars: Optional[int] = None) -> Dict[str, Any]:
+    """Extract text from PDF, page by page, stopping at max_chars"""
+    return collect_chunks(iter_pdf_chunks(file_path, pages), max_chars)
+
+def parse_docx(file_path: str, max_chars: Optional[int] = None) -> Dict[str, Any]:
+    """Extract paragraphs and tables from Word document, stopping at max_chars"""
+    return collect_chunks(iter_docx_chunks(file_path), max_chars)
+
+def parse_csv(file_path: str) -> Dict[str, Any]:
+    """Process CSV file in chunks with online per-column statistics"""
+    from tools.table_stats import summarize_csv
+    return summarize_csv(file_path)
+
+def parse_excel(file_path: str) -> Dict[str, Any]:
+    """Process Excel file sheet by sheet in read-only streaming mode"""
+    from tools.table_stats import summarize_excel
+    return summarize_excel(file_path)
+
+async def read_txt(file_path: str) -> str:
+    """Read text file without blocking the event loop"""
+    async with aiofiles.open(file_path, 'r', encoding='utf-8') as file:
+        return await file.read()
+
+async def read_json(file_path: str) -> Any:
+    """Read JSON file without blocking the event loop"""
+    async with aiofiles.open(file_path, 'r') as file:
+        return json.loads(await file.read())
+
+def file_hash(file_path: str) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds Config.MAX_FILE_SIZE"""
+    pass
+
+class FileProcessor:
+    """Parses uploaded files off the event loop.
+
+    CPU-bound formats (PDF, Word, CSV, Excel) run in a bounded process pool;
+    plain text and JSON are read with aiofiles. Each file has its own timeout,
+    and a batch of files is parsed concurrently.
+    """
+
+    # Parsers that run in the process pool
+    POOL_PARSERS: Dict[str, Callable[[str], Any]] = {
+        'pdf': parse_pdf,
+        'docx': parse_docx,
+        'csv': parse_csv,
+        'xlsx': parse_excel,
+    }
+
+    # Formats summarized in chunks, whose memory use does not grow with file size
+    TABLE_FORMATS = {'csv', 'xlsx'}
+
+    # Parsers that only do I/O and run on the event loop
+    ASYNC_PARSERS = {
+        'txt': read_txt,
+        'json': read_json,
+    }
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 max_file_size: Optional[int] = None, max_chars: Optional[int] = None,
+                 max_table_size: Optional[int] = None, cache: Optional[ResponseCache] = None):
+        self.max_workers = max_workers or config.FILE_PARSE_WORKERS
+        self.timeout = timeout or config.FILE_PARSE_TIMEOUT
+        self.max_file_size = max_file_size or config.MAX_FILE_SIZE
+        self.max_chars = max_chars or config.FILE_MAX_CHARS
+        self.max_table_size = max_table_size or config.MAX_TABLE_FILE_SIZE
+        self.cache = cache
+        # (path, size, mtime) -> content hash, so unchanged files are not re-read
+        self._hashes: "OrderedDict[tuple, str]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def supported_formats(self) -> List[str]:
+        return [*self.POOL_PARSERS, *self.ASYNC_PARSERS]
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Start the worker pool on first use"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def _reset_pool(self):
+        """Drop a pool whose worker died so the next parse starts a fresh one"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def parse(self, file_path: str, file_type: Optional[str] = None,
+                    pages: Union[str, Iterable[int], None] = None, max_chars: Optional[int] = None) -> Any:
+        """Parse one file with its format's parser, enforcing size and timeout.
+
+        pages selects PDF pages ("1-10,15"); PDF and Word extraction stop
+        once max_chars of text (default FILE_MAX_CHARS) have been collected.
+        """
+        file_type = (file_type or Path(file_path).suffix[1:]).lower()
+        size = (await asyncio.to_thread(Path(file_path).stat)).st_size
+        # Tables are streamed with bounded memory, so they get a larger limit
+        limit = self.max_table_size if file_type in self.TABLE_FORMATS else self.max_file_size
+        if size > limit:
+            raise FileTooLargeError(
+                f"File is {size / (1024 * 1024):.1f}MB; the limit is {limit / (1024 * 1024):.0f}MB"
+            )
+
+        if file_type in self.ASYNC_PARSERS:
+            return await asyncio.wait_for(self.ASYNC_PARSERS[file_type](file_path), self.timeout)
+        if file_type not in self.POOL_PARSERS:
+            raise ValueError(f"Unsupported file format: {file_type}")
+
+        parser = self.POOL_PARSERS[file_type]
+        if file_type == 'pdf':
+            parser = partial(parser, pages=pages, max_chars=max_chars or self.max_chars)
+        elif file_type == 'docx':
+            parser = partial(parser, max_chars=max_chars or self.max_chars)
+
+        loop = asyncio.get_running_loop()
+        try:
+            # A timed-out parse keeps its worker busy until it finishes, but the
+            # pool is bounded so it cannot take more than one slot
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._get_pool(), parser, file_path),
+                self.timeout
+            )
+        except BrokenProcessPool:
+            self._reset_pool()
+            raise
+
+    async def content_hash(self, file_path: str) -> str:
+        """Content hash of a file, recomputed only when its size or mtime changes"""
+        digest, _ = await self._fingerprint(file_path)
+        return digest
+
+    async def _fingerprint(self, file_path: str) -> Tuple[str, int]:
+        """Content hash and size of a file, from one stat off the event loop"""
+        stat = await asyncio.to_thread(Path(file_path).stat)
+        key = (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns)
+        digest = self._hashes.get(key)
+        if digest is None:
+            digest = await asyncio.to_thread(file_hash, file_path)
+            self._hashes[key] = digest
+            while len(self._hashes) > 256:
+                self._hashes.popitem(last=False)
+        return digest, stat.st_size
+
+    async def process_file(self, file_info: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Parse one upload into the dict FileAgent passes to the model.
+
+        Results are cached by content hash and parser version, so unchanged
+        files are parsed once across turns.
+        """
+        file_path = file_info.get("path")
+        name = file_info.get("name") or Path(file_path).name
+        file_ext = Path(file_path).suffix[1:].lower()
+
+        if file_ext not in self.supported_formats:
+            return {"name": name, "type": file_ext, "error": f"Unsupported file format: {file_ext}"}
+
+        try:
+            digest, size = await self._fingerprint(file_path)
+            pages = file_info.get("pages")
+            cache_key = f"{digest}:{file_ext}:{PARSER_VERSION}:{self.max_chars}:{pages}"
+            content = await self.cache.aget(cache_key) if self.cache is not None and use_cache else None
+            if content is None:
+                content = await self.parse(file_path, file_ext, pages=pages)
+                if self.cache is not None:
+                    self.cache.set(cache_key, content)
+        except asyncio.TimeoutError:
+            return {"name": name, "type": file_ext, "error": f"Parsing timed out after {self.timeout}s"}
+        except Exception as e:
+            return {"name": name, "type": file_ext, "error": str(e) or type(e).__name__}
+
+        return {
+            "name": name,
+            "type": file_ext,
+            "content": content,
+            "size": size,
+            "hash": digest
+        }
+
+    async def process_files(self, files: List[Dict[str, Any]], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Parse uploads concurrently; results keep the order of files"""
+        return await asyncio.gather(*(self.process_file(file_info, use_cache) for file_info in files))
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+            self._pool = None
+
+# Shared processor so every agent reuses one worker pool and parse cache
+file_processor = FileProcessor(cache=parse_cache if config.CACHE_ENABLED else None)
@@ -0,0 +1,154 @@
+from typing import Iterable, Iterator, List, Optional, Union
+from html.parser import HTMLParser
+import codecs
+import re
+
+# Content inside these elements is never kept
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "head", "nav", "header", "footer", "aside", "form", "button", "select",
+}
+
+# Elements that separate words when their tags have no whitespace around them
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "tr", "td", "th", "table", "section", "article",
+    "main", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt", "hr",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+class _BudgetReached(Exception):
+    pass
+
+class HTMLTextExtractor(HTMLParser):
+    """Incremental HTML-to-text extractor with a character budget.
+
+    Feed it the page in chunks as they arrive. Script, style, navigation and
+    other boilerplate elements are skipped while parsing, whitespace is
+    collapsed, and parsing stops as soon as max_chars of text are collected.
+    """
+
+    def __init__(self, max_chars: int = 5000):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.length = 0
+        self.done = False
+        self._skip_depth = 0
+        self._pending_space = False
+        self._emitted = 0
+
+    def feed(self, data: str) -> bool:
+        """Parse more markup; returns True once the budget is reached"""
+        if self.done:
+            return True
+        try:
+            super().feed(data)
+        except _BudgetReached:
+            self.done = True
+        return self.done
+
+    def close(self):
+        if not self.done:
+            try:
+                super().close()
+            except _BudgetReached:
+                self.done = True
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)[:self.max_chars]
+
+    def new_parts(self) -> List[str]:
+        """Text produced since the previous call"""
+        parts = self.parts[self._emitted:]
+        self._emitted = len(self.parts)
+        return parts
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._pending_space = True
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags never open a skipped region
+        if tag in BLOCK_TAGS:
+            self._pending_space = True
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self._pending_space = True
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if data[:1].isspace() or data[-1:].isspace():
+            stripped = data.strip()
+            leading = data[:1].isspace()
+            trailing = data[-1:].isspace()
+        else:
+            stripped, leading, trailing = data, False, False
+        if not stripped:
+            self._pending_space = self._pending_space or bool(data)
+            return
+
+        piece = _WHITESPACE.sub(" ", stripped)
+        if self.parts and (self._pending_space or leading):
+            piece = " " + piece
+        self._pending_space = trailing
+
+        self.parts.append(piece)
+        self.length += len(piece)
+        if self.length >= self.max_chars:
+            raise _BudgetReached()
+
+def sniff_encoding(head: bytes, content_type: Optional[str] = None) -> str:
+    """Pick a decoder from the Content-Type header or a <meta charset>"""
+    if content_type and "charset=" in content_type:
+        return content_type.split("charset=")[-1].split(";")[0].strip().strip('"') or "utf-8"
+    match = _CHARSET.search(head[:4096])
+    if match:
+        return match.group(1).decode("ascii", "ignore") or "utf-8"
+    return "utf-8"
+
+def make_decoder(encoding: str):
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+def stream_text(chunks: Iterable[Union[bytes, str]], max_chars: int = 5000,
+                content_type: Optional[str] = None) -> Iterator[str]:
+    """Yield text pieces from HTML chunks, stopping once max_chars are produced"""
+    extractor = HTMLTextExtractor(max_chars)
+    decoder = None
+    produced = 0
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = make_decoder(sniff_encoding(chunk, content_type))
+            chunk = decoder.decode(chunk)
+        done = extractor.feed(chunk)
+        for part in extractor.new_parts():
+            part = part[:max_chars - produced]
+            produced += len(part)
+            yield part
+        if done:
+            return
+    extractor.close()
+    for part in extractor.new_parts():
+        part = part[:max_chars - produced]
+        produced += len(part)
+        if part:
+            yield part
+
+def extract_text(html: Union[bytes, str], max_chars: int = 5000,
+                 content_type: Optional[str] = None, chunk_size: int = 64 * 1024) -> str:
+    """Extract readable text from a whole page, parsing only as much as needed"""
+    chunks = (html[i:i + chunk_size] for i in range(0, len(html), chunk_size))
+    return "".join(stream_text(chunks, max_chars, content_type))
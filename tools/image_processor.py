@@ -0,0 +1,79 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+from io import BytesIO
+import asyncio
+import hashlib
+import threading
+from PIL import Image, ImageOps
+from config.settings import config
+
+def prepare_image(data: bytes, max_side: int, quality: int) -> Dict[str, Any]:
+    """Downsize and re-encode an image for a vision model.
+
+    Applies EXIF rotation, fits the longest side within max_side and encodes
+    as JPEG. Small JPEGs are passed through untouched. Returns an inline
+    {"mime_type", "data"} part the model backends accept as an image.
+    """
+    with Image.open(BytesIO(data)) as image:
+        if image.format == "JPEG" and max(image.size) <= max_side:
+            return {"mime_type": "image/jpeg", "data": data}
+
+        # Decode at a reduced scale when the codec supports it (JPEG draft mode)
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        output = BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+        return {"mime_type": "image/jpeg", "data": output.getvalue()}
+
+class ImagePreprocessor:
+    """Prepares images for vision requests, caching results by content hash.
+
+    Work runs in a thread so decoding never blocks the event loop. Prepared
+    payloads are kept in an LRU bounded by total bytes, so images that stay
+    in context across turns are only processed once.
+    """
+
+    def __init__(self, max_side: Optional[int] = None, quality: Optional[int] = None,
+                 max_cache_bytes: Optional[int] = None):
+        self.max_side = max_side or config.IMAGE_MAX_SIDE
+        self.quality = quality or config.IMAGE_JPEG_QUALITY
+        self.max_cache_bytes = max_cache_bytes if max_cache_bytes is not None else config.IMAGE_CACHE_BYTES
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_in": 0, "bytes_out": 0}
+
+    async def prepare(self, data: bytes) -> Dict[str, Any]:
+        """Return the prepared {"mime_type", "data"} part for raw image bytes"""
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            payload = self._cache.get(key)
+            if payload is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return payload
+            self.stats["misses"] += 1
+
+        payload = await asyncio.to_thread(prepare_image, data, self.max_side, self.quality)
+        with self._lock:
+            self.stats["bytes_in"] += len(data)
+            self.stats["bytes_out"] += len(payload["data"])
+            if key not in self._cache:
+                self._cache[key] = payload
+                self._cache_bytes += len(payload["data"])
+            while self._cache_bytes > self.max_cache_bytes and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted["data"])
+        return payload
+
+# Shared preprocessor so the UI's background ingestion warms the agent's cache
+image_preprocessor = ImagePreprocessor()
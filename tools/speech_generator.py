@@ -0,0 +1,140 @@
+from typing import Dict, Any, List, Optional, AsyncIterator
+import asyncio
+import base64
+import hashlib
+import io
+import re
+from config.settings import config
+from core.blob_store import BlobStore, blob_store
+from core.response_cache import ResponseCache, speech_cache
+
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+|\n{2,}")
+
+def split_sentences(text: str, max_chars: Optional[int] = None) -> List[str]:
+    """Split text into sentence-aligned segments of at most about max_chars.
+
+    Short sentences are merged so each request carries a useful amount of
+    speech; sentences longer than max_chars are split on word boundaries.
+    """
+    max_chars = max_chars or config.SPEECH_SEGMENT_CHARS
+    segments: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                segments.append(current)
+                current = ""
+            segments.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+def synthesize(text: str, lang: str, voice: str) -> bytes:
+    """Synthesize one segment to MP3 with gTTS (blocking network call)"""
+    from gtts import gTTS
+    audio_buffer = io.BytesIO()
+    # gTTS picks the accent from the Google Translate domain
+    gTTS(text=text, lang=lang, tld=voice).write_to_fp(audio_buffer)
+    return audio_buffer.getvalue()
+
+class SpeechGenerator:
+    """Sentence-streamed text-to-speech with an audio cache.
+
+    Text is split into segments that are synthesized concurrently in worker
+    threads, bounded by max_concurrency, and delivered in order as soon as
+    each is ready, so playback can start after the first sentence. Segments
+    are cached by (text, lang, voice) and the audio itself goes into the blob
+    store, so chunks only carry a reference.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, cache: Optional[ResponseCache] = None,
+                 blobs: Optional[BlobStore] = None):
+        self.max_concurrency = max_concurrency or config.SPEECH_CONCURRENCY
+        self.cache = cache
+        self.blobs = blobs or blob_store
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Semaphores belong to one event loop; make one per running loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    @staticmethod
+    def cache_key(text: str, lang: str, voice: str) -> str:
+        return hashlib.sha256(f"{lang}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    async def synthesize_segment(self, text: str, lang: Optional[str] = None,
+                                 voice: Optional[str] = None) -> bytes:
+        """MP3 bytes for one segment, from the cache when possible"""
+        lang = lang or config.SPEECH_LANG
+        voice = voice or config.SPEECH_VOICE
+        key = self.cache_key(text, lang, voice)
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return base64.b64decode(cached)
+
+        async with self._get_semaphore():
+            audio = await asyncio.to_thread(synthesize, text, lang, voice)
+        if self.cache is not None:
+            # The persistent cache stores JSON, hence base64
+            self.cache.set(key, base64.b64encode(audio).decode())
+        return audio
+
+    async def stream(self, text: str, lang: Optional[str] = None,
+                     voice: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ordered audio chunks: a blob reference plus format, text, index and total"""
+        segments = split_sentences(text)
+        tasks = [asyncio.ensure_future(self.synthesize_segment(segment, lang, voice)) for segment in segments]
+        try:
+            for index, (segment, task) in enumerate(zip(segments, tasks)):
+                # Storing may spill older blobs to disk, so it runs off the event loop
+                ref = await self.blobs.aput(await task, "audio/mpeg")
+                yield {
+                    **ref,
+                    "format": "mp3",
+                    "text": segment,
+                    "index": index,
+                    "total": len(segments)
+                }
+        finally:
+            # Stop synthesizing if the consumer stops early or a segment fails, and
+            # collect every outcome so none is reported as never retrieved
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def generate(self, text: str, lang: Optional[str] = None,
+                       voice: Optional[str] = None) -> List[Dict[str, Any]]:
+        """All audio chunks for text, in order"""
+        return [chunk async for chunk in self.stream(text, lang, voice)]
+
+def combine_audio(chunks: List[Dict[str, Any]]) -> bytes:
+    """Join ordered MP3 chunks into one playable file (MP3 frames concatenate)"""
+    return b"".join(audio_bytes(chunk) for chunk in chunks)
+
+def audio_bytes(chunk: Dict[str, Any]) -> bytes:
+    """Bytes of an audio chunk, whether it carries a blob reference or base64 data"""
+    if chunk.get("blob"):
+        return blob_store.get(chunk) or b""
+    if chunk.get("data"):
+        return base64.b64decode(chunk["data"])
+    return b""
+
+# Shared generator so concurrency limits and the audio cache apply across agents
+speech_generator = SpeechGenerator(cache=speech_cache if config.CACHE_ENABLED else None)
@@ -0,0 +1,195 @@
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+import json
+import numpy as np
+import pandas as pd
+from config.settings import config
+
+_QUANTILES = (0.25, 0.5, 0.75)
+
+# Inferred kinds that are never summarized as numbers (pandas stores them as integers underneath)
+_TEMPORAL_KINDS = {"datetime64", "datetime", "date", "time", "timedelta64", "timedelta", "period"}
+
+class ColumnStats:
+    """Online statistics for one column, fed a chunk at a time.
+
+    Memory is bounded by sample_size and sketch_size regardless of row count:
+    count/mean/variance are merged per chunk (Chan et al.), quantiles come
+    from a uniform bottom-k sample, and distinct values are estimated with a
+    k-minimum-values sketch over 64-bit hashes. Chunks are typed separately
+    (pandas infers per chunk), so the column is numeric only while every
+    value seen so far parses as a number, and numbers are hashed as float64
+    so 1 and 1.0 count once. Dates, times and durations are not numbers, as
+    in DataFrame.describe().
+    """
+
+    def __init__(self, name: str, sample_size: int = 4096, sketch_size: int = 1024, seed: int = 0):
+        self.name = name
+        self.sample_size = sample_size
+        self.sketch_size = sketch_size
+        self.numeric: Optional[bool] = None
+        self._seen_numbers = False
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Any = None
+        self.max: Any = None
+        self._rng = np.random.default_rng(seed)
+        self._sample = np.empty(0, dtype=np.float64)
+        self._sample_keys = np.empty(0, dtype=np.float64)
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, series: pd.Series):
+        """Fold one chunk of the column into the statistics"""
+        values = series.dropna()
+        self.missing += len(series) - len(values)
+        if values.empty:
+            return
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        if kind == "boolean" or kind in _TEMPORAL_KINDS:
+            numbers = pd.Series(np.nan, index=values.index)
+        elif pd.api.types.is_numeric_dtype(values):
+            numbers = values.astype(np.float64)
+        elif kind == "string" and not self._seen_numbers:
+            # Text-only so far; parsing every string for numbers is the costly part
+            numbers = pd.Series(np.nan, index=values.index)
+        else:
+            numbers = pd.to_numeric(values, errors="coerce")
+        is_number = numbers.notna()
+        self._seen_numbers = self._seen_numbers or bool(is_number.any())
+        chunk_numeric = bool(is_number.all())
+        # A column stops being numeric as soon as any chunk holds a non-number
+        self.numeric = chunk_numeric if self.numeric is None else self.numeric and chunk_numeric
+
+        self._update_distinct(values, numbers, is_number)
+        if self.numeric:
+            self._update_numeric(numbers.to_numpy(dtype=np.float64))
+        else:
+            self.count += len(values)
+
+    def _update_numeric(self, numbers: np.ndarray):
+        if not len(numbers):
+            return
+        n, mean, m2 = len(numbers), float(numbers.mean()), float(((numbers - numbers.mean()) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        low, high = float(numbers.min()), float(numbers.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+        # Bottom-k sampling: keep the values with the smallest random keys
+        keys = np.concatenate([self._sample_keys, self._rng.random(n)])
+        sample = np.concatenate([self._sample, numbers])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            keys, sample = keys[keep], sample[keep]
+        self._sample_keys, self._sample = keys, sample
+
+    def _update_distinct(self, values: pd.Series, numbers: pd.Series, is_number: pd.Series):
+        # Numbers hash by value whatever their chunk's dtype; everything else by its text
+        hashes = np.empty(len(values), dtype=np.uint64)
+        mask = is_number.to_numpy()
+        if mask.any():
+            hashes[mask] = pd.util.hash_pandas_object(numbers[mask].astype(np.float64), index=False).to_numpy()
+        if not mask.all():
+            hashes[~mask] = pd.util.hash_pandas_object(values[~mask].astype(str), index=False).to_numpy()
+        hashes = np.unique(np.concatenate([self._hashes, hashes]))
+        self._hashes = hashes[:self.sketch_size]
+
+    @property
+    def distinct(self) -> int:
+        """Exact below sketch_size distinct values, estimated above it"""
+        if len(self._hashes) < self.sketch_size:
+            return len(self._hashes)
+        kth = float(self._hashes[-1]) / float(np.iinfo(np.uint64).max)
+        return int(round((self.sketch_size - 1) / kth))
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "count": self.count,
+            "missing": self.missing,
+            "distinct": self.distinct,
+        }
+        if self.numeric and self.count:
+            variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+            summary.update({
+                "mean": self.mean,
+                "std": variance ** 0.5,
+                "min": self.min,
+                "max": self.max,
+            })
+            for q, value in zip(_QUANTILES, np.quantile(self._sample, _QUANTILES)):
+                summary[f"{int(q * 100)}%"] = float(value)
+        return summary
+
+class TableSummary:
+    """Row count, column stats and a short preview for a stream of DataFrame chunks"""
+
+    def __init__(self, preview_rows: int = 10):
+        self.preview_rows = preview_rows
+        self.rows = 0
+        self.columns: Dict[str, ColumnStats] = {}
+        self.preview: List[Dict[str, Any]] = []
+
+    def update(self, chunk: pd.DataFrame):
+        if len(self.preview) < self.preview_rows:
+            head = chunk.head(self.preview_rows - len(self.preview))
+            self.preview.extend(json.loads(head.to_json(orient="records", date_format="iso")))
+        self.rows += len(chunk)
+        for name in chunk.columns:
+            key = str(name)
+            if key not in self.columns:
+                self.columns[key] = ColumnStats(key)
+            self.columns[key].update(chunk[name])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "preview": self.preview,
+            "shape": [self.rows, len(self.columns)],
+            "columns": list(self.columns),
+            "summary": {name: stats.to_dict() for name, stats in self.columns.items()}
+        }
+
+def summarize_chunks(chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+    summary = TableSummary()
+    for chunk in chunks:
+        summary.update(chunk)
+    return summary.to_dict()
+
+def summarize_csv(file_path: str, chunk_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Summarize a CSV file without loading it whole"""
+    chunks = pd.read_csv(file_path, chunksize=chunk_rows or config.TABLE_CHUNK_ROWS, low_memory=True)
+    with chunks:
+        return summarize_chunks(chunks)
+
+def iter_sheet_chunks(worksheet, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Yield a read-only worksheet as DataFrames of chunk_rows rows; the first row is the header"""
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [str(value) if value is not None else f"Unnamed: {index}" for index, value in enumerate(header)]
+    batch = []
+    for row in rows:
+        batch.append(row[:len(columns)] + (None,) * (len(columns) - len(row)))
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+            batch = []
+    if batch:
+        yield pd.DataFrame.from_records(batch, columns=columns)
+
+def summarize_excel(file_path: str, chunk_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Summarize every sheet of a workbook, streaming rows in read-only mode"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        # Sheets are only read when reached
+        return {
+            sheet_name: summarize_chunks(iter_sheet_chunks(workbook[sheet_name], chunk_rows or config.TABLE_CHUNK_ROWS))
+            for sheet_name in workbook.sheetnames
+        }
+    finally:
+        workbook.close()
@@ -0,0 +1,224 @@
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass, field
+import asyncio
+import time
+import aiohttp
+from config.settings import config
+from core import deadline
+from core.response_cache import ResponseCache, page_cache
+from tools.html_extractor import HTMLTextExtractor, make_decoder, sniff_encoding
+
+@dataclass
+class FetchResult:
+    """A fetched page; body is capped at the scraper's byte limit"""
+    url: str
+    status: int
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+    truncated: bool = False
+    error: Optional[str] = None
+    text: Optional[str] = None
+    from_cache: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 300
+
+class WebScraper:
+    """Shared async HTTP client with connection pooling and capped downloads.
+
+    One aiohttp session (and its keep-alive connection pool) is reused for all
+    requests made on the same event loop. Connections are limited overall and
+    per host, and bodies are streamed so reading stops at max_bytes.
+    """
+
+    def __init__(self, max_connections: Optional[int] = None, per_host: Optional[int] = None,
+                 max_bytes: Optional[int] = None, timeout: Optional[float] = None,
+                 cache: Optional[ResponseCache] = None, cache_ttl: Optional[float] = None):
+        self.max_connections = max_connections or config.HTTP_MAX_CONNECTIONS
+        self.per_host = per_host or config.HTTP_MAX_CONNECTIONS_PER_HOST
+        self.max_bytes = max_bytes or config.SCRAPE_MAX_BYTES
+        self.timeout = timeout or config.HTTP_TIMEOUT
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._guard = None  # Closes the session when its loop shuts down
+        self.cache = cache
+        self.cache_ttl = cache_ttl if cache_ttl is not None else config.PAGE_CACHE_TTL
+        self.stats = {
+            "requests": 0, "errors": 0, "bytes": 0, "truncated": 0,
+            "cache_fresh_hits": 0, "cache_revalidated": 0, "cache_refetched": 0, "cache_misses": 0,
+        }
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, creating one for the running loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._release_session()
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.per_host,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": "Mozilla/5.0 (compatible; MultiAgentChatbot/1.0)"}
+            )
+            self._loop = loop
+            # asyncio.run() finalizes async generators before closing its loop,
+            # which closes this session on the loop that owns its connections
+            self._guard = _close_on_shutdown(self._session)
+            await self._guard.__anext__()
+        return self._session
+
+    def _release_session(self):
+        """Close the session opened on a previous event loop, on that loop"""
+        session, loop = self._session, self._loop
+        self._session = self._loop = self._guard = None
+        if session is None or session.closed or loop is None or loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+    def _request_timeout(self) -> aiohttp.ClientTimeout:
+        """The per-request timeout, shortened to what is left of the current turn"""
+        return aiohttp.ClientTimeout(total=deadline.timeout(self.timeout))
+
+    async def fetch(self, url: str, max_bytes: Optional[int] = None,
+                    headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """GET a URL, streaming the body and stopping once max_bytes are read"""
+        limit = max_bytes or self.max_bytes
+        self.stats["requests"] += 1
+        try:
+            session = await self._get_session()
+            async with session.get(url, headers=headers, timeout=self._request_timeout()) as response:
+                result = FetchResult(url=str(response.url), status=response.status, headers=dict(response.headers))
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(16 * 1024):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= limit:
+                        result.truncated = True
+                        self.stats["truncated"] += 1
+                        break
+                result.body = b"".join(chunks)[:limit]
+                self.stats["bytes"] += len(result.body)
+                return result
+        except Exception as e:
+            self.stats["errors"] += 1
+            return FetchResult(url=url, status=0, error=str(e) or type(e).__name__)
+
+    async def fetch_text(self, url: str, max_chars: int = 5000, max_bytes: Optional[int] = None,
+                         headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """GET an HTML page and extract its text while it downloads.
+
+        The body is fed to an incremental extractor chunk by chunk, and the
+        download stops as soon as max_chars of text have been collected.
+        """
+        limit = max_bytes or self.max_bytes
+        self.stats["requests"] += 1
+        try:
+            session = await self._get_session()
+            async with session.get(url, headers=headers, timeout=self._request_timeout()) as response:
+                result = FetchResult(url=str(response.url), status=response.status, headers=dict(response.headers))
+                content_type = response.headers.get("Content-Type", "text/html")
+                if not result.ok or ("html" not in content_type and "text" not in content_type):
+                    return result
+
+                extractor = HTMLTextExtractor(max_chars)
+                decoder = None
+                size = 0
+                try:
+                    async for chunk in response.content.iter_chunked(16 * 1024):
+                        size += len(chunk)
+                        if decoder is None:
+                            decoder = make_decoder(sniff_encoding(chunk, content_type))
+                        if extractor.feed(decoder.decode(chunk)):
+                            break
+                        if size >= limit:
+                            result.truncated = True
+                            self.stats["truncated"] += 1
+                            break
+                finally:
+                    # Flush text still buffered in the parser, however the download ended
+                    extractor.close()
+                self.stats["bytes"] += size
+                result.text = extractor.text
+                return result
+        except Exception as e:
+            self.stats["errors"] += 1
+            return FetchResult(url=url, status=0, error=str(e) or type(e).__name__)
+
+    async def fetch_text_cached(self, url: str, max_chars: int = 5000, use_cache: bool = True) -> FetchResult:
+        """fetch_text through the page cache.
+
+        Fresh entries are served directly. Stale entries are revalidated with
+        If-None-Match / If-Modified-Since, and a 304 reuses the cached text.
+        """
+        if self.cache is None:
+            return await self.fetch_text(url, max_chars)
+
+        key = f"{url}#{max_chars}"
+        entry = await self.cache.aget(key) if use_cache else None
+        now = time.time()
+        if entry is not None and now - entry["fetched_at"] < self.cache_ttl:
+            self.stats["cache_fresh_hits"] += 1
+            return FetchResult(url=url, status=200, text=entry["text"], from_cache=True)
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        result = await self.fetch_text(url, max_chars, headers=headers or None)
+        if result.status == 304 and entry is not None:
+            self.stats["cache_revalidated"] += 1
+            entry["fetched_at"] = now
+            self.cache.set(key, entry)
+            return FetchResult(url=url, status=200, headers=result.headers, text=entry["text"], from_cache=True)
+
+        self.stats["cache_refetched" if entry is not None else "cache_misses"] += 1
+        if result.ok and result.text:
+            self.cache.set(key, {
+                "text": result.text,
+                "etag": result.headers.get("ETag"),
+                "last_modified": result.headers.get("Last-Modified"),
+                "fetched_at": now,
+            })
+        return result
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Page cache counters with the share of lookups served without a download"""
+        served = self.stats["cache_fresh_hits"] + self.stats["cache_revalidated"]
+        lookups = served + self.stats["cache_refetched"] + self.stats["cache_misses"]
+        return {
+            "fresh_hits": self.stats["cache_fresh_hits"],
+            "revalidated": self.stats["cache_revalidated"],
+            "refetched": self.stats["cache_refetched"],
+            "misses": self.stats["cache_misses"],
+            "hit_rate": served / lookups if lookups else 0.0,
+        }
+
+    async def fetch_many(self, urls: List[str], max_bytes: Optional[int] = None) -> List[FetchResult]:
+        """Fetch URLs concurrently; results keep the order of urls"""
+        return await asyncio.gather(*(self.fetch(url, max_bytes) for url in urls))
+
+    async def close(self):
+        """Close the pooled session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = self._loop = self._guard = None
+
+async def _close_on_shutdown(session: aiohttp.ClientSession):
+    """Suspends until its event loop shuts down its async generators, then closes session"""
+    try:
+        yield
+    finally:
+        if not session.closed:
+            await session.close()
+
+# Shared scraper so every agent reuses one connection pool and page cache
+web_scraper = WebScraper(cache=page_cache if config.CACHE_ENABLED else None)
@@ -2,7 +2,7 @@
 import streamlit as st
 import asyncio
 import sys
-import os
+import uuid
 from pathlib import Path
 import nest_asyncio
 
@@ -19,15 +19,33 @@ try:
 except ImportError:
     FULL_VERSION = False
     
+from core.intent_router import IntentRouter, RoutingRule
+from core.ingestion import ingestion_pipeline
+from core.blob_store import blob_store
+from core.conversation_memory import ConversationMemory, get_memory
+from core.context_cache import context_cache
+from core.scheduler import user_message
+from tools.speech_generator import combine_audio
 import base64
 from io import BytesIO
 from PIL import Image
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Routing rules for decisions the UI makes itself
+ui_router = IntentRouter([
+    RoutingRule(
+        agent="image_question",
+        phrases=['analyze', 'analyse', 'what', "what's", 'describe', 'tell', 'show', 'identify', 'explain']
+    ),
+    RoutingRule(
+        agent="image_generation",
+        phrases=['generate image*', 'create image*', 'generate an image', 'create an image', 'draw']
+    ),
+])
+
 # Create a singleton event loop for async operations
 @st.cache_resource
 def get_event_loop():
@@ -44,53 +62,122 @@ def get_event_loop():
 # Simple version for immediate testing
 class SimpleStreamlitChatbot:
     def __init__(self):
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found in .env file")
+        # Imported here so a missing API key surfaces as an initialization error
+        from core.llm_backend import get_backend
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-        self.vision_model = genai.GenerativeModel('gemini-2.5-flash')
+        self.backend = get_backend()
+        self.model = 'gemini-2.5-flash'
+        self.vision_model = 'gemini-2.5-flash'
         
-    async def chat(self, message: str, context: dict = None) -> dict:
+    async def chat(self, message: str, context: dict = None, state: dict = None) -> dict:
         """Process a chat message"""
         try:
             # Build prompt with context
             prompt = message
-            if context and context.get("history"):
-                history = "\n".join(context["history"][-10:])
-                prompt = f"Previous conversation:\n{history}\n\nUser: {message}\nAssistant:"
+            if context is not None:
+                prompt = get_memory(context).build_prompt(message) + "Assistant:"
             
             # Generate response
-            response = await self.model.generate_content_async(prompt)
+            response_text = await self.backend.generate(self.model, [prompt])
             
             # Check for image generation request
             images = []
-            if any(keyword in message.lower() for keyword in ['generate image', 'create image', 'draw']):
+            if "image_generation" in ui_router.route(message):
                 images = [{"info": "Image generation would happen here with Imagen API"}]
             
             return {
-                "text": response.text,
+                "text": response_text,
                 "images": images,
                 "metadata": {"model": "gemini-2.5-flash"}
             }
             
         except Exception as e:
-            return {"text": f"Error: {str(e)}", "images": [], "metadata": {}}
+            return {"text": user_message(e), "images": [], "metadata": {}}
+    
+    async def chat_stream(self, message: str, context: dict = None, state: dict = None):
+        """Process a chat message, yielding text chunks as they arrive"""
+        prompt = message
+        if context is not None:
+            prompt = get_memory(context).build_prompt(message) + "Assistant:"
+            
+        parts = []
+        try:
+            async for chunk in self.backend.stream(self.model, [prompt]):
+                parts.append(chunk)
+                yield {"type": "chunk", "agent": "gemini", "text": chunk}
+        except Exception as e:
+            parts.append(user_message(e))
+            yield {"type": "chunk", "agent": "gemini", "text": parts[-1]}
+            
+        images = []
+        if "image_generation" in ui_router.route(message):
+            images = [{"info": "Image generation would happen here with Imagen API"}]
+            
+        yield {
+            "type": "response",
+            "response": {
+                "text": "".join(parts),
+                "images": images,
+                "metadata": {"model": "gemini-2.5-flash"}
+            }
+        }
     
-    def analyze_image(self, image_bytes: bytes, prompt: str = "What's in this image?") -> str:
+    def cancel(self, state: dict = None, reason: str = "cancelled") -> bool:
+        """Single model calls are not tracked per conversation, so there is nothing to stop"""
+        return False
+    
+    async def analyze_image(self, image_bytes: bytes, prompt: str = "What's in this image?") -> str:
         """Analyze an uploaded image"""
         try:
             img = Image.open(BytesIO(image_bytes))
-            response = self.vision_model.generate_content([prompt, img])
-            return response.text
+            return await self.backend.vision(self.vision_model, prompt, [img])
         except Exception as e:
             return f"Image analysis error: {str(e)}"
 
 # Async helper function
-async def run_chat_async(chatbot, prompt, context):
-    """Helper function to run chat asynchronously"""
-    return await chatbot.chat(prompt, context)
+# Media in responses and history are blob references; resolved bytes are
+# cached so reruns do not re-read or re-decode them
+@st.cache_resource(max_entries=256, show_spinner=False)
+def load_blob(blob_hash: str) -> bytes:
+    return blob_store.get(blob_hash) or b""
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def load_audio_track(blob_hashes: tuple) -> bytes:
+    return b"".join(load_blob(blob_hash) for blob_hash in blob_hashes)
+
+def media_bytes(item: dict) -> bytes:
+    """Bytes for a blob reference, or for legacy inline base64 data"""
+    if item.get("blob"):
+        return load_blob(item["blob"])
+    return base64.b64decode(item.get("data", ""))
+
+def audio_track(chunks: list) -> bytes:
+    """Ordered audio segments joined into one playable track"""
+    if all(chunk.get("blob") for chunk in chunks):
+        return load_audio_track(tuple(chunk["blob"] for chunk in chunks))
+    return combine_audio(chunks)
+
+async def stream_chat_async(chatbot, prompt, context, placeholder, audio_container=None, state=None):
+    """Render streamed chunks into a placeholder and return the final response.
+    
+    Audio segments are added to audio_container as they are synthesized, so
+    the first sentence can play while the rest is still being generated.
+    state is the browser session's conversation state, so a new message or
+    a cleared chat stops only this session's turn.
+    """
+    agent_texts = {}
+    response = {}
+    async for event in chatbot.chat_stream(prompt, context, state):
+        if event["type"] == "audio" and audio_container is not None:
+            audio_container.audio(media_bytes(event["audio"]), format="audio/mp3")
+        elif event["type"] == "chunk":
+            # Keep each agent's text together, in the order agents first spoke
+            agent_texts[event["agent"]] = agent_texts.get(event["agent"], "") + event["text"]
+            placeholder.markdown("\n\n".join(agent_texts.values()) + "▌")
+        elif event["type"] == "response":
+            response = event["response"]
+    placeholder.markdown(response.get("text", ""))
+    return response
 
 # Page config
 st.set_page_config(
@@ -119,8 +206,15 @@ except Exception as e:
 # Session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "context" not in st.session_state:
-    st.session_state.context = {"history": []}
+    st.session_state.context = {"memory": ConversationMemory(), "session_id": st.session_state.session_id}
+if "uploads" not in st.session_state:
+    st.session_state.uploads = {}
+if "chat_state" not in st.session_state:
+    # The chatbot is shared by every browser session; each keeps its own turn state
+    st.session_state.chat_state = {}
 
 # UI Layout
 st.title("🤖 Multi-Agent AI Assistant")
@@ -149,30 +243,25 @@ with st.sidebar:
     uploaded_images = []
     uploaded_docs = []
     
+    # Uploads removed from the uploader no longer need their cached contexts
+    current_ids = {getattr(file, "file_id", None) or f"{file.name}:{file.size}" for file in uploaded_files or []}
+    for upload_id in [upload_id for upload_id in st.session_state.uploads if upload_id not in current_ids]:
+        context_cache.invalidate(st.session_state.uploads.pop(upload_id)["hash"])
+    
     if uploaded_files:
         for file in uploaded_files:
-            file_ext = Path(file.name).suffix.lower()
-            
-            # Handle images
-            if file_ext in ['.png', '.jpg', '.jpeg']:
-                uploaded_images.append({
-                    "name": file.name,
-                    "bytes": file.getvalue()
-                })
+            # Each upload is hashed, spooled and queued for background
+            # preparation once; later reruns reuse the record
+            upload_id = getattr(file, "file_id", None) or f"{file.name}:{file.size}"
+            record = st.session_state.uploads.get(upload_id)
+            if record is None:
+                record = ingestion_pipeline.submit(st.session_state.session_id, file.name, file.getvalue())
+                st.session_state.uploads[upload_id] = record
                 
-            # Handle documents
+            if record["kind"] == "image":
+                uploaded_images.append(record)
             else:
-                # Save temporarily
-                temp_dir = "/tmp" if os.name != 'nt' else os.environ.get('TEMP', 'C:/temp')
-                os.makedirs(temp_dir, exist_ok=True)
-                temp_path = os.path.join(temp_dir, file.name)
-                
-                with open(temp_path, "wb") as f:
-                    f.write(file.getvalue())
-                uploaded_docs.append({
-                    "path": temp_path,
-                    "name": file.name
-                })
+                uploaded_docs.append(record)
         
         if uploaded_images:
             st.success(f"✓ {len(uploaded_images)} image(s) uploaded")
@@ -181,6 +270,16 @@ with st.sidebar:
         if uploaded_docs:
             st.success(f"✓ {len(uploaded_docs)} document(s) uploaded")
             st.session_state.context["files"] = uploaded_docs
+            
+        # Readiness of the background preparation
+        for record in uploaded_docs + uploaded_images:
+            status = ingestion_pipeline.status(record["hash"]) or {"state": "ready"}
+            if status["state"] == "ready":
+                st.caption(f"✓ {record['name']} ready")
+            elif status["state"] == "error":
+                st.caption(f"⚠️ {record['name']}: {status['error']}")
+            else:
+                st.caption(f"⏳ {record['name']} {status['state']}...")
     
     st.header("⚙️ Settings")
     temperature = st.slider("Temperature", 0.0, 1.0, 0.7)
@@ -199,6 +298,7 @@ with st.sidebar:
     st.header("🎯 Features")
     enable_web_search = st.checkbox("Enable Web Search", value=True)
     enable_image_gen = st.checkbox("Enable Image Generation", value=True)
+    st.session_state.context["bypass_cache"] = st.checkbox("Bypass Response Cache", value=False)
     
     # Info section
     st.header("ℹ️ Information")
@@ -226,20 +326,17 @@ with chat_container:
                 for img_data in message["images"]:
                     if isinstance(img_data, dict) and img_data.get("info"):
                         st.info(img_data["info"])
-                    elif isinstance(img_data, dict) and img_data.get("data"):
-                        img = Image.open(BytesIO(base64.b64decode(img_data["data"])))
-                        st.image(img, caption="Generated Image")
+                    elif isinstance(img_data, dict) and (img_data.get("blob") or img_data.get("data")):
+                        st.image(media_bytes(img_data), caption="Generated Image")
                     
-            # Display audio if any
+            # Display audio if any, with the segments joined into one track
             if message.get("audio"):
-                for audio_data in message["audio"]:
-                    audio_bytes = base64.b64decode(audio_data["data"])
-                    st.audio(audio_bytes, format="audio/mp3")
+                st.audio(audio_track(message["audio"]), format="audio/mp3")
 
 # Chat input
 if prompt := st.chat_input("Ask me anything..."):
     # Check for image analysis request
-    if uploaded_images and any(word in prompt.lower() for word in ['analyze', 'what', 'describe', 'tell', 'show']):
+    if uploaded_images and "image_question" in ui_router.route(prompt):
         # Analyze uploaded images
         with st.chat_message("user"):
             st.markdown(prompt)
@@ -256,20 +353,23 @@ if prompt := st.chat_input("Ask me anything..."):
                     
                     try:
                         response = loop.run_until_complete(
-                            run_chat_async(chatbot, prompt, context_with_images)
+                            stream_chat_async(chatbot, prompt, context_with_images, st.empty(),
+                                              state=st.session_state.chat_state)
                         )
                         response_text = response.get("text", "Image analysis complete.")
                     except Exception as e:
-                        response_text = f"Error: {str(e)}"
+                        response_text = user_message(e)
+                        st.markdown(response_text)
                 else:
                     # Use simple version
+                    loop = get_event_loop()
                     results = []
                     for img_info in uploaded_images:
-                        result = chatbot.analyze_image(img_info["bytes"], prompt)
+                        result = loop.run_until_complete(chatbot.analyze_image(img_info["bytes"], prompt))
                         results.append(f"**{img_info['name']}:** {result}")
                     response_text = "\n\n".join(results)
+                    st.markdown(response_text)
                 
-                st.markdown(response_text)
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": response_text
@@ -283,58 +383,46 @@ if prompt := st.chat_input("Ask me anything..."):
         
         # Get response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    # Use proper async handling
-                    loop = get_event_loop()
-                    response = loop.run_until_complete(
-                        run_chat_async(chatbot, prompt, st.session_state.context)
-                    )
-                    
-                    # Display response
-                    if response.get("text"):
-                        st.markdown(response["text"])
+            try:
+                # Stream the response into a placeholder as tokens arrive
+                loop = get_event_loop()
+                response = loop.run_until_complete(
+                    stream_chat_async(chatbot, prompt, st.session_state.context, st.empty(), st.container(),
+                                      st.session_state.chat_state)
+                )
+                
+                # Display images
+                if response.get("images"):
+                    for img_data in response["images"]:
+                        if isinstance(img_data, dict) and img_data.get("info"):
+                            st.info(img_data["info"])
+                        elif isinstance(img_data, dict) and (img_data.get("blob") or img_data.get("data")):
+                            st.image(media_bytes(img_data), caption="Generated Image")
                         
-                    # Display images
-                    if response.get("images"):
-                        for img_data in response["images"]:
-                            if isinstance(img_data, dict) and img_data.get("info"):
-                                st.info(img_data["info"])
-                            elif isinstance(img_data, dict) and img_data.get("data"):
-                                img = Image.open(BytesIO(base64.b64decode(img_data["data"])))
-                                st.image(img, caption="Generated Image")
-                            
-                    # Display audio
-                    if response.get("audio"):
-                        for audio_data in response["audio"]:
-                            audio_bytes = base64.b64decode(audio_data["data"])
-                            st.audio(audio_bytes, format="audio/mp3")
-                            
-                    # Display sources
-                    if response.get("metadata", {}).get("sources"):
-                        with st.expander("📚 Sources"):
-                            for source in response["metadata"]["sources"]:
-                                st.write(f"- {source}")
-                    
-                    # Save assistant message
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response.get("text", ""),
-                        "images": response.get("images"),
-                        "audio": response.get("audio")
-                    })
-                    
-                    # Update context
-                    st.session_state.context["history"].append(f"User: {prompt}")
-                    st.session_state.context["history"].append(f"Assistant: {response.get('text', '')}")
-                    
-                except Exception as e:
-                    error_msg = f"Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": error_msg
-                    })
+                # Display sources
+                if response.get("metadata", {}).get("sources"):
+                    with st.expander("📚 Sources"):
+                        for source in response["metadata"]["sources"]:
+                            st.write(f"- {source}")
+                
+                # Save assistant message
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": response.get("text", ""),
+                    "images": response.get("images"),
+                    "audio": response.get("audio")
+                })
+                
+                # Update context
+                get_memory(st.session_state.context).add_exchange(prompt, response.get('text', ''))
+                
+            except Exception as e:
+                error_msg = user_message(e)
+                st.error(error_msg)
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": error_msg
+                })
 
 # Footer with instructions
 with st.expander("📖 How to Use"):
@@ -357,6 +445,10 @@ with st.expander("📖 How to Use"):
 col1, col2, col3 = st.columns([1, 1, 1])
 with col2:
     if st.button("🗑️ Clear Chat", use_container_width=True):
+        if chatbot is not None:
+            # The turn belongs to the shared loop, which may be running it on another script thread
+            get_event_loop().call_soon_threadsafe(chatbot.cancel, st.session_state.chat_state)
+        st.session_state.chat_state = {}
         st.session_state.messages = []
-        st.session_state.context = {"history": []}
+        st.session_state.context = {"memory": ConversationMemory(), "session_id": st.session_state.session_id}
         st.rerun()
\ No newline at end of file